@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measures the memory held by many suspended iterators.
+
+The iterators returned by ‘RecurrenceRule.iterate_from()’ are compared to
+generators running the same loop.
+"""
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+import wadu
+
+
+def _iterate_generator(rule, start):
+    # Generator-based loop that ‘RecurrenceRule.iterate_from()’ used to run.
+    start = start.timetuple()[:6]
+    advance_dttm = wadu._ADVANCE_DTTM_FNS[rule._freq]
+    sow_offset = rule._week_start - wadu.MONDAY
+    on_week_days_woy_freq = (
+        wadu.MONTHLY if (rule._freq == wadu.YEARLY
+                         and any(x.kind == wadu._PROP_ON_MONTHS
+                                 for x in rule._dt_props))
+        else rule._freq)
+
+    if rule._dt_props:
+        get_dt_set = wadu._get_dt_set
+    else:
+        get_dt_set = lambda y, m, d, *args, **kwargs: ((y, m, d),)
+
+    if rule._tm_props:
+        get_tm_set = wadu._get_tm_set
+    else:
+        get_tm_set = lambda h, m, s, *args, **kwargs: ((h, m, s),)
+
+    year, month, day, hour, minute, second = start
+    dt_props = wadu._add_implicit_dt_props(
+        rule._dt_props, rule._freq, year, month, day, sow_offset)
+
+    count = 0
+    while True:
+        dt_set = get_dt_set(year, month, day, rule._freq, start, sow_offset,
+                            on_week_days_woy_freq, dt_props)
+        tm_set = get_tm_set(hour, minute, second, rule._freq, rule._tm_props)
+        if dt_set is not None and tm_set is not None:
+            dttm_set = tuple(x + y for x in dt_set for y in tm_set)
+            for dttm in dttm_set:
+                if dttm > rule._until:
+                    return
+
+                if dttm < start:
+                    continue
+
+                yield datetime(*dttm)
+
+                count += 1
+                if rule._count is not None and count >= rule._count:
+                    return
+
+        year, month, day, hour, minute, second = advance_dttm(
+            year, month, day, hour, minute, second, rule._interval)
+
+
+def _measure(create, items):
+    gc.collect()
+    tracemalloc.start()
+    iterators = []
+    for rule, start in items:
+        it = create(rule, start)
+        next(it)
+        iterators.append(it)
+
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--count', type=int, default=1000000,
+                        help="number of live iterators")
+    args = parser.parse_args()
+
+    rules = (
+        wadu.RecurrenceRule(wadu.WEEKLY,
+                            on_week_days=(wadu.MONDAY, wadu.FRIDAY),
+                            on_hours=(9, 17)),
+        wadu.RecurrenceRule(wadu.MONTHLY, on_month_days=(1, 15)),
+        wadu.RecurrenceRule(wadu.DAILY, count=100),
+    )
+    origin = datetime(2020, 1, 1)
+    items = [(rules[i % len(rules)], origin + timedelta(minutes=i))
+             for i in range(args.count)]
+
+    fns = (
+        ('generator', _iterate_generator),
+        ('iterator', lambda rule, start: rule.iterate_from(start)),
+    )
+    for name, create in fns:
+        size = _measure(create, items)
+        print("{:<10} {:>8.1f} MiB {:>8.1f} bytes/iterator".format(
+            name, size / 1048576.0, size / float(args.count)))
+
+
+if __name__ == '__main__':
+    main()
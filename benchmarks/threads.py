@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Measures the throughput of expansions shared between threads.
+
+A same set of rules is expanded with ‘expand_many()’ using an increasing
+number of threads. The throughput only scales on a free-threaded build of
+Python.
+"""
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import wadu
+
+
+def _measure(items, lo, hi, threads):
+    begin = time.time()
+    for _ in wadu.expand_many(items, lo, hi, processes=threads, chunksize=64,
+                              executor='thread'):
+        pass
+
+    return time.time() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--count', type=int, default=20000,
+                        help="number of rules to expand")
+    parser.add_argument('-t', '--threads', type=int, default=8,
+                        help="maximum number of threads")
+    args = parser.parse_args()
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print("GIL {}".format("enabled" if is_gil_enabled else "disabled"))
+
+    # Share a few rules between all the items to stress their caches.
+    rules = (
+        wadu.RecurrenceRule(wadu.WEEKLY,
+                            on_week_days=(wadu.MONDAY, wadu.FRIDAY),
+                            on_hours=(9, 17)),
+        wadu.RecurrenceRule(wadu.MONTHLY, on_month_days=(1, 15, -1)),
+        wadu.RecurrenceRule(wadu.DAILY, on_hours=(8, 12, 20)),
+    )
+    origin = datetime(2020, 1, 1)
+    items = [(rules[i % len(rules)], origin + timedelta(minutes=i * 7))
+             for i in range(args.count)]
+    lo = datetime(2021, 1, 1)
+    hi = datetime(2021, 4, 1)
+
+    reference = None
+    threads = 1
+    while threads <= args.threads:
+        duration = _measure(items, lo, hi, threads)
+        if reference is None:
+            reference = duration
+
+        print("{:>3} threads {:>10.0f} rules/s {:>6.2f}x".format(
+            threads, args.count / duration, reference / duration))
+        threads *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestAgenda(TestCase):
+    """Runs tests for the agenda class."""
+
+    def setUp(self):
+        self.items = (
+            (RecurrenceRule(DAILY, on_hours=(9,)), datetime(1997, 9, 1)),
+            (RecurrenceRule(WEEKLY, on_week_days=(MONDAY, THURSDAY),
+                            on_hours=(9, 14)),
+             datetime(1997, 9, 3)),
+            (RecurrenceRule(MONTHLY, count=3), datetime(1997, 9, 2, hour=9)),
+        )
+        hi = datetime(1998, 1, 1)
+        self.expected = sorted(
+            AgendaItem(x, i)
+            for i, (rule, start) in enumerate(self.items)
+            for x in takewhile(lambda x: x < hi, rule.iterate_from(start)))
+
+    def test_pages(self):
+        agenda = Agenda(self.items)
+        self.assertEqual(len(agenda), 3)
+
+        out = []
+        after = None
+        while len(out) < len(self.expected):
+            page = agenda.page(after, limit=7)
+            self.assertEqual(len(page), 7)
+            out.extend(page)
+            after = page[-1]
+
+        self.assertEqual(out[:len(self.expected)], self.expected)
+
+    def test_after(self):
+        expected = self.expected
+        for i in (0, 5, 20, 21, 100):
+            # A fresh agenda seeks the item directly.
+            page = Agenda(self.items).page(expected[i], limit=10)
+            self.assertEqual(page, expected[i + 1:i + 11])
+
+        for microsecond in (0, 500000):
+            after = datetime(1997, 9, 4, hour=9, microsecond=microsecond)
+            page = Agenda(self.items).page(after, limit=3)
+            self.assertEqual(page, [
+                AgendaItem(datetime(1997, 9, 4, hour=14), 1),
+                AgendaItem(datetime(1997, 9, 5, hour=9), 0),
+                AgendaItem(datetime(1997, 9, 6, hour=9), 0),
+            ])
+
+    def test_exhausted(self):
+        agenda = Agenda(self.items[2:])
+        page = agenda.page(limit=10)
+        self.assertEqual([x.occurrence for x in page], [
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 10, 2, hour=9),
+            datetime(1997, 11, 2, hour=9),
+        ])
+        self.assertEqual(agenda.page(page[-1]), [])
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            Agenda(self.items).page(limit=0)
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime
+from itertools import islice
+from unittest import (
+    TestCase,
+    main as unittest_main,
+    skipIf,
+)
+
+try:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    asyncio = None
+
+from wadu import *
+
+
+@skipIf(asyncio is None, "asyncio is not available")
+class TestAsyncRecurrenceIterator(TestCase):
+    """Runs tests for the asynchronous iterator class."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def _collect(self, it, limit=None):
+        out = []
+        while limit is None or len(out) < limit:
+            try:
+                batch = self.loop.run_until_complete(it.__anext__())
+            except StopAsyncIteration:
+                break
+
+            self.assertTrue(batch)
+            out.extend(batch)
+
+        return out[:limit]
+
+    def test_batches(self):
+        rule = RecurrenceRule(DAILY, on_hours=(9, 17), count=1000)
+        start = datetime(2000, 1, 1)
+        it = rule.aiterate_from(start, batch_size=64, max_periods=4)
+        self.assertEqual(self._collect(it), list(rule.iterate_from(start)))
+
+    def test_sparse(self):
+        rule = RecurrenceRule(DAILY, on_months=(2,), on_month_days=(29,))
+        start = datetime(2000, 1, 1)
+        it = rule.aiterate_from(start, batch_size=1, max_periods=1)
+        self.assertEqual(self._collect(it, 5),
+                         list(islice(rule.iterate_from(start), 5)))
+
+    def test_exhausted(self):
+        rule = RecurrenceRule(MONTHLY, until=datetime(2000, 3, 1))
+        start = datetime(2000, 1, 1)
+        it = rule.aiterate_from(start, max_periods=1)
+        self.assertEqual(self._collect(it), list(rule.iterate_from(start)))
+        with self.assertRaises(StopAsyncIteration):
+            self.loop.run_until_complete(it.__anext__())
+
+    def test_executor(self):
+        rule = RecurrenceRule(WEEKLY, on_week_days=(MONDAY, FRIDAY))
+        start = datetime(2000, 1, 1)
+        with ThreadPoolExecutor(1) as executor:
+            it = rule.aiterate_from(start, batch_size=10, executor=executor)
+            self.assertEqual(self._collect(it, 95),
+                             list(islice(rule.iterate_from(start), 95)))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestFreeBusy(TestCase):
+    """Runs tests for the free/busy functions."""
+
+    def setUp(self):
+        self.items = (
+            (RecurrenceRule(DAILY, on_hours=(9,)),
+             datetime(1997, 9, 1),
+             timedelta(hours=1)),
+            (RecurrenceRule(DAILY, on_hours=(10,), on_minutes=(30,)),
+             datetime(1997, 9, 1),
+             timedelta(minutes=45)),
+            (RecurrenceRule(WEEKLY, on_week_days=(TUESDAY,), on_hours=(9,),
+                            on_minutes=(30,)),
+             datetime(1997, 9, 1),
+             timedelta(hours=1)),
+        )
+        self.lo = datetime(1997, 9, 1, hour=9, minute=30)
+        self.hi = datetime(1997, 9, 3)
+
+    def test_busy(self):
+        self.assertEqual(list(free_busy(self.items, self.lo, self.hi)), [
+            (datetime(1997, 9, 1, hour=9, minute=30),
+             datetime(1997, 9, 1, hour=10)),
+            (datetime(1997, 9, 1, hour=10, minute=30),
+             datetime(1997, 9, 1, hour=11, minute=15)),
+            (datetime(1997, 9, 2, hour=9),
+             datetime(1997, 9, 2, hour=11, minute=15)),
+        ])
+
+    def test_granularity(self):
+        out = list(free_busy(self.items, self.lo, self.hi,
+                             granularity=timedelta(hours=1)))
+        self.assertEqual(out, [
+            (datetime(1997, 9, 1, hour=9, minute=30),
+             datetime(1997, 9, 1, hour=11, minute=30)),
+            (datetime(1997, 9, 2, hour=8, minute=30),
+             datetime(1997, 9, 2, hour=11, minute=30)),
+        ])
+
+    def test_free(self):
+        out = list(free_busy(self.items, self.lo, self.hi, free=True))
+        self.assertEqual(out, [
+            (datetime(1997, 9, 1, hour=10),
+             datetime(1997, 9, 1, hour=10, minute=30)),
+            (datetime(1997, 9, 1, hour=11, minute=15),
+             datetime(1997, 9, 2, hour=9)),
+            (datetime(1997, 9, 2, hour=11, minute=15),
+             datetime(1997, 9, 3)),
+        ])
+
+    def test_first_free_slot(self):
+        self.assertEqual(
+            first_free_slot(self.items, self.lo, self.hi,
+                            timedelta(minutes=30)),
+            (datetime(1997, 9, 1, hour=10),
+             datetime(1997, 9, 1, hour=10, minute=30)))
+        self.assertEqual(
+            first_free_slot(self.items, self.lo, self.hi,
+                            timedelta(hours=1)),
+            (datetime(1997, 9, 1, hour=11, minute=15),
+             datetime(1997, 9, 1, hour=12, minute=15)))
+        self.assertIsNone(
+            first_free_slot(self.items, self.lo, self.hi,
+                            timedelta(days=1)))
+
+    def test_invalid_granularity(self):
+        with self.assertRaises(ValueError):
+            list(free_busy(self.items, self.lo, self.hi,
+                           granularity=timedelta(0)))
+
+
+class TestFindConflicts(TestCase):
+    """Runs tests for the function finding conflicts."""
+
+    def test_conflicts(self):
+        items = (
+            (RecurrenceRule(WEEKLY, on_week_days=(MONDAY,)),
+             datetime(1997, 9, 1, hour=9),
+             timedelta(hours=2)),
+            (RecurrenceRule(WEEKLY, interval=2, on_week_days=(MONDAY,)),
+             datetime(1997, 9, 1, hour=10),
+             timedelta(hours=1)),
+            (RecurrenceRule(MONTHLY, count=2),
+             datetime(1997, 9, 15, hour=8),
+             timedelta(hours=1, minutes=30)),
+        )
+        lo = datetime(1997, 9, 8)
+        hi = datetime(1997, 10, 1)
+        expected = [
+            (Interval(2, datetime(1997, 9, 15, hour=8),
+                      datetime(1997, 9, 15, hour=9, minute=30)),
+             Interval(0, datetime(1997, 9, 15, hour=9),
+                      datetime(1997, 9, 15, hour=11))),
+            (Interval(0, datetime(1997, 9, 15, hour=9),
+                      datetime(1997, 9, 15, hour=11)),
+             Interval(1, datetime(1997, 9, 15, hour=10),
+                      datetime(1997, 9, 15, hour=11))),
+            (Interval(0, datetime(1997, 9, 29, hour=9),
+                      datetime(1997, 9, 29, hour=11)),
+             Interval(1, datetime(1997, 9, 29, hour=10),
+                      datetime(1997, 9, 29, hour=11))),
+        ]
+        self.assertEqual(list(find_conflicts(items, lo, hi)), expected)
+
+    def test_bounds(self):
+        rule = RecurrenceRule(DAILY, on_hours=(9,))
+        items = (
+            (rule, datetime(1997, 9, 1)),
+            (rule, datetime(1997, 9, 1)),
+        )
+        lo = datetime(1997, 9, 2, hour=10)
+        hi = datetime(1997, 9, 4, hour=9)
+        out = list(find_conflicts(items, lo, hi, timedelta(hours=2)))
+        self.assertEqual([(x.begin, y.index) for x, y in out], [
+            (datetime(1997, 9, 2, hour=9), 1),
+            (datetime(1997, 9, 3, hour=9), 1),
+        ])
+
+        # Adjacent occurrences don't overlap.
+        items = (
+            (rule, datetime(1997, 9, 1)),
+            (RecurrenceRule(DAILY, on_hours=(11,)), datetime(1997, 9, 1)),
+        )
+        out = list(find_conflicts(items, lo, hi, timedelta(hours=2)))
+        self.assertEqual(out, [])
+
+    def test_no_conflicts(self):
+        items = (
+            (RecurrenceRule(DAILY, on_hours=(9,)), datetime(1997, 9, 1)),
+            (RecurrenceRule(YEARLY), datetime(1997, 9, 1, hour=12)),
+        )
+        lo = datetime(1997, 9, 1)
+        hi = datetime(2097, 9, 1)
+        self.assertEqual(
+            list(find_conflicts(items, lo, hi, timedelta(hours=3))), [])
+
+    def test_expired(self):
+        """The items without any occurrence left aren't walked further."""
+        never = RecurrenceRule(DAILY, on_months=(2,), on_month_days=(30,))
+        items = (
+            (RecurrenceRule(DAILY, on_months=(2,), on_month_days=(30,),
+                            until=datetime(1998, 1, 1)),
+             datetime(1997, 9, 1)),
+            (never, datetime(1997, 9, 1)),
+            (RecurrenceRule(DAILY, on_hours=(9,)), datetime(2020, 1, 1)),
+            (RecurrenceRule(DAILY, on_hours=(9,)), datetime(2020, 1, 3)),
+        )
+        lo = datetime(2020, 1, 1)
+        hi = datetime(2020, 1, 4)
+        self.assertEqual(
+            [(a.index, b.index, a.begin)
+             for a, b in find_conflicts(items, lo, hi, timedelta(hours=1))],
+            [(2, 3, datetime(2020, 1, 3, hour=9))])
+        self.assertEqual(
+            tuple(RecurrenceRule(DAILY, on_months=(2,), on_month_days=(30,),
+                                 until=datetime(1998, 1, 1))
+                  .iterate_from(datetime(1997, 9, 1))),
+            ())
+
+    def test_missing_duration(self):
+        items = ((RecurrenceRule(DAILY), datetime(1997, 9, 1)),)
+        with self.assertRaises(ValueError):
+            list(find_conflicts(items, datetime(1997, 9, 1),
+                                datetime(1997, 9, 2)))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime
+from itertools import islice
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestCursor(TestCase):
+    """Runs tests for the iteration cursors."""
+
+    def _paginate(self, rule, start, size):
+        out = []
+        it = rule.iterate_from(start)
+        while True:
+            page = tuple(islice(it, size))
+            if not page:
+                return tuple(out)
+
+            out.extend(page)
+            it = rule.iterate_from_cursor(it.cursor().encode())
+
+    def test_paginate(self):
+        """Resuming from the tokens matches a single iteration."""
+        rules = (
+            RecurrenceRule(MONTHLY,
+                           on_week_days=(MONDAY, FRIDAY),
+                           on_set_pos=(1, -1),
+                           count=25),
+            RecurrenceRule(YEARLY,
+                           on_months=(FEBRUARY,),
+                           on_month_days=(29,),
+                           until=datetime(2040, 1, 1)),
+            RecurrenceRule(DAILY,
+                           on_hours=(9, 12, 18),
+                           until=datetime(1998, 1, 1)),
+        )
+        start = datetime(1997, 9, 2, hour=9)
+        for rule in rules:
+            expected = tuple(rule.iterate_from(start))
+            for size in (1, 2, 7):
+                self.assertEqual(self._paginate(rule, start, size), expected)
+
+    def test_state(self):
+        """The cursor captures the state of the loop."""
+        rule = RecurrenceRule(DAILY, on_hours=(9, 18), count=10)
+        it = rule.iterate_from(datetime(1997, 9, 2))
+        self.assertEqual(tuple(islice(it, 3)), (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 2, hour=18),
+            datetime(1997, 9, 3, hour=9),
+        ))
+
+        cursor = it.cursor()
+        self.assertEqual(cursor.fingerprint, rule.fingerprint)
+        self.assertEqual(cursor.start, (1997, 9, 2, 0, 0, 0))
+        self.assertEqual(cursor.anchor, (1997, 9, 3, 0, 0, 0))
+        self.assertEqual(cursor.pos, 1)
+        self.assertEqual(cursor.count, 3)
+        self.assertEqual(Cursor.decode(cursor.encode()), cursor)
+
+    def test_invalid(self):
+        """Tokens from other rules or malformed ones are rejected."""
+        rule = RecurrenceRule(DAILY)
+        it = RecurrenceRule(WEEKLY).iterate_from(datetime(1997, 9, 2))
+        next(it)
+        with self.assertRaises(ValueError):
+            rule.iterate_from_cursor(it.cursor().encode())
+
+        with self.assertRaises(ValueError):
+            rule.iterate_from_cursor('invalid')
+
+
+if __name__ == '__main__':
+    unittest_main()
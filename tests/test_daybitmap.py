@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import date, datetime
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+def _get_expected_bitmap(rule, start, year):
+    lo = datetime(year, 1, 1)
+    hi = datetime(year + 1, 1, 1)
+    out = 0
+    for value in takewhile(lambda x: x < hi, rule.iterate_from(start)):
+        if value >= lo:
+            out |= 1 << (value.timetuple().tm_yday - 1)
+
+    return out
+
+
+class TestDayBitmap(TestCase):
+    """Runs tests for the day bitmaps."""
+
+    def test_day_bitmap(self):
+        rule = RecurrenceRule(MONTHLY, on_week_days=(FRIDAY(-1),))
+        bitmap = rule.day_bitmap(datetime(1997, 9, 1), 1998)
+        days = [date.fromordinal(date(1998, 1, 1).toordinal() + i)
+                for i in range(366) if bitmap >> i & 1]
+        self.assertEqual(len(days), 12)
+        self.assertEqual(days[:3], [
+            date(1998, 1, 30),
+            date(1998, 2, 27),
+            date(1998, 3, 27),
+        ])
+
+    def test_bounds(self):
+        rule = RecurrenceRule(DAILY, on_hours=(9,),
+                              until=datetime(1998, 3, 1, hour=8))
+        bitmap = rule.day_bitmap(datetime(1998, 1, 30, hour=10), 1998)
+        self.assertEqual(bitmap, ((1 << 59) - 1) & ~((1 << 30) - 1))
+
+    def test_rules(self):
+        start = datetime(1997, 9, 2, hour=9)
+        rules = (
+            RecurrenceRule(YEARLY, on_months=(1, 3), on_week_days=(TUESDAY,),
+                           on_hours=(9, 21)),
+            RecurrenceRule(YEARLY, on_weeks=(20,), on_week_days=(MONDAY,)),
+            RecurrenceRule(YEARLY, on_year_days=(1, 100, -1)),
+            RecurrenceRule(MONTHLY, on_month_days=(1, -1), on_set_pos=(-1,)),
+            RecurrenceRule(WEEKLY, interval=3, week_start=SUNDAY,
+                           on_week_days=(TUESDAY, SUNDAY)),
+            RecurrenceRule(DAILY, interval=5, count=40),
+            RecurrenceRule(HOURLY, interval=17, count=100),
+        )
+        for rule in rules:
+            for year in (1997, 1998):
+                self.assertEqual(rule.day_bitmap(start, year),
+                                 _get_expected_bitmap(rule, start, year))
+
+    def test_merge(self):
+        start = datetime(1997, 9, 2, hour=9)
+        items = (
+            (RecurrenceRule(WEEKLY, on_week_days=(MONDAY,)), start),
+            (RecurrenceRule(WEEKLY, interval=2, on_week_days=(MONDAY,)),
+             start),
+            (RecurrenceRule(MONTHLY, on_month_days=(3,), count=5), start),
+        )
+        expected = 0
+        for rule, start in items:
+            expected |= _get_expected_bitmap(rule, start, 1997)
+
+        self.assertEqual(merge_day_bitmaps(items, 1997), expected)
+
+        items = ((RecurrenceRule(DAILY), datetime(1997, 1, 1)),) + items
+        self.assertEqual(merge_day_bitmaps(items, 1997), (1 << 365) - 1)
+
+
+if __name__ == '__main__':
+    unittest_main()
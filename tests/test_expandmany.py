@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+import json
+from datetime import datetime, timedelta
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+    skipIf,
+)
+
+try:
+    import concurrent.futures as futures
+except ImportError:
+    futures = None
+
+from wadu import *
+
+
+@skipIf(futures is None, "concurrent.futures is not available")
+class TestExpandMany(TestCase):
+    """Runs tests for the bulk expansion function."""
+
+    def setUp(self):
+        rules = (
+            RecurrenceRule(DAILY, on_hours=(9, 18)),
+            RecurrenceRule(WEEKLY, on_week_days=(MONDAY, FRIDAY), count=40),
+            RecurrenceRule(MONTHLY, on_month_days=(1, -1)),
+            RecurrenceRule(YEARLY, until=datetime(2019, 6, 1)),
+        )
+        self.items = tuple(
+            (rules[i % len(rules)],
+             datetime(2018, 1, 1) + timedelta(days=i * 3, hours=i))
+            for i in range(50))
+        self.lo = datetime(2018, 3, 1)
+        self.hi = datetime(2019, 3, 1)
+
+    def _get_expected(self, rule, start):
+        it = takewhile(lambda x: x < self.hi, rule.iterate_from(start))
+        return [to_timestamp(x) for x in it if x >= self.lo]
+
+    def test_ordered(self):
+        out = list(expand_many(self.items, self.lo, self.hi, processes=2,
+                               chunksize=7))
+        self.assertEqual([i for i, _ in out], list(range(len(self.items))))
+        for i, timestamps in out:
+            self.assertEqual(list(timestamps),
+                             self._get_expected(*self.items[i]))
+
+    def test_unordered(self):
+        out = list(expand_many(self.items, self.lo, self.hi, processes=2,
+                               chunksize=7, ordered=False))
+        self.assertEqual(sorted(i for i, _ in out),
+                         list(range(len(self.items))))
+        for i, timestamps in out:
+            self.assertEqual(list(timestamps),
+                             self._get_expected(*self.items[i]))
+
+    def test_thread(self):
+        out = list(expand_many(self.items, self.lo, self.hi, processes=4,
+                               chunksize=3, executor='thread'))
+        self.assertEqual([i for i, _ in out], list(range(len(self.items))))
+        for i, timestamps in out:
+            self.assertEqual(list(timestamps),
+                             self._get_expected(*self.items[i]))
+
+    def test_empty(self):
+        self.assertEqual(list(expand_many((), self.lo, self.hi)), [])
+
+    def test_invalid_executor(self):
+        with self.assertRaises(ValueError):
+            list(expand_many(self.items, self.lo, self.hi, executor='fiber'))
+
+
+@skipIf(futures is None, "concurrent.futures is not available")
+class TestExpandParallel(TestCase):
+    """Runs tests for the parallel expansion of a single rule."""
+
+    def _get_expected(self, rule, start, lo, hi):
+        it = takewhile(lambda x: x < hi, rule.iterate_from(start))
+        return [to_timestamp(x) for x in it if x >= lo]
+
+    def _check(self, rule, start, lo, hi):
+        self.assertEqual(list(rule.expand_parallel(start, lo, hi, workers=2)),
+                         self._get_expected(rule, start, lo, hi))
+
+    def test_hourly(self):
+        rule = RecurrenceRule(HOURLY, interval=5, on_minutes=(0, 30))
+        self._check(rule,
+                    datetime(2000, 1, 1, hour=3),
+                    datetime(2000, 2, 1, minute=15),
+                    datetime(2000, 6, 1))
+
+    def test_count(self):
+        rule = RecurrenceRule(DAILY, on_hours=(9, 18), count=300)
+        self._check(rule,
+                    datetime(2000, 1, 1),
+                    datetime(2000, 3, 1),
+                    datetime(2001, 1, 1))
+
+    def test_until(self):
+        rule = RecurrenceRule(WEEKLY,
+                              on_week_days=(TUESDAY, SATURDAY),
+                              until=datetime(2003, 6, 1))
+        self._check(rule,
+                    datetime(2000, 1, 1),
+                    datetime(2001, 1, 1),
+                    datetime(2010, 1, 1))
+
+    def test_yearly_on_weeks(self):
+        rule = RecurrenceRule(YEARLY, on_weeks=(1, 52, 53),
+                              on_week_days=(MONDAY,))
+        self._check(rule,
+                    datetime(1990, 1, 1),
+                    datetime(1998, 12, 29),
+                    datetime(2021, 1, 5))
+
+    def test_empty(self):
+        rule = RecurrenceRule(DAILY, count=3)
+        self._check(rule,
+                    datetime(2000, 1, 1),
+                    datetime(2000, 2, 1),
+                    datetime(2000, 3, 1))
+
+
+class TestPartition(TestCase):
+    """Runs tests for the partitioning of an expansion into shards."""
+
+    def _get_expected(self, rule, start, lo, hi):
+        it = takewhile(lambda x: x < hi, rule.iterate_from(start))
+        return [to_timestamp(x) for x in it if x >= lo]
+
+    def _expand(self, rule, shards):
+        out = []
+        for shard in shards:
+            out.extend(rule.expand_shard(shard))
+
+        return out
+
+    def test_cover(self):
+        rule = RecurrenceRule(MONTHLY, on_month_days=(1, 15, -1), count=70)
+        start = datetime(2000, 1, 1)
+        lo = datetime(2001, 6, 10)
+        hi = datetime(2010, 1, 1)
+        expected = self._get_expected(rule, start, lo, hi)
+        for n in (1, 2, 5, 200):
+            shards = rule.partition(start, lo, hi, n)
+            self.assertEqual(len(shards), n)
+            self.assertEqual(self._expand(rule, shards), expected)
+
+    def test_balance(self):
+        # The occurrences are much denser over the weekends.
+        rule = RecurrenceRule(DAILY,
+                              on_week_days=(SATURDAY, SUNDAY),
+                              on_hours=tuple(range(24)))
+        start = datetime(2000, 1, 3)
+        shards = rule.partition(start, start, datetime(2000, 4, 3), 4)
+        sizes = [len(rule.expand_shard(x)) for x in shards]
+        self.assertEqual(sum(sizes), 13 * 48)
+        self.assertTrue(max(sizes) - min(sizes) <= 48)
+
+    def test_serialization(self):
+        rule = RecurrenceRule(WEEKLY, on_week_days=(MONDAY, THURSDAY))
+        start = datetime(2000, 1, 1)
+        lo = datetime(2000, 3, 1)
+        hi = datetime(2001, 3, 1)
+        shards = json.loads(json.dumps(rule.partition(start, lo, hi, 3)))
+        self.assertEqual(self._expand(rule, shards),
+                         self._get_expected(rule, start, lo, hi))
+
+    def test_invalid(self):
+        rule = RecurrenceRule(DAILY)
+        start = datetime(2000, 1, 1)
+        with self.assertRaises(ValueError):
+            rule.partition(start, start, datetime(2000, 2, 1), 0)
+
+        shard = rule.partition(start, start, datetime(2000, 2, 1), 1)[0]
+        with self.assertRaises(ValueError):
+            RecurrenceRule(DAILY, interval=2).expand_shard(shard)
+
+
+class TestIterateManyStarts(TestCase):
+    """Runs tests for the expansion of a rule for many start dates."""
+
+    def _check(self, rule, starts, lo, hi):
+        out = dict(rule.iterate_many_starts(starts, lo, hi))
+        self.assertEqual(sorted(out), list(range(len(starts))))
+        for i, start in enumerate(starts):
+            it = takewhile(lambda x: x < hi, rule.iterate_from(start))
+            self.assertEqual(list(out[i]),
+                             [to_timestamp(x) for x in it if x >= lo])
+
+    def test_weekly(self):
+        rule = RecurrenceRule(WEEKLY, on_week_days=(MONDAY, FRIDAY))
+        starts = tuple(datetime(2000, 1, 1) + timedelta(days=i, hours=i % 24)
+                       for i in range(0, 400, 3))
+        self._check(rule, starts, datetime(2000, 6, 1), datetime(2001, 6, 1))
+
+    def test_yearly_implicit(self):
+        # The implicit properties depend on the month and on the day.
+        rule = RecurrenceRule(YEARLY, on_hours=(8, 20), count=5)
+        starts = tuple(datetime(1999 + i % 3, 1 + i % 12, 1 + i % 28)
+                       for i in range(50))
+        self._check(rule, starts, datetime(2000, 1, 1), datetime(2004, 1, 1))
+
+    def test_monthly_time_of_day(self):
+        rule = RecurrenceRule(MONTHLY,
+                              on_week_days=(TUESDAY(2),),
+                              until=datetime(2001, 1, 1))
+        starts = tuple(datetime(2000, 1, 1, hour=i) for i in range(24))
+        self._check(rule, starts, datetime(2000, 3, 1), datetime(2002, 1, 1))
+
+    def test_shared_sets(self):
+        # Explicit properties leave no room for implicit ones, the start
+        # dates then all share the same sets whatever their day.
+        rules = (
+            RecurrenceRule(MONTHLY, on_month_days=(1, 15, -1),
+                           on_hours=(9, 17)),
+            RecurrenceRule(WEEKLY, week_start=SUNDAY,
+                           on_week_days=(SUNDAY, WEDNESDAY), count=30),
+            RecurrenceRule(YEARLY, on_weeks=(1, 20, -1),
+                           on_week_days=(MONDAY, SATURDAY)),
+        )
+        starts = tuple(datetime(1999, 1, 1) + timedelta(days=i * 17,
+                                                        hours=i % 24)
+                       for i in range(60))
+        for rule in rules:
+            groups = set(rule._create_context(x.timetuple()[:6]).dt_props
+                         for x in starts)
+            self.assertEqual(len(groups), 1)
+            self._check(rule, starts, datetime(2000, 1, 1),
+                        datetime(2003, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest_main()
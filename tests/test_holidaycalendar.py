@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import date, datetime
+from itertools import islice
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestHolidayCalendar(TestCase):
+    """Runs tests for the holiday calendar class."""
+
+    def setUp(self):
+        self.calendar = HolidayCalendar(
+            holidays=(date(1997, 9, 1), date(1997, 12, 31)),
+            rules=((RecurrenceRule(YEARLY, on_months=(12,),
+                                   on_month_days=(25, 26)),
+                    datetime(1990, 1, 1)),))
+
+    def test_business_days(self):
+        calendar = self.calendar
+        self.assertFalse(calendar.is_business_day(date(1997, 9, 1)))
+        self.assertTrue(calendar.is_business_day(date(1997, 9, 2)))
+        self.assertFalse(calendar.is_business_day(date(1997, 9, 6)))
+        self.assertFalse(calendar.is_business_day(date(1997, 9, 7)))
+        self.assertFalse(calendar.is_business_day(date(2040, 12, 25)))
+        self.assertTrue(calendar.is_business_day(date(2040, 12, 27)))
+
+    def test_adjust(self):
+        calendar = self.calendar
+        value = datetime(1997, 8, 30, hour=9)
+        self.assertEqual(calendar.adjust(value),
+                         datetime(1997, 9, 2, hour=9))
+        self.assertEqual(calendar.adjust(value, PRECEDING),
+                         datetime(1997, 8, 29, hour=9))
+        self.assertEqual(calendar.adjust(value, MODIFIED_FOLLOWING),
+                         datetime(1997, 8, 29, hour=9))
+        self.assertIsNone(calendar.adjust(value, SKIP))
+        self.assertEqual(calendar.adjust(date(1997, 9, 1),
+                                         MODIFIED_PRECEDING),
+                         date(1997, 9, 2))
+        self.assertEqual(calendar.adjust(date(1997, 12, 25)),
+                         date(1997, 12, 29))
+        self.assertEqual(calendar.adjust(date(1997, 12, 31)),
+                         date(1998, 1, 1))
+        self.assertEqual(calendar.adjust(date(1997, 9, 2), SKIP),
+                         date(1997, 9, 2))
+
+        with self.assertRaises(ValueError):
+            calendar.adjust(value, -1)
+
+    def test_weekend(self):
+        calendar = HolidayCalendar(weekend=(FRIDAY,))
+        self.assertEqual(calendar.adjust(date(1997, 9, 5)),
+                         date(1997, 9, 6))
+
+        with self.assertRaises(ValueError):
+            HolidayCalendar(weekend=(MONDAY, TUESDAY, WEDNESDAY, THURSDAY,
+                                     FRIDAY, SATURDAY, SUNDAY))
+
+    def test_iterate_from(self):
+        rule = RecurrenceRule(DAILY, count=8)
+        start = datetime(1997, 8, 29, hour=9)
+        self.assertEqual(tuple(rule.iterate_from(start, self.calendar)), (
+            datetime(1997, 8, 29, hour=9),
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 3, hour=9),
+            datetime(1997, 9, 4, hour=9),
+            datetime(1997, 9, 5, hour=9),
+        ))
+
+        rule = RecurrenceRule(MONTHLY, on_month_days=(-1,))
+        start = datetime(1997, 8, 1)
+        self.assertEqual(
+            tuple(islice(rule.iterate_from(start, self.calendar,
+                                           MODIFIED_FOLLOWING), 5)), (
+                datetime(1997, 8, 29),
+                datetime(1997, 9, 30),
+                datetime(1997, 10, 31),
+                datetime(1997, 11, 28),
+                datetime(1997, 12, 30),
+            ))
+        self.assertEqual(
+            tuple(islice(rule.iterate_from(start, self.calendar, SKIP), 3)), (
+                datetime(1997, 9, 30),
+                datetime(1997, 10, 31),
+                datetime(1998, 3, 31),
+            ))
+
+        with self.assertRaises(ValueError):
+            rule.iterate_from(start, self.calendar, -1)
+
+    def test_iterate_from_many_times(self):
+        # The occurrences of the weekend and of the holiday are moved onto
+        # the same days as other ones, in both directions.
+        rule = RecurrenceRule(DAILY, on_hours=(9, 17), count=10)
+        start = datetime(1997, 8, 29, hour=9)
+        self.assertEqual(tuple(rule.iterate_from(start, self.calendar)), (
+            datetime(1997, 8, 29, hour=9),
+            datetime(1997, 8, 29, hour=17),
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 2, hour=17),
+        ))
+        self.assertEqual(
+            tuple(rule.iterate_from(start, self.calendar, PRECEDING)), (
+                datetime(1997, 8, 29, hour=9),
+                datetime(1997, 8, 29, hour=17),
+                datetime(1997, 9, 2, hour=9),
+                datetime(1997, 9, 2, hour=17),
+            ))
+
+        rule = RecurrenceRule(DAILY, on_hours=(9, 17))
+        start = datetime(1997, 12, 22, hour=9)
+        self.assertEqual(
+            tuple(islice(rule.iterate_from(start, self.calendar,
+                                           MODIFIED_FOLLOWING), 8)), (
+                datetime(1997, 12, 22, hour=9),
+                datetime(1997, 12, 22, hour=17),
+                datetime(1997, 12, 23, hour=9),
+                datetime(1997, 12, 23, hour=17),
+                datetime(1997, 12, 24, hour=9),
+                datetime(1997, 12, 24, hour=17),
+                datetime(1997, 12, 29, hour=9),
+                datetime(1997, 12, 29, hour=17),
+            ))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestHorizon(TestCase):
+    """Runs tests for the rolling horizon class."""
+
+    def setUp(self):
+        self.items = (
+            (RecurrenceRule(DAILY, on_hours=(9, 18)), datetime(1990, 1, 1)),
+            (RecurrenceRule(WEEKLY, count=600), datetime(2000, 1, 3, hour=12)),
+            (RecurrenceRule(MONTHLY, count=3), datetime(2010, 7, 1)),
+        )
+
+    def _get_expected(self, lo, hi):
+        out = []
+        for rule, start in self.items:
+            it = takewhile(lambda x: x < hi, rule.iterate_from(start))
+            out.append(tuple(x for x in it if x >= lo))
+
+        return out
+
+    def test_advance(self):
+        """The window matches a full expansion after each move."""
+        span = timedelta(days=10)
+        now = datetime(2010, 6, 1)
+        horizon = Horizon(self.items, now, span)
+        moves = (
+            timedelta(0),
+            timedelta(hours=9),
+            timedelta(days=4),
+            timedelta(days=30),
+            timedelta(days=500),
+            timedelta(days=3000),
+            timedelta(hours=9, microseconds=500000),
+            timedelta(days=20),
+        )
+        for move in moves:
+            now += move
+            horizon.advance(now)
+            self.assertEqual(horizon.now, now)
+            self.assertEqual(horizon.end, now + span)
+            expected = self._get_expected(now, now + span)
+            self.assertEqual([horizon[i] for i in range(len(horizon))],
+                             expected)
+
+    def test_iter(self):
+        """The occurrences of all the rules are merged in order."""
+        horizon = Horizon(self.items, datetime(2010, 6, 28), timedelta(days=7))
+        self.assertEqual(tuple(horizon), (
+            (datetime(2010, 6, 28, hour=9), 0),
+            (datetime(2010, 6, 28, hour=12), 1),
+            (datetime(2010, 6, 28, hour=18), 0),
+            (datetime(2010, 6, 29, hour=9), 0),
+            (datetime(2010, 6, 29, hour=18), 0),
+            (datetime(2010, 6, 30, hour=9), 0),
+            (datetime(2010, 6, 30, hour=18), 0),
+            (datetime(2010, 7, 1), 2),
+            (datetime(2010, 7, 1, hour=9), 0),
+            (datetime(2010, 7, 1, hour=18), 0),
+            (datetime(2010, 7, 2, hour=9), 0),
+            (datetime(2010, 7, 2, hour=18), 0),
+            (datetime(2010, 7, 3, hour=9), 0),
+            (datetime(2010, 7, 3, hour=18), 0),
+            (datetime(2010, 7, 4, hour=9), 0),
+            (datetime(2010, 7, 4, hour=18), 0),
+        ))
+
+    def test_sub_second(self):
+        """The occurrences preceding a sub-second start are left out."""
+        now = datetime(2010, 6, 28, hour=9, microsecond=500000)
+        horizon = Horizon(self.items, now, timedelta(hours=12))
+        self.assertEqual(tuple(horizon), (
+            (datetime(2010, 6, 28, hour=12), 1),
+            (datetime(2010, 6, 28, hour=18), 0),
+        ))
+
+    def test_backward(self):
+        """The window can't move backward."""
+        horizon = Horizon(self.items, datetime(2010, 6, 1), timedelta(days=1))
+        with self.assertRaises(ValueError):
+            horizon.advance(datetime(2010, 5, 1))
+
+
+if __name__ == '__main__':
+    unittest_main()
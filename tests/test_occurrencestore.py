@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestOccurrenceStore(TestCase):
+    """Runs tests for the occurrence store class."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = OccurrenceStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_extend(self):
+        """Extending an entry matches a full expansion."""
+        rule = RecurrenceRule(WEEKLY,
+                              on_week_days=(MONDAY, FRIDAY),
+                              on_hours=(9, 17))
+        start = datetime(2020, 1, 1, hour=9)
+        horizons = (
+            datetime(2020, 1, 1),
+            datetime(2020, 3, 6, hour=9),
+            datetime(2021, 3, 1),
+        )
+        for horizon in horizons:
+            with self.store.extend(rule, start, horizon) as entry:
+                expected = tuple(takewhile(lambda x: x <= horizon,
+                                           rule.iterate_from(start)))
+                self.assertEqual(tuple(entry), expected)
+                self.assertEqual(entry.horizon, horizon)
+                self.assertFalse(entry.is_exhausted)
+
+    def test_exhausted(self):
+        """Finite rules get flagged once all their occurrences are stored."""
+        rule = RecurrenceRule(DAILY, count=3)
+        start = datetime(2020, 1, 1, hour=9)
+        with self.store.extend(rule, start, datetime(2020, 1, 2)) as entry:
+            self.assertEqual(len(entry), 1)
+            self.assertFalse(entry.is_exhausted)
+
+        with self.store.extend(rule, start, datetime(2021, 1, 1)) as entry:
+            self.assertEqual(tuple(entry), (
+                datetime(2020, 1, 1, hour=9),
+                datetime(2020, 1, 2, hour=9),
+                datetime(2020, 1, 3, hour=9),
+            ))
+            self.assertTrue(entry.is_exhausted)
+
+    def test_between(self):
+        """Timestamps within a range are retrieved by bisection."""
+        rule = RecurrenceRule(DAILY)
+        start = datetime(2020, 1, 1, hour=9)
+        with self.store.extend(rule, start, datetime(2021, 1, 1)) as entry:
+            timestamps = entry.between(datetime(2020, 2, 1),
+                                       datetime(2020, 2, 3, hour=9))
+            self.assertEqual(tuple(from_timestamp(x) for x in timestamps), (
+                datetime(2020, 2, 1, hour=9),
+                datetime(2020, 2, 2, hour=9),
+                datetime(2020, 2, 3, hour=9),
+            ))
+
+    def test_stale(self):
+        """Entries built from another rule are detected and rebuilt."""
+        rule = RecurrenceRule(DAILY, count=5)
+        other = RecurrenceRule(DAILY, count=2)
+        start = datetime(2020, 1, 1, hour=9)
+        horizon = datetime(2021, 1, 1)
+        self.assertIsNone(self.store.open(rule, start))
+
+        self.store.extend(other, start, horizon).close()
+        path = self.store._get_entry_path(rule, start)
+        os.rename(self.store._get_entry_path(other, start), path)
+        self.assertIsNone(self.store.open(rule, start))
+
+        with self.store.extend(rule, start, horizon) as entry:
+            self.assertFalse(entry.is_stale(rule, start))
+            self.assertEqual(len(entry), 5)
+
+    def test_sub_second_start(self):
+        """Entries with a start date within a second are reused."""
+        rule = RecurrenceRule(DAILY)
+        start = datetime(2020, 1, 1, hour=9, microsecond=500000)
+        self.store.extend(rule, start, datetime(2020, 1, 5)).close()
+        with self.store.open(rule, start) as entry:
+            self.assertFalse(entry.is_stale(rule, start))
+            self.assertEqual(len(entry), 4)
+
+        with self.store.extend(rule, start, datetime(2020, 1, 10)) as entry:
+            self.assertEqual(len(entry), 9)
+
+    def test_torn_append(self):
+        """Bytes left by an interrupted append are discarded."""
+        rule = RecurrenceRule(DAILY)
+        start = datetime(2020, 1, 1, hour=9)
+        self.store.extend(rule, start, datetime(2020, 1, 10)).close()
+        with open(self.store._get_entry_path(rule, start), 'ab') as f:
+            f.write(b'\1' * 8)
+
+        with self.store.extend(rule, start, datetime(2020, 1, 20)) as entry:
+            expected = tuple(takewhile(lambda x: x <= datetime(2020, 1, 20),
+                                       rule.iterate_from(start)))
+            self.assertEqual(tuple(entry), expected)
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+import pickle
+from datetime import datetime
+from itertools import islice
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestRecurrenceIterator(TestCase):
+    """Runs tests for the recurrence iterator class."""
+
+    def test_pickle(self):
+        """Suspended iterators resume where they were pickled."""
+        rule = RecurrenceRule(WEEKLY,
+                              on_week_days=(MONDAY, FRIDAY),
+                              on_hours=(9, 17),
+                              count=20)
+        start = datetime(1997, 9, 2, hour=9)
+        expected = tuple(rule.iterate_from(start))
+
+        it = rule.iterate_from(start)
+        head = tuple(islice(it, 7))
+        copy = pickle.loads(pickle.dumps(it))
+        self.assertEqual(head + tuple(copy), expected)
+        self.assertEqual(head + tuple(it), expected)
+
+    def test_shared_context(self):
+        """Iterators share the data compiled for a rule and a start date."""
+        rule = RecurrenceRule(MONTHLY, on_week_days=(MONDAY,))
+        start = datetime(1997, 9, 2, hour=9)
+        a = rule.iterate_from(start)
+        b = rule.iterate_from(start)
+        self.assertIs(a._context, b._context)
+
+        c = rule.iterate_from(datetime(1997, 9, 2, hour=10))
+        self.assertIs(a._context.dt_props, c._context.dt_props)
+
+    def test_slots(self):
+        """Iterators don't hold a dictionary of attributes."""
+        it = RecurrenceRule(DAILY).iterate_from(datetime(1997, 9, 2))
+        self.assertFalse(hasattr(it, '__dict__'))
+
+    def test_chunks(self):
+        """Chunks hold the occurrences in order."""
+        rule = RecurrenceRule(DAILY, on_hours=(9, 12, 17), count=100)
+        start = datetime(1997, 9, 2, hour=10)
+        chunks = list(rule.iterate_chunks(start, 32))
+        self.assertEqual([len(x) for x in chunks], [32, 32, 32, 4])
+        self.assertEqual([x for chunk in chunks for x in chunk],
+                         list(rule.iterate_from(start)))
+
+        with self.assertRaises(ValueError):
+            rule.iterate_chunks(start, 0)
+
+    def test_periods(self):
+        """Periods hold their anchor and their occurrences."""
+        rule = RecurrenceRule(MONTHLY,
+                              on_month_days=(1, 31),
+                              until=datetime(1998, 1, 31))
+        start = datetime(1997, 9, 2)
+        expected = (
+            Period(0, (1997, 9, 2, 0, 0, 0), ()),
+            Period(1, (1997, 10, 2, 0, 0, 0), (datetime(1997, 10, 1),
+                                               datetime(1997, 10, 31))),
+            Period(2, (1997, 11, 2, 0, 0, 0), (datetime(1997, 11, 1),)),
+            Period(3, (1997, 12, 2, 0, 0, 0), (datetime(1997, 12, 1),
+                                               datetime(1997, 12, 31))),
+            Period(4, (1998, 1, 2, 0, 0, 0), (datetime(1998, 1, 1),
+                                              datetime(1998, 1, 31))),
+        )
+        self.assertEqual(tuple(rule.iterate_periods(start)), expected)
+
+    def test_periods_set_pos(self):
+        """Periods hold the occurrences selected by their position."""
+        rule = RecurrenceRule(MONTHLY,
+                              on_week_days=(MONDAY, FRIDAY),
+                              on_set_pos=(-1,),
+                              count=3)
+        start = datetime(1997, 9, 2)
+        periods = list(rule.iterate_periods(start))
+        self.assertEqual([x.occurrences for x in periods],
+                         [(x,) for x in rule.iterate_from(start)])
+
+    def test_periods_until(self):
+        """Periods stop past the end date even when they're all empty."""
+        rule = RecurrenceRule(DAILY,
+                              on_months=(2,),
+                              on_month_days=(30,),
+                              until=datetime(2020, 3, 5))
+        periods = list(rule.iterate_periods(datetime(2020, 1, 1)))
+        self.assertEqual(periods[0].anchor, (2020, 1, 1, 0, 0, 0))
+        self.assertEqual(periods[-1].anchor, (2021, 12, 31, 0, 0, 0))
+        self.assertFalse(any(x.occurrences for x in periods))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -12,7 +12,10 @@ del sys
 
 # ------------------------------------------------------------------------------
 
-from datetime import datetime
+import pickle
+from datetime import date, datetime, timedelta
+from itertools import islice
+from threading import Thread
 from unittest import (
     TestCase,
     main as unittest_main,
@@ -28,6 +31,30 @@ class TestRecurrenceRule(TestCase):
     (https://github.com/libical/libical).
     """
 
+    def _check_extent(self, rule, start):
+        occurrences = tuple(rule.iterate_from(start))
+        self.assertTrue(rule.is_finite())
+        self.assertEqual(rule.total(start), len(occurrences))
+        self.assertEqual(rule.last(start), occurrences[-1])
+
+    def _check_contains_many(self, rule, start):
+        # Check the occurrences, repeated or not, their neighbours, and date
+        # times out of the range of the rule against single lookups.
+        occurrences = tuple(to_timestamp(value) for value
+                            in islice(rule.iterate_from(start), 100))
+        candidates = set(occurrences)
+        candidates.update(timestamp + offset
+                          for timestamp in occurrences
+                          for offset in (-3600, 3600, 7 * 86400))
+        candidates.add(to_timestamp(datetime(1990, 1, 1)))
+        candidates.add(occurrences[-1] + 400 * 86400)
+        timestamps = sorted(list(candidates) + [occurrences[0]] * 2)
+        out = rule.contains_many(start, timestamps)
+        self.assertEqual(len(out), len(timestamps))
+        for timestamp, flag in zip(timestamps, out):
+            self.assertEqual(bool(flag),
+                             rule.contains(start, from_timestamp(timestamp)))
+
     def test_yearly_on_month_and_week_days(self):
         """Yearly, every day in January.
 
@@ -1879,6 +1906,276 @@ class TestRecurrenceRule(TestCase):
         )
         self.assertEqual(tuple(rule.iterate_from(start)), expected)
 
+    def test_weekly_on_week_days_across_years(self):
+        """Weekly on Sunday and Monday, starting mid-week near the year end.
+
+        RRULE:FREQ=WEEKLY;COUNT=6;BYDAY=SU,MO
+        DTSTART:20011222T090000
+        """
+        rule = RecurrenceRule(WEEKLY,
+                              on_week_days=(SUNDAY, MONDAY),
+                              count=6)
+        start = datetime(2001, 12, 22, hour=9)
+        expected = (
+            datetime(2001, 12, 23, hour=9),
+            datetime(2001, 12, 24, hour=9),
+            datetime(2001, 12, 30, hour=9),
+            datetime(2001, 12, 31, hour=9),
+            datetime(2002,  1,  6, hour=9),
+            datetime(2002,  1,  7, hour=9),
+        )
+        self.assertEqual(tuple(rule.iterate_from(start)), expected)
+
+    def test_pickle(self):
+        """Rules survive a round trip through pickle."""
+        rule = RecurrenceRule(MONTHLY,
+                              on_week_days=(FRIDAY(1), MONDAY(-1)),
+                              on_hours=(9, 17),
+                              until=datetime(2000, 1, 1))
+        copy = pickle.loads(pickle.dumps(rule))
+        self.assertEqual(copy, rule)
+        self.assertEqual(copy.fingerprint, rule.fingerprint)
+        self.assertNotEqual(copy, RecurrenceRule(MONTHLY))
+
+        start = datetime(1997, 9, 2, hour=9)
+        self.assertEqual(tuple(copy.iterate_from(start)),
+                         tuple(rule.iterate_from(start)))
+
+    def test_concurrent_iterations(self):
+        """Rules can be shared between threads."""
+        kwargs = {
+            'on_week_days': (MONDAY, FRIDAY(-1)),
+            'on_hours': (9, 17),
+        }
+        rule = RecurrenceRule(MONTHLY, **kwargs)
+        starts = tuple(datetime(2000, 1, 1) + timedelta(days=i * 11)
+                       for i in range(400))
+
+        # Compute the expected values serially with a separate rule.
+        reference = RecurrenceRule(MONTHLY, **kwargs)
+        expected = [tuple(islice(reference.iterate_from(x), 20))
+                    for x in starts]
+
+        results = [[] for _ in range(8)]
+
+        def run(out):
+            for start in starts:
+                out.append(tuple(islice(rule.iterate_from(start), 20)))
+
+        threads = [Thread(target=run, args=(x,)) for x in results]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        for result in results:
+            self.assertEqual(result, expected)
+
+    def test_contains(self):
+        """Membership, bimonthly on the first and last matching times.
+
+        RRULE:FREQ=MONTHLY;INTERVAL=2;COUNT=20;BYDAY=MO,-1FR;BYHOUR=9,17;BYSETPOS=1,-1
+        DTSTART:19970901T120000
+        """
+        rule = RecurrenceRule(MONTHLY,
+                              interval=2,
+                              on_week_days=(MONDAY, FRIDAY(-1)),
+                              on_hours=(9, 17),
+                              on_set_pos=(1, -1),
+                              count=20)
+        start = datetime(1997, 9, 1, hour=12)
+        occurrences = tuple(rule.iterate_from(start))
+        for value in occurrences:
+            self.assertTrue(rule.contains(start, value))
+            self.assertFalse(rule.contains(start,
+                                           value + timedelta(hours=1)))
+            self.assertFalse(rule.contains(start,
+                                           value + timedelta(days=7)))
+            self.assertFalse(rule.contains(
+                start, value + timedelta(microseconds=500000)))
+
+        # Beyond the count, before the start, or between the periods.
+        self.assertFalse(rule.contains(start,
+                                       occurrences[-1] + timedelta(days=61)))
+        self.assertFalse(rule.contains(start, datetime(1997, 9, 1, hour=9)))
+        self.assertFalse(rule.contains(start, datetime(1997, 10, 6, hour=9)))
+
+    def test_contains_until(self):
+        """Membership, daily until a date time.
+
+        RRULE:FREQ=DAILY;UNTIL=19970905T090000
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(DAILY, until=datetime(1997, 9, 5, hour=9))
+        start = datetime(1997, 9, 2, hour=9)
+        self.assertTrue(rule.contains(start, start))
+        self.assertTrue(rule.contains(start, datetime(1997, 9, 5, hour=9)))
+        self.assertFalse(rule.contains(start, datetime(1997, 9, 6, hour=9)))
+        self.assertFalse(rule.contains(start, datetime(1997, 9, 1, hour=9)))
+        self.assertFalse(rule.contains(
+            start, datetime(1997, 9, 3, hour=9, microsecond=1)))
+        self.assertFalse(rule.contains(
+            start, datetime(1997, 9, 5, hour=9, microsecond=1)))
+
+    def test_contains_many_monthly(self):
+        """Batch membership, bimonthly on the first and last matching times.
+
+        RRULE:FREQ=MONTHLY;INTERVAL=2;COUNT=20;BYDAY=MO,-1FR;BYHOUR=9,17;BYSETPOS=1,-1
+        DTSTART:19970901T120000
+        """
+        rule = RecurrenceRule(MONTHLY,
+                              interval=2,
+                              on_week_days=(MONDAY, FRIDAY(-1)),
+                              on_hours=(9, 17),
+                              on_set_pos=(1, -1),
+                              count=20)
+        start = datetime(1997, 9, 1, hour=12)
+        self._check_contains_many(rule, start)
+        self.assertEqual(len(rule.contains_many(start, [])), 0)
+
+    def test_contains_many_daily(self):
+        """Batch membership, daily on Tuesday and Thursday.
+
+        RRULE:FREQ=DAILY;UNTIL=19980601T000000;BYDAY=TU,TH;BYHOUR=9,17
+        DTSTART:19970901T120000
+        """
+        rule = RecurrenceRule(DAILY,
+                              on_week_days=(TUESDAY, THURSDAY),
+                              on_hours=(9, 17),
+                              until=datetime(1998, 6, 1))
+        start = datetime(1997, 9, 1, hour=12)
+        self._check_contains_many(rule, start)
+
+    def test_contains_many_yearly(self):
+        """Batch membership, yearly on the Mondays of weeks 1 and 52.
+
+        RRULE:FREQ=YEARLY;COUNT=6;BYWEEKNO=1,52;BYDAY=MO
+        DTSTART:19970901T120000
+        """
+        rule = RecurrenceRule(YEARLY,
+                              on_weeks=(1, 52),
+                              on_week_days=(MONDAY,),
+                              count=6)
+        start = datetime(1997, 9, 1, hour=12)
+        self._check_contains_many(rule, start)
+
+    def test_extent_daily(self):
+        """Last occurrence and total count, daily at two hours.
+
+        RRULE:FREQ=DAILY;COUNT=25;BYHOUR=9,17
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(DAILY, on_hours=(9, 17), count=25)
+        start = datetime(1997, 9, 2, hour=9)
+        self._check_extent(rule, start)
+
+    def test_extent_weekly(self):
+        """Last occurrence and total count, every other week from Sunday.
+
+        RRULE:FREQ=WEEKLY;INTERVAL=2;COUNT=13;WKST=SU;BYDAY=TU,SU
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(WEEKLY,
+                              interval=2,
+                              week_start=SUNDAY,
+                              on_week_days=(TUESDAY, SUNDAY),
+                              count=13)
+        start = datetime(1997, 9, 2, hour=9)
+        self._check_extent(rule, start)
+
+        # Converting the count into an end date leaves the occurrences as is.
+        bounded = RecurrenceRule(WEEKLY,
+                                 interval=2,
+                                 week_start=SUNDAY,
+                                 on_week_days=(TUESDAY, SUNDAY),
+                                 until=rule.last(start))
+        self.assertEqual(tuple(bounded.iterate_from(start)),
+                         tuple(rule.iterate_from(start)))
+
+    def test_extent_monthly(self):
+        """Last occurrence and total count, monthly on invalid dates.
+
+        RRULE:FREQ=MONTHLY;COUNT=10;BYMONTHDAY=31,-1
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(MONTHLY, on_month_days=(31, -1), count=10)
+        start = datetime(1997, 9, 2, hour=9)
+        self._check_extent(rule, start)
+
+    def test_extent_yearly(self):
+        """Last occurrence and total count, yearly until a date.
+
+        RRULE:FREQ=YEARLY;UNTIL=20030101T000000;BYWEEKNO=1,52;BYDAY=MO
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(YEARLY,
+                              on_weeks=(1, 52),
+                              on_week_days=(MONDAY,),
+                              until=datetime(2003, 1, 1))
+        start = datetime(1997, 9, 2, hour=9)
+        self._check_extent(rule, start)
+
+    def test_extent_count_and_until(self):
+        """Last occurrence and total count, ending before the count.
+
+        RRULE:FREQ=DAILY;COUNT=30;UNTIL=19970920T080000
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(DAILY,
+                              count=30,
+                              until=datetime(1997, 9, 20, hour=8))
+        start = datetime(1997, 9, 2, hour=9)
+        self._check_extent(rule, start)
+        self.assertEqual(rule.total(start), 18)
+
+    def test_extent_empty(self):
+        """Last occurrence and total count, without any occurrence.
+
+        RRULE:FREQ=MONTHLY;UNTIL=20000101T000000;BYMONTH=2;BYMONTHDAY=30
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(MONTHLY,
+                              on_months=(2,),
+                              on_month_days=(30,),
+                              until=datetime(2000, 1, 1))
+        start = datetime(1997, 9, 2, hour=9)
+        self.assertTrue(rule.is_finite())
+        self.assertIsNone(rule.last(start))
+        self.assertEqual(rule.total(start), 0)
+
+    def test_extent_infinite(self):
+        """Last occurrence and total count, without any count nor end date.
+
+        RRULE:FREQ=MONTHLY;BYDAY=MO,-1FR;BYHOUR=9,17
+        DTSTART:19970902T090000
+        """
+        start = datetime(1997, 9, 2, hour=9)
+        rules = (
+            RecurrenceRule(MONTHLY,
+                           on_week_days=(MONDAY, FRIDAY(-1)),
+                           on_hours=(9, 17)),
+            RecurrenceRule(DAILY),
+            RecurrenceRule(YEARLY, on_months=(2,), on_month_days=(30,)),
+        )
+        for rule in rules:
+            self.assertFalse(rule.is_finite())
+            self.assertIsNone(rule.last(start))
+            self.assertIsNone(rule.total(start))
+
+    def test_extent_large_count(self):
+        """Last occurrence and total count, with a count never reached.
+
+        RRULE:FREQ=DAILY;COUNT=1000000000
+        DTSTART:19970902T090000
+        """
+        rule = RecurrenceRule(DAILY, count=10 ** 9)
+        start = datetime(1997, 9, 2, hour=9)
+        self.assertTrue(rule.is_finite())
+        self.assertEqual(rule.last(start), datetime(9999, 12, 31, hour=9))
+        self.assertEqual(rule.total(start),
+                         (date(9999, 12, 31) - date(1997, 9, 2)).days + 1)
+
 
 if __name__ == '__main__':
     unittest_main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime
+from itertools import islice
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestRecurrenceSet(TestCase):
+    """Runs tests for the recurrence set class."""
+
+    def test_rules(self):
+        """Occurrences shared by several rules are output once."""
+        rset = RecurrenceSet(rules=(
+            RecurrenceRule(WEEKLY, on_week_days=(TUESDAY,), count=4),
+            RecurrenceRule(WEEKLY, on_week_days=(TUESDAY, THURSDAY),
+                           count=3),
+        ))
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 4, hour=9),
+            datetime(1997, 9, 9, hour=9),
+            datetime(1997, 9, 16, hour=9),
+            datetime(1997, 9, 23, hour=9),
+        )
+        self.assertEqual(tuple(rset.iterate_from(start)), expected)
+
+    def test_dates(self):
+        """Dates are merged with the occurrences of the rules."""
+        rset = RecurrenceSet(
+            rules=(RecurrenceRule(MONTHLY, count=3),),
+            dates=(datetime(1997, 9, 20, hour=9),
+                   datetime(1997, 9, 2, hour=9),
+                   datetime(1997, 8, 1)))
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 8, 1),
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 20, hour=9),
+            datetime(1997, 10, 2, hour=9),
+            datetime(1997, 11, 2, hour=9),
+        )
+        self.assertEqual(tuple(rset.iterate_from(start)), expected)
+
+    def test_exclusions(self):
+        """Excluded dates and occurrences of exclusion rules are removed."""
+        rset = RecurrenceSet(
+            rules=(RecurrenceRule(DAILY, count=10),),
+            exclusion_rules=(RecurrenceRule(WEEKLY,
+                                            on_week_days=(SATURDAY,
+                                                          SUNDAY)),),
+            exclusion_dates=(datetime(1997, 9, 3, hour=9),
+                             datetime(1997, 9, 4, hour=10)))
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 4, hour=9),
+            datetime(1997, 9, 5, hour=9),
+            datetime(1997, 9, 8, hour=9),
+            datetime(1997, 9, 9, hour=9),
+            datetime(1997, 9, 10, hour=9),
+            datetime(1997, 9, 11, hour=9),
+        )
+        self.assertEqual(tuple(rset.iterate_from(start)), expected)
+
+    def test_after(self):
+        rset = RecurrenceSet(
+            rules=(RecurrenceRule(DAILY, on_hours=(9, 18)),),
+            exclusion_rules=(RecurrenceRule(MONTHLY, on_hours=(9,)),))
+        start = datetime(1997, 9, 1)
+        self.assertEqual(rset.after(start, datetime(2020, 3, 1, hour=9)),
+                         datetime(2020, 3, 1, hour=18))
+        self.assertEqual(rset.after(start, datetime(2020, 3, 31, hour=18)),
+                         datetime(2020, 4, 1, hour=18))
+        self.assertEqual(rset.after(start,
+                                    datetime(2020, 4, 2, hour=9),
+                                    inclusive=True),
+                         datetime(2020, 4, 2, hour=9))
+
+        expected = tuple(x for x in islice(rset.iterate_from(start), 200)
+                         if x > datetime(1997, 10, 5))
+        self.assertEqual(rset.after(start, datetime(1997, 10, 5)),
+                         expected[0])
+
+    def test_overrides(self):
+        """Modified instances are moved or dropped."""
+        rset = RecurrenceSet(
+            rules=(RecurrenceRule(DAILY, count=5),),
+            overrides={
+                datetime(1997, 9, 3, hour=9): datetime(1997, 9, 8, hour=12),
+                datetime(1997, 9, 4, hour=9): None,
+                datetime(1997, 9, 5, hour=9): datetime(1997, 9, 1, hour=9),
+            })
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 1, hour=9),
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 6, hour=9),
+            datetime(1997, 9, 8, hour=12),
+        )
+        self.assertEqual(tuple(rset.iterate_from(start)), expected)
+        self.assertEqual(rset.after(start, datetime(1997, 9, 6, hour=9)),
+                         datetime(1997, 9, 8, hour=12))
+        self.assertIsNone(rset.after(start, datetime(1997, 9, 8, hour=12)))
+
+    def test_invalid_overrides(self):
+        """Only the actual instances can be modified."""
+        rset = RecurrenceSet(
+            rules=(RecurrenceRule(DAILY, count=5),),
+            exclusion_dates=(datetime(1997, 9, 3, hour=9),),
+            overrides={
+                # Past the count.
+                datetime(1997, 9, 7, hour=9): datetime(1997, 9, 10, hour=9),
+                # Not produced by the rule.
+                datetime(1997, 9, 4, hour=10): datetime(1997, 9, 11, hour=9),
+                # Excluded.
+                datetime(1997, 9, 3, hour=9): datetime(1997, 9, 12, hour=9),
+                # Moved onto an existing instance.
+                datetime(1997, 9, 4, hour=9): datetime(1997, 9, 5, hour=9),
+            })
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 5, hour=9),
+            datetime(1997, 9, 6, hour=9),
+        )
+        self.assertEqual(tuple(rset.iterate_from(start)), expected)
+        self.assertEqual(rset.after(start, datetime(1997, 9, 2, hour=9)),
+                         datetime(1997, 9, 5, hour=9))
+
+    def test_empty(self):
+        rset = RecurrenceSet()
+        start = datetime(1997, 9, 1)
+        self.assertEqual(tuple(rset.iterate_from(start)), ())
+        self.assertIsNone(rset.after(start, start))
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import islice, takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestRuleCombination(TestCase):
+    """Runs tests for the rule combination class."""
+
+    def test_intersection(self):
+        a = RecurrenceRule(WEEKLY, interval=2, on_week_days=(TUESDAY,))
+        b = RecurrenceRule(MONTHLY, on_month_days=tuple(range(1, 8)))
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1998, 1, 6, hour=9),
+            datetime(1998, 2, 3, hour=9),
+            datetime(1998, 3, 3, hour=9),
+        )
+        self.assertEqual(tuple(islice((a & b).iterate_from(start), 4)),
+                         expected)
+
+    def test_union(self):
+        a = RecurrenceRule(DAILY, interval=2, count=3)
+        b = RecurrenceRule(DAILY, interval=3, count=3)
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 4, hour=9),
+            datetime(1997, 9, 5, hour=9),
+            datetime(1997, 9, 6, hour=9),
+            datetime(1997, 9, 8, hour=9),
+        )
+        self.assertEqual(tuple((a | b).iterate_from(start)), expected)
+
+    def test_difference(self):
+        a = RecurrenceRule(DAILY, count=7)
+        b = RecurrenceRule(WEEKLY, on_week_days=(SATURDAY, SUNDAY))
+        start = datetime(1997, 9, 2, hour=9)
+        expected = (
+            datetime(1997, 9, 2, hour=9),
+            datetime(1997, 9, 3, hour=9),
+            datetime(1997, 9, 4, hour=9),
+            datetime(1997, 9, 5, hour=9),
+            datetime(1997, 9, 8, hour=9),
+        )
+        self.assertEqual(tuple((a - b).iterate_from(start)), expected)
+
+    def test_nested(self):
+        a = RecurrenceRule(DAILY, on_hours=(9, 12))
+        b = RecurrenceRule(WEEKLY, on_week_days=(MONDAY, FRIDAY),
+                           on_hours=(9, 12))
+        c = RecurrenceRule(WEEKLY, on_week_days=(FRIDAY,), on_hours=(12,))
+        d = RecurrenceRule(MONTHLY, on_month_days=(1,), on_hours=(9,))
+        combination = (a & b) - c | d
+        start = datetime(1997, 9, 1)
+        hi = datetime(1998, 9, 1)
+
+        def expand(rule):
+            return set(takewhile(lambda x: x < hi, rule.iterate_from(start)))
+
+        expected = sorted(((expand(a) & expand(b)) - expand(c))
+                          | expand(d))
+        self.assertEqual(
+            list(takewhile(lambda x: x < hi, combination.iterate_from(start))),
+            expected)
+
+        for value in expected[::7]:
+            self.assertEqual(combination.after(start, value, inclusive=True),
+                             value)
+            self.assertEqual(combination.after(start, value),
+                             expected[expected.index(value) + 1])
+
+            # Within the second following an occurrence.
+            value += timedelta(microseconds=500000)
+            for inclusive in (False, True):
+                self.assertEqual(
+                    combination.after(start, value, inclusive=inclusive),
+                    expected[expected.index(value.replace(microsecond=0))
+                             + 1])
+
+    def test_invalid_operand(self):
+        rule = RecurrenceRule(DAILY)
+        with self.assertRaises(TypeError):
+            rule & 1
+        with self.assertRaises(TypeError):
+            (rule | rule) - 1
+
+
+if __name__ == '__main__':
+    unittest_main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+import wadu
+from wadu import *
+
+
+class TestRuleIndex(TestCase):
+    """Runs tests for the rule index class."""
+
+    def setUp(self):
+        self.items = (
+            (RecurrenceRule(WEEKLY, on_week_days=(MONDAY,), on_hours=(9,)),
+             datetime(1997, 9, 1)),
+            (RecurrenceRule(YEARLY, on_months=(12,), on_month_days=(25,)),
+             datetime(1997, 1, 1)),
+            (RecurrenceRule(DAILY, until=datetime(1997, 9, 30)),
+             datetime(1997, 9, 1)),
+            (RecurrenceRule(MONTHLY, count=2), datetime(1997, 10, 7)),
+            (RecurrenceRule(WEEKLY, interval=2), datetime(1997, 9, 2)),
+        )
+        self.index = RuleIndex(self.items)
+
+    def test_query(self):
+        index = self.index
+        self.assertEqual(index.query(datetime(1997, 9, 1),
+                                     datetime(1997, 9, 2)), [0, 2])
+        self.assertEqual(index.query(datetime(1997, 9, 1, hour=10),
+                                     datetime(1997, 9, 2)), [])
+        self.assertEqual(index.query(datetime(1997, 9, 9),
+                                     datetime(1997, 9, 10)), [2])
+        self.assertEqual(index.query(datetime(1997, 10, 1),
+                                     datetime(1997, 10, 8)), [0, 3])
+        self.assertEqual(index.query(datetime(1997, 12, 25),
+                                     datetime(1997, 12, 26)), [1])
+        self.assertEqual(index.query(datetime(1998, 1, 1),
+                                     datetime(1998, 1, 5)), [])
+        self.assertEqual(index.query(datetime(1996, 1, 1),
+                                     datetime(1997, 9, 1)), [])
+
+    def test_week_day_occurrences(self):
+        # The same week day with different occurrence numbers.
+        index = RuleIndex()
+        key = index.add(RecurrenceRule(MONTHLY,
+                                       on_week_days=(MONDAY(1), MONDAY(-1))),
+                        datetime(1997, 9, 1))
+        self.assertEqual(index.query(datetime(1997, 9, 29),
+                                     datetime(1997, 9, 29, hour=12)), [key])
+        self.assertEqual(index.query(datetime(1997, 10, 6),
+                                     datetime(1997, 10, 6, hour=12)), [key])
+        self.assertEqual(index.query(datetime(1997, 9, 30),
+                                     datetime(1997, 10, 6)), [])
+
+    def test_count(self):
+        index = RuleIndex()
+        key = index.add(RecurrenceRule(DAILY, count=3), datetime(1997, 9, 2))
+        self.assertEqual(index.query(datetime(1997, 9, 4),
+                                     datetime(1997, 9, 5)), [key])
+        self.assertEqual(index.query(datetime(1997, 9, 5),
+                                     datetime(1998, 9, 5)), [])
+
+        key = index.add(RecurrenceRule(DAILY, count=0), datetime(1997, 9, 2))
+        self.assertEqual(index.query(datetime(1997, 9, 1),
+                                     datetime(1997, 9, 3)), [0])
+
+    def test_pruning(self):
+        index = RuleIndex()
+        for _ in range(100):
+            index.add(RecurrenceRule(DAILY, until=datetime(1997, 9, 30)),
+                      datetime(1997, 9, 1))
+            index.add(RecurrenceRule(DAILY, count=5), datetime(1998, 1, 1))
+
+        key = index.add(RecurrenceRule(MONTHLY, on_month_days=(6,)),
+                        datetime(1997, 9, 1))
+
+        # The entries visited and the exact checks are recorded.
+        visits = []
+        checks = []
+        check_node = wadu._check_node
+        find_occurrence = wadu._find_occurrence
+
+        def record_visit(node, *args):
+            visits.append(node.key)
+            return check_node(node, *args)
+
+        def record_check(*args):
+            checks.append(args[1])
+            return find_occurrence(*args)
+
+        wadu._check_node = record_visit
+        wadu._find_occurrence = record_check
+        try:
+            # The entries ended before the range or starting after it.
+            self.assertEqual(index.query(datetime(1997, 10, 6),
+                                         datetime(1997, 10, 7)), [key])
+            self.assertEqual(index.query(datetime(1997, 10, 8),
+                                         datetime(1997, 10, 9)), [])
+            self.assertEqual(set(visits), {key})
+            self.assertEqual(checks, [(1997, 10, 6, 0, 0, 0),
+                                      (1997, 10, 8, 0, 0, 0)])
+
+            # The gap until the next occurrence covers the ranges.
+            self.assertEqual(index.query(datetime(1997, 10, 10),
+                                         datetime(1997, 11, 6)), [])
+            self.assertEqual(index.query(datetime(1997, 11, 6),
+                                         datetime(1997, 11, 7)), [key])
+            self.assertEqual(set(visits), {key})
+            self.assertEqual(len(checks), 2)
+        finally:
+            wadu._check_node = check_node
+            wadu._find_occurrence = find_occurrence
+
+    def test_add_remove(self):
+        index = self.index
+        self.assertEqual(len(index), 5)
+
+        index.remove(0)
+        index.remove(2)
+        self.assertEqual(len(index), 3)
+        self.assertNotIn(0, index)
+        self.assertEqual(index.query(datetime(1997, 9, 1),
+                                     datetime(1997, 9, 3)), [4])
+
+        key = index.add(*self.items[0])
+        self.assertEqual(key, 5)
+        self.assertEqual(index[key], self.items[0])
+        self.assertEqual(index.query(datetime(1997, 9, 1),
+                                     datetime(1997, 9, 3)), [4, 5])
+
+        with self.assertRaises(KeyError):
+            index.remove(0)
+
+
+if __name__ == '__main__':
+    unittest_main()
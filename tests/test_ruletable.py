@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+from itertools import takewhile
+from unittest import (
+    TestCase,
+    main as unittest_main,
+)
+
+from wadu import *
+
+
+class TestRuleTable(TestCase):
+    """Runs tests for the rule table class."""
+
+    def _check(self, items, lo, hi):
+        table = RuleTable(items)
+        self.assertEqual(len(table), len(items))
+
+        expected_idxs = []
+        expected_timestamps = []
+        for i, (rule, start) in enumerate(items):
+            it = takewhile(lambda x: x < hi, rule.iterate_from(start))
+            timestamps = [to_timestamp(x) for x in it if x >= lo]
+            expected_idxs.extend([i] * len(timestamps))
+            expected_timestamps.extend(timestamps)
+
+        idxs, timestamps = table.expand(lo, hi)
+        self.assertEqual(list(idxs), expected_idxs)
+        self.assertEqual(list(timestamps), expected_timestamps)
+        return table
+
+    def test_masks(self):
+        rules = (
+            RecurrenceRule(YEARLY),
+            RecurrenceRule(YEARLY, on_months=(2, 3), on_month_days=(-1,)),
+            RecurrenceRule(MONTHLY, interval=2, on_month_days=(1, 31)),
+            RecurrenceRule(MONTHLY, on_week_days=(SATURDAY, SUNDAY)),
+            RecurrenceRule(WEEKLY, interval=3, on_hours=(9, 17)),
+            RecurrenceRule(WEEKLY, on_week_days=(MONDAY, FRIDAY),
+                           until=datetime(2001, 2, 10)),
+            RecurrenceRule(DAILY, interval=5, on_minutes=(0, 15, 30, 45)),
+        )
+        items = tuple((rules[i % len(rules)],
+                       datetime(2000, 1, 1) + timedelta(days=i * 13,
+                                                        hours=i % 24))
+                      for i in range(70))
+        table = self._check(items,
+                            datetime(2001, 1, 15, hour=12),
+                            datetime(2001, 6, 1))
+        self.assertTrue(all(table._has_masks))
+
+    def test_fallback(self):
+        rules = (
+            RecurrenceRule(YEARLY, on_weeks=(1, 20)),
+            RecurrenceRule(MONTHLY, on_week_days=(FRIDAY(-1),)),
+            RecurrenceRule(MONTHLY, on_week_days=(MONDAY,), on_set_pos=(1,)),
+            RecurrenceRule(WEEKLY, week_start=SUNDAY),
+            RecurrenceRule(DAILY, count=30),
+            RecurrenceRule(HOURLY, interval=7),
+        )
+        items = tuple((rules[i % len(rules)],
+                       datetime(2000, 1, 1) + timedelta(days=i * 3))
+                      for i in range(24))
+        table = self._check(items, datetime(2000, 2, 1), datetime(2000, 8, 1))
+        self.assertFalse(any(table._has_masks))
+
+    def test_items(self):
+        rule = RecurrenceRule(DAILY)
+        table = RuleTable()
+        self.assertEqual(table.append(rule, datetime(2000, 1, 1)), 0)
+        self.assertEqual(table.append(rule, datetime(2000, 1, 2)), 1)
+        self.assertEqual(table[1], (rule, datetime(2000, 1, 2)))
+        self.assertEqual(len(table._rules), 1)
+
+
+if __name__ == '__main__':
+    unittest_main()
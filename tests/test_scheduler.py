@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+_ROOT_PATH = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.abspath(_ROOT_PATH))
+del _ROOT_PATH
+del os
+del sys
+
+# ------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+from unittest import (
+    TestCase,
+    main as unittest_main,
+    skipIf,
+)
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+from wadu import *
+
+
+class TestScheduler(TestCase):
+    """Runs tests for the scheduler class."""
+
+    def test_due(self):
+        scheduler = Scheduler()
+        a = scheduler.add(RecurrenceRule(DAILY, on_hours=(9, 17)),
+                          datetime(1997, 9, 1), 'a')
+        b = scheduler.add(RecurrenceRule(HOURLY, interval=6, count=3),
+                          datetime(1997, 9, 1, hour=3), 'b')
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(scheduler.next_due(), datetime(1997, 9, 1, hour=3))
+
+        self.assertEqual(scheduler.due(datetime(1997, 9, 1, hour=2)), [])
+        self.assertEqual(scheduler.due(datetime(1997, 9, 1, hour=9)), [
+            (datetime(1997, 9, 1, hour=3), b, 'b'),
+            (datetime(1997, 9, 1, hour=9), a, 'a'),
+            (datetime(1997, 9, 1, hour=9), b, 'b'),
+        ])
+        self.assertEqual(scheduler.due(datetime(1997, 9, 2, hour=12)), [
+            (datetime(1997, 9, 1, hour=15), b, 'b'),
+            (datetime(1997, 9, 1, hour=17), a, 'a'),
+            (datetime(1997, 9, 2, hour=9), a, 'a'),
+        ])
+
+        # Exhausted entries are dropped.
+        self.assertNotIn(b, scheduler)
+        self.assertEqual(scheduler.next_due(), datetime(1997, 9, 2, hour=17))
+
+    def test_after(self):
+        scheduler = Scheduler()
+        key = scheduler.add(RecurrenceRule(DAILY), datetime(1997, 9, 1),
+                            after=datetime(2020, 1, 1))
+        self.assertEqual(scheduler.next_due(), datetime(2020, 1, 2))
+        self.assertEqual(scheduler.due(datetime(2020, 1, 3)), [
+            (datetime(2020, 1, 2), key, None),
+            (datetime(2020, 1, 3), key, None),
+        ])
+
+        # Within the second following an occurrence.
+        scheduler.add(RecurrenceRule(DAILY), datetime(1997, 9, 1),
+                      after=datetime(2020, 1, 5, microsecond=500000))
+        self.assertEqual(scheduler.next_due(), datetime(2020, 1, 4))
+        self.assertEqual(len(scheduler.due(datetime(2020, 1, 5))), 2)
+        self.assertEqual(scheduler.next_due(), datetime(2020, 1, 6))
+
+    def test_remove(self):
+        scheduler = Scheduler()
+        rule = RecurrenceRule(DAILY)
+        keys = [scheduler.add(rule, datetime(1997, 9, i)) for i in (1, 2, 3)]
+        scheduler.remove(keys[0])
+        scheduler.remove(keys[2])
+        self.assertEqual(len(scheduler), 1)
+        self.assertEqual(scheduler.next_due(), datetime(1997, 9, 2))
+        self.assertEqual(
+            [x[1] for x in scheduler.due(datetime(1997, 9, 3))],
+            [keys[1], keys[1]])
+
+        with self.assertRaises(KeyError):
+            scheduler.remove(keys[0])
+
+        scheduler.remove(keys[1])
+        self.assertIsNone(scheduler.next_due())
+        self.assertEqual(scheduler.due(datetime(1997, 9, 30)), [])
+
+
+class _Handle(object):
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class _Loop(object):
+    """Event loop running the timers in a simulated time."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.handles = []
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback):
+        handle = _Handle(when, callback)
+        self.handles.append(handle)
+        return handle
+
+    def step(self):
+        handles = [x for x in self.handles if not x.is_cancelled]
+        if not handles:
+            return False
+
+        handle = min(handles, key=lambda x: x.when)
+        self.handles.remove(handle)
+        self.now = max(self.now, handle.when)
+        handle.callback()
+        return True
+
+
+class TestSchedulerRunner(TestCase):
+    """Runs tests for the event loop runner of the scheduler."""
+
+    def test_attach(self):
+        loop = _Loop()
+        origin = datetime(1997, 9, 1, hour=8, minute=59)
+
+        def clock():
+            return origin + timedelta(seconds=loop.time())
+
+        scheduler = Scheduler()
+        fired = []
+
+        def callback(out):
+            fired.extend((loop.time(), x[0], x[2]) for x in out)
+            if len(fired) == 1:
+                # Adding an earlier entry brings the wake up time forward.
+                scheduler.add(RecurrenceRule(SECONDLY, count=2),
+                              datetime(1997, 9, 1, hour=9, second=2),
+                              'b')
+
+        scheduler.add(RecurrenceRule(MINUTELY, interval=5, count=2),
+                      datetime(1997, 9, 1, hour=9), 'a')
+        scheduler.attach(loop, callback, clock)
+        while loop.step():
+            pass
+
+        self.assertEqual(fired, [
+            (60.0, datetime(1997, 9, 1, hour=9), 'a'),
+            (62.0, datetime(1997, 9, 1, hour=9, second=2), 'b'),
+            (63.0, datetime(1997, 9, 1, hour=9, second=3), 'b'),
+            (360.0, datetime(1997, 9, 1, hour=9, minute=5), 'a'),
+        ])
+
+    def test_detach(self):
+        loop = _Loop()
+        scheduler = Scheduler()
+        scheduler.add(RecurrenceRule(DAILY), datetime(1997, 9, 1))
+        scheduler.attach(loop, lambda out: None,
+                         lambda: datetime(1997, 8, 31))
+        scheduler.detach()
+        self.assertFalse(loop.step())
+
+    @skipIf(asyncio is None, "asyncio is not available")
+    def test_asyncio(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        scheduler = Scheduler()
+        scheduler.add(RecurrenceRule(DAILY, count=3), datetime(1997, 9, 1),
+                      'a')
+        fired = []
+
+        def callback(out):
+            fired.extend(out)
+            scheduler.detach()
+            loop.stop()
+
+        scheduler.attach(loop, callback)
+        loop.call_later(5.0, loop.stop)
+        loop.run_forever()
+        self.assertEqual([x[0] for x in fired], [
+            datetime(1997, 9, 1),
+            datetime(1997, 9, 2),
+            datetime(1997, 9, 3),
+        ])
+
+
+if __name__ == '__main__':
+    unittest_main()
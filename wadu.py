@@ -8,11 +8,25 @@
 
 """Recurrence rules for calendar events."""
 
-from bisect import bisect_left
-from collections import namedtuple
-from datetime import datetime
-from operator import attrgetter
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from datetime import date, datetime
+from functools import partial, reduce
+from itertools import islice
+from operator import attrgetter, or_
 from sys import version_info
+from timeit import default_timer
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import random
+import struct
+import threading
 
 
 __title__   = 'wadu'
@@ -26,8 +40,14 @@ __license__ = "Unlicense"
 
 if version_info[0] == 2:
     _range = xrange
+
+    # There's no typecode for 64-bit integers, longs are used where they are
+    # large enough, and doubles otherwise since they can still represent the
+    # timestamps exactly.
+    _INT64_TYPECODE = 'l' if array('l').itemsize >= 8 else 'd'
 else:
     _range = range
+    _INT64_TYPECODE = 'q'
 
 
 _MAX_YEAR = 9999
@@ -103,6 +123,12 @@ FRIDAY    = WeekDay(5)
 SATURDAY  = WeekDay(6)
 SUNDAY    = WeekDay(7)
 
+FOLLOWING          = 0
+PRECEDING          = 1
+MODIFIED_FOLLOWING = 2
+MODIFIED_PRECEDING = 3
+SKIP               = 4
+
 
 #   Helpers
 # ------------------------------------------------------------------------------
@@ -386,6 +412,27 @@ def _normalize_dttm(year,    # type: int
     return (year, month, day, hour, minute, second)
 
 
+# Ordinal date of the epoch used for timestamps, that is 1970-01-01.
+_EPOCH_ORD_DT = 719163
+
+
+def _get_timestamp(year, month, day, hour, minute, second):
+    # type: (int, int, int, int, int, int) -> int
+    """Retrieves the number of seconds elapsed since the epoch."""
+    return ((_get_ord_dt(year, month, day) - _EPOCH_ORD_DT) * 86400
+            + hour * 3600 + minute * 60 + second)
+
+
+def _get_dttm_from_timestamp(timestamp):
+    # type: (int) -> Tuple[int, int, int, int, int, int]
+    """Retrieves a date time from a number of seconds since the epoch."""
+    days, seconds = divmod(timestamp, 86400)
+    dt = date.fromordinal(days + _EPOCH_ORD_DT)
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+    return (dt.year, dt.month, dt.day, hour, minute, second)
+
+
 #   Start Date Adjustment
 # ------------------------------------------------------------------------------
 
@@ -498,7 +545,10 @@ def _get_monthly_doys_range(year, month, day, is_leap, iso_offset):
 def _get_weekly_doys_range(year, month, day, is_leap, iso_offset):
     # type: (int, int, int, int, int) -> Tuple[int, ...]
     """Retrieves the day of year's range for a weekly frequency."""
-    doy = _DOY_COUNT[is_leap][month - 1] + day - 1
+    # The day might belong to the year preceding the logical year.
+    logical_year = _get_weekly_logical_year(year, month, day)
+    doy = (_get_ord_dt(year, month, day)
+           - _get_day_count_before_year(logical_year) - 1)
     week = (doy - iso_offset) // 7
     begin = week * 7 + iso_offset
     return tuple(_range(begin, begin + 7))
@@ -896,7 +946,7 @@ def _handle_weeks_prop(values,  # type: Sequence[int]
     begin = bisect_left(weeks, -week_count)
     end = bisect_left(weeks, week_count + 1)
     weeks = weeks[begin:end]
-    weeks = sorted(x % (week_count + 1) - 1 for x in weeks)
+    weeks = sorted(set(x % (week_count + 1) - 1 for x in weeks))
 
     if freq >= WEEKLY:
         return tuple(x for x in values
@@ -934,7 +984,7 @@ def _handle_year_days_prop(values,     # type: Sequence[int]
     begin = bisect_left(year_days, -doy_count)
     end = bisect_left(year_days, doy_count + 1)
     year_days = year_days[begin:end]
-    year_days = sorted(x % (doy_count + 1) - 1 for x in year_days)
+    year_days = sorted(set(x % (doy_count + 1) - 1 for x in year_days))
 
     # Retrieve the values for this property.
     return tuple(x for x in year_days if x in values)
@@ -970,7 +1020,7 @@ def _handle_month_days_prop(values,      # type: Sequence[int]
         begin = bisect_left(doms, -day_count)
         end = bisect_left(doms, day_count + 1)
         doms = doms[begin:end]
-        doms = sorted(x % (day_count + 1) - 1 for x in doms)
+        doms = sorted(set(x % (day_count + 1) - 1 for x in doms))
 
         # Retrieve the values for the current month.
         doys_per_month.append(tuple(doy_count[month] + x for x in doms))
@@ -1213,6 +1263,12 @@ def _get_dt_set(
     # belong to a year when the week belongs to another year.
     # The logical year represents the actual year for the current
     # range of dates to process.
+    if freq == WEEKLY:
+        ord_dt = _get_ord_dt(year, month, day)
+        ord_dt -= (ord_dt - 1 - sow_offset) % 7
+        dt = date.fromordinal(ord_dt)
+        year, month, day = dt.year, dt.month, dt.day
+
     logical_year = _GET_LOGICAL_YEAR_FNS[freq](year, month, day)
 
     # Retrieve the first day of the logical year as an ordinal date.
@@ -1259,9 +1315,1265 @@ def _get_tm_set(hour, minute, second, freq, props):
     return out
 
 
+#   Iteration
+# ------------------------------------------------------------------------------
+
+# Maximum number of iteration contexts cached by each rule.
+_CONTEXT_CACHE_SIZE = 256
+
+# Locks shared by all the rules to guard the construction of their cached
+# contexts. Lookups don't require any lock.
+_CACHE_LOCKS = tuple(threading.Lock() for _ in _range(16))
+
+
+_IterContext = namedtuple(
+    'IterContext', (
+        'freq',                   # int
+        'interval',               # int
+        'start',                  # Tuple[int, int, int, int, int, int]
+        'until',                  # Tuple[int, int, int, int, int, int]
+        'count',                  # Optional[int]
+        'on_set_pos',             # Optional[Sequence[int]]
+        'sow_offset',             # int
+        'on_week_days_woy_freq',  # int
+        'dt_props',               # Tuple[_Property, ...]
+        'tm_props',               # Tuple[_Property, ...]
+        'rule',                   # RecurrenceRule
+    ))
+
+
+def _get_dttm_set(context, anchor):
+    # type: (_IterContext, Tuple[int, int, int, int, int, int]) -> Tuple
+    """Retrieves the sorted date time set of the period at the given anchor."""
+    if anchor[0] > _MAX_YEAR:
+        return ()
+
+    if (not context.dt_props
+            and not context.tm_props
+            and context.on_set_pos is None):
+        return (anchor,)
+
+    year, month, day, hour, minute, second = anchor
+
+    # Retrieve the date and time sets.
+    if context.dt_props:
+        dt_set = _get_dt_set(year,
+                             month,
+                             day,
+                             context.freq,
+                             context.start,
+                             context.sow_offset,
+                             context.on_week_days_woy_freq,
+                             context.dt_props)
+        if dt_set is None:
+            return ()
+    else:
+        dt_set = ((year, month, day),)
+
+    if context.tm_props:
+        tm_set = _get_tm_set(
+            hour, minute, second, context.freq, context.tm_props)
+        if tm_set is None:
+            return ()
+    else:
+        tm_set = ((hour, minute, second),)
+
+    return _combine_sets(context, dt_set, tm_set)
+
+
+def _get_shared_dttm_set(dt_sets, tm_sets, context, anchor):
+    # type: (Dict, Dict, _IterContext, Tuple[int, ...]) -> Tuple
+    """Retrieves the date time set of a period using caches of sets.
+
+    The caches can be shared between the contexts having the same properties.
+    The date sets are cached by the part of the anchor that they depend on,
+    and the time sets by the time of the anchor.
+    """
+    if anchor[0] > _MAX_YEAR:
+        return ()
+
+    if (not context.dt_props
+            and not context.tm_props
+            and context.on_set_pos is None):
+        return (anchor,)
+
+    year, month, day, hour, minute, second = anchor
+
+    if context.dt_props:
+        freq = context.freq
+        if freq == YEARLY:
+            key = year
+        elif freq == MONTHLY:
+            key = (year, month)
+        else:
+            key = _get_ord_dt(year, month, day)
+            if freq == WEEKLY:
+                key -= (key - 1 - context.sow_offset) % 7
+
+        if key in dt_sets:
+            dt_set = dt_sets[key]
+        else:
+            dt_set = dt_sets[key] = _get_dt_set(
+                year,
+                month,
+                day,
+                freq,
+                context.start,
+                context.sow_offset,
+                context.on_week_days_woy_freq,
+                context.dt_props)
+
+        if dt_set is None:
+            return ()
+    else:
+        dt_set = ((year, month, day),)
+
+    if context.tm_props:
+        key = (hour, minute, second)
+        if key in tm_sets:
+            tm_set = tm_sets[key]
+        else:
+            tm_set = tm_sets[key] = _get_tm_set(
+                hour, minute, second, context.freq, context.tm_props)
+
+        if tm_set is None:
+            return ()
+    else:
+        tm_set = ((hour, minute, second),)
+
+    return _combine_sets(context, dt_set, tm_set)
+
+
+def _combine_sets(context, dt_set, tm_set):
+    # type: (_IterContext, Tuple, Tuple) -> Tuple
+    """Combines the date and time sets of a period."""
+    dttm_set = tuple(x + y for x in dt_set for y in tm_set)
+
+    if context.on_set_pos is not None:
+        # Wrap around negative set positions. Also convert them into 0-based
+        # indices.
+        on_set_pos = context.on_set_pos
+        begin = bisect_left(on_set_pos, -len(dttm_set))
+        end = bisect_left(on_set_pos, len(dttm_set) + 1)
+        on_set_pos = on_set_pos[begin:end]
+        on_set_pos = sorted(set(x % (len(dttm_set) + 1) - 1
+                                for x in on_set_pos))
+
+        # Filter the date and time set based on the set positions.
+        dttm_set = tuple(dttm_set[i] for i in on_set_pos)
+
+    return dttm_set
+
+
+def _get_period_anchor(context, index):
+    # type: (_IterContext, int) -> Tuple[int, int, int, int, int, int]
+    """Retrieves the anchor of the n-th period following the start.
+
+    This is equivalent to advancing the start ‘index’ times but it runs in
+    constant time.
+    """
+    freq = context.freq
+    units = index * context.interval
+    if freq <= MONTHLY:
+        return _ADVANCE_DTTM_FNS[freq](*(context.start + (units,)))
+
+    year, month, day, hour, minute, second = context.start
+    if freq == WEEKLY:
+        days = units * 7
+    elif freq == DAILY:
+        days = units
+    else:
+        seconds = (hour * 3600 + minute * 60 + second
+                   + units * (3600, 60, 1)[freq - HOURLY])
+        days, seconds = divmod(seconds, 86400)
+        hour, seconds = divmod(seconds, 3600)
+        minute, second = divmod(seconds, 60)
+
+    dt = date.fromordinal(_get_ord_dt(year, month, day) + days)
+    return (dt.year, dt.month, dt.day, hour, minute, second)
+
+
+def _get_period_index(context, dttm):
+    # type: (_IterContext, Tuple[int, int, int, int, int, int]) -> int
+    """Retrieves the index of the period that a date time falls into.
+
+    The index is only an estimate based on the calendar, periods with a
+    yearly frequency might also include a few days from the adjacent years.
+    """
+    freq = context.freq
+    start = context.start
+    if freq == YEARLY:
+        units = dttm[0] - start[0]
+    elif freq == MONTHLY:
+        units = (dttm[0] - start[0]) * 12 + dttm[1] - start[1]
+    else:
+        lo = _get_ord_dt(*start[:3])
+        hi = _get_ord_dt(*dttm[:3])
+        if freq == WEEKLY:
+            sow_offset = context.sow_offset
+            lo -= (lo - 1 - sow_offset) % 7
+            hi -= (hi - 1 - sow_offset) % 7
+            units = (hi - lo) // 7
+        else:
+            units = hi - lo
+            if freq >= HOURLY:
+                units = units * 24 + dttm[3] - start[3]
+            if freq >= MINUTELY:
+                units = units * 60 + dttm[4] - start[4]
+            if freq >= SECONDLY:
+                units = units * 60 + dttm[5] - start[5]
+
+    return units // context.interval
+
+
+def _get_period_index_start(context, index):
+    # type: (_IterContext, int) -> int
+    """Retrieves the timestamp from which a period index is estimated.
+
+    This is the inverse of ‘_get_period_index()’.
+    """
+    freq = context.freq
+    start = context.start
+    units = index * context.interval
+    if freq == YEARLY:
+        return _get_timestamp(start[0] + units, 1, 1, 0, 0, 0)
+    elif freq == MONTHLY:
+        years, month = divmod(start[1] - 1 + units, 12)
+        return _get_timestamp(start[0] + years, month + 1, 1, 0, 0, 0)
+
+    ord_dt = _get_ord_dt(*start[:3])
+    if freq == WEEKLY:
+        ord_dt -= (ord_dt - 1 - context.sow_offset) % 7
+        return (ord_dt + units * 7 - _EPOCH_ORD_DT) * 86400
+
+    timestamp = (ord_dt - _EPOCH_ORD_DT) * 86400
+    if freq == DAILY:
+        return timestamp + units * 86400
+    elif freq == HOURLY:
+        return timestamp + (start[3] + units) * 3600
+    elif freq == MINUTELY:
+        return timestamp + (start[3] * 60 + start[4] + units) * 60
+
+    return timestamp + start[3] * 3600 + start[4] * 60 + start[5] + units
+
+
+def _locate(context, dttm):
+    # type: (_IterContext, Tuple[int, ...]) -> Optional[Tuple[int, Tuple, int]]
+    """Locates a date time within the periods' sets.
+
+    The result is a tuple containing the index of the period, its anchor, and
+    the position of the date time within the period's set, or ‘None’ if the
+    date time isn't part of any set.
+    """
+    index = _get_period_index(context, dttm)
+    for candidate in (index, index + 1, index - 1):
+        if candidate < 0:
+            continue
+
+        try:
+            anchor = _get_period_anchor(context, candidate)
+        except (OverflowError, ValueError):
+            continue
+
+        dttm_set = _get_dttm_set(context, anchor)
+        pos = bisect_right(dttm_set, dttm) - 1
+        if pos >= 0 and dttm_set[pos] == dttm:
+            return (candidate, anchor, pos)
+
+    return None
+
+
+def _is_valid_dt(year, month, day):
+    # type: (int, int, int) -> bool
+    """Checks whether a date exists in the calendar."""
+    return (year <= _MAX_YEAR
+            and day <= _DOM_COUNT[_is_leap_year(year)][month - 1])
+
+
+def _get_last_anchor_year(context):
+    # type: (_IterContext) -> int
+    """Retrieves the year past which the periods can't have any occurrence.
+
+    The sets of a period can't spill over more than a year from its anchor,
+    so the periods anchored more than a year after the end date are all
+    empty, even for the rules whose sets are never filled.
+    """
+    return min(context.until[0] + 1, _MAX_YEAR)
+
+
+def _count_occurrences(context, index, get_set=_get_dttm_set):
+    # type: (_IterContext, int, Callable) -> int
+    """Counts the occurrences emitted by the periods preceding the n-th one.
+
+    Only the size of each period's set is considered, without building any
+    date object, and the counting stops as soon as the rule is exhausted.
+    """
+    return _get_prefix_counts(context, (index,), get_set)[0]
+
+
+def _get_prefix_counts(context, indices, get_set=_get_dttm_set):
+    # type: (_IterContext, Sequence[int], Callable) -> List[int]
+    """Counts the occurrences emitted by the periods preceding each given one.
+
+    The indices are expected to be sorted, all the counts are then retrieved
+    within a single pass over the periods.
+    """
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    last_year = _get_last_anchor_year(context)
+
+    anchor = start
+    index = 0
+    count = 0
+    is_exhausted = False
+    out = []
+    for target in indices:
+        while not is_exhausted and index < target:
+            if anchor[0] > last_year:
+                is_exhausted = True
+                break
+
+            for dttm in get_set(context, anchor):
+                if dttm > until:
+                    is_exhausted = True
+                    break
+
+                if dttm < start or not _is_valid_dt(*dttm[:3]):
+                    continue
+
+                count += 1
+                if limit is not None and count >= limit:
+                    is_exhausted = True
+                    break
+
+            anchor = advance_dttm(*(anchor + (interval,)))
+            index += 1
+
+        out.append(count)
+
+    return out
+
+
+def _get_cumulative_counts(context, index, stop, count):
+    # type: (_IterContext, int, int, int) -> array
+    """Counts the occurrences emitted before each period of a range.
+
+    The first value is the number of occurrences emitted before the first
+    period, as given, and the last one is the number emitted before the end
+    period.
+    """
+    out = array(_INT64_TYPECODE, (count,))
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    try:
+        anchor = _get_period_anchor(context, index)
+    except (OverflowError, ValueError):
+        anchor = None
+
+    last_year = _get_last_anchor_year(context)
+    is_exhausted = (anchor is None
+                    or (limit is not None and count >= limit))
+    for i in _range(stop - index):
+        if is_exhausted or anchor[0] > last_year:
+            out.extend(array(_INT64_TYPECODE, (count,)) * (stop - index - i))
+            break
+
+        for dttm in _get_dttm_set(context, anchor):
+            if dttm > until:
+                is_exhausted = True
+                break
+
+            if dttm < start or not _is_valid_dt(*dttm[:3]):
+                continue
+
+            count += 1
+            if limit is not None and count >= limit:
+                is_exhausted = True
+                break
+
+        out.append(count)
+        anchor = advance_dttm(*(anchor + (interval,)))
+
+    return out
+
+
+def _seek(context, dttm, get_set=_get_dttm_set):
+    # type: (_IterContext, Tuple, Callable) -> Tuple[Tuple[int, ...], int]
+    """Retrieves an iteration state shortly preceding a date time.
+
+    The state is made of the anchor of a period and of the number of
+    occurrences emitted before it. Iterating from there might still output a
+    few occurrences preceding the date time. Unless the rule is bounded by a
+    count, this runs in constant time.
+    """
+    index = max(_get_period_index(context, dttm) - 1, 0)
+    anchor = _get_period_anchor(context, index)
+    if context.count is None:
+        count = 0
+    else:
+        count = _count_occurrences(context, index, get_set)
+
+    return (anchor, count)
+
+
+def _iterate_from_dttm(context, dttm):
+    # type: (_IterContext, Tuple[int, ...]) -> RecurrenceIterator
+    """Iterates over the occurrences not preceding a date time."""
+    anchor, count = _seek(context, dttm)
+    it = RecurrenceIterator(context, anchor, 0, count)
+    it._skip_to(dttm)
+    return it
+
+
+def _iterate_dttms(context, anchor, count, get_set=_get_dttm_set):
+    # type: (_IterContext, Tuple, int, Callable) -> Iterator[Tuple[int, ...]]
+    """Iterates over the occurrences as tuples, starting from a period.
+
+    This avoids building any date object for consumers that only need the
+    date time values.
+    """
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    if limit is not None and count >= limit:
+        return
+
+    last_year = _get_last_anchor_year(context)
+    while anchor[0] <= last_year:
+        for dttm in get_set(context, anchor):
+            if dttm > until:
+                return
+
+            if dttm < start or not _is_valid_dt(*dttm[:3]):
+                continue
+
+            yield dttm
+
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+        anchor = advance_dttm(*(anchor + (interval,)))
+
+
+def _expand_timestamps(context, lo, hi, get_set=_get_dttm_set):
+    # type: (_IterContext, Tuple, Tuple, Callable) -> array
+    """Expands the occurrences within a half-open range into timestamps."""
+    out = array(_INT64_TYPECODE)
+    anchor, count = _seek(context, lo, get_set)
+    for dttm in _iterate_dttms(context, anchor, count, get_set):
+        if dttm >= hi:
+            break
+
+        if dttm >= lo:
+            out.append(_get_timestamp(*dttm))
+
+    return out
+
+
+def _get_extent(context):
+    # type: (_IterContext) -> Tuple[int, Optional[Tuple[int, ...]]]
+    """Retrieves the number of occurrences of a finite rule and its last one.
+
+    The daily rules without date properties and the weekly rules only
+    filtering week days have the same number of occurrences in every period,
+    the period holding the last occurrence is then directly computed. Other
+    rules are walked period by period, only looking at the size of each set.
+    """
+    if context.count is not None and context.count < 1:
+        return (0, None)
+
+    if ((context.freq == DAILY and not context.dt_props)
+            or (context.freq == WEEKLY
+                and all(x.kind == _PROP_ON_WEEK_DAYS
+                        for x in context.dt_props))):
+        return _get_regular_extent(context)
+
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    last_year = _get_last_anchor_year(context)
+
+    anchor = start
+    total = 0
+    last = None
+    while anchor[0] <= last_year:
+        dttm_set = _get_dttm_set(context, anchor)
+        stop = bisect_right(dttm_set, until)
+        dttms = [x for x in dttm_set[bisect_left(dttm_set, start):stop]
+                 if _is_valid_dt(*x[:3])]
+        if limit is not None and total + len(dttms) >= limit:
+            return (limit, dttms[limit - total - 1])
+
+        if dttms:
+            total += len(dttms)
+            last = dttms[-1]
+
+        if stop < len(dttm_set):
+            break
+
+        anchor = advance_dttm(*(anchor + (interval,)))
+
+    return (total, last)
+
+
+def _get_regular_extent(context):
+    # type: (_IterContext) -> Tuple[int, Optional[Tuple[int, ...]]]
+    """Retrieves the extent of a rule having a same set size in each period.
+
+    Only the first period, that is cut by the start date, and the periods
+    holding either the n-th occurrence or the end date are computed.
+    """
+    start = context.start
+    until = context.until
+    limit = context.count
+
+    first_set = _get_dttm_set(context, start)
+    size = len(first_set)
+    first_set = first_set[bisect_left(first_set, start):
+                          bisect_right(first_set, until)]
+    if limit is not None and len(first_set) >= limit:
+        return (limit, first_set[limit - 1])
+
+    if limit is not None and size:
+        index, pos = divmod(limit - len(first_set) - 1, size)
+        try:
+            anchor = _get_period_anchor(context, index + 1)
+        except (OverflowError, ValueError):
+            anchor = None
+
+        if anchor is not None:
+            dttm = _get_dttm_set(context, anchor)[pos]
+            if dttm <= until:
+                return (limit, dttm)
+
+    index = _get_period_index(context, until)
+    if not size or index < 1:
+        return (len(first_set), first_set[-1] if first_set else None)
+
+    try:
+        dttm_set = _get_dttm_set(context, _get_period_anchor(context, index))
+    except (OverflowError, ValueError):
+        dttm_set = ()
+
+    stop = bisect_right(dttm_set, until)
+    if stop:
+        return (len(first_set) + (index - 1) * size + stop,
+                dttm_set[stop - 1])
+
+    if index > 1:
+        dttm_set = _get_dttm_set(context,
+                                 _get_period_anchor(context, index - 1))
+        return (len(first_set) + (index - 1) * size, dttm_set[-1])
+
+    return (len(first_set), first_set[-1] if first_set else None)
+
+
+def _contains_many(context, timestamps):
+    # type: (_IterContext, Sequence[int]) -> array
+    """Checks whether each timestamp of a sorted sequence is an occurrence.
+
+    The timestamps are grouped by the periods they are estimated to fall
+    into. The set of each period is computed once and its occurrences are
+    looked up through a bisection, so the cost doesn't depend on the number
+    of timestamps within a period.
+    """
+    out = array('b', (0,)) * len(timestamps)
+    until = context.until
+    if context.count is not None:
+        until = min(until, context.rule._get_extent(context)[1]
+                    or context.start)
+
+    lo = bisect_left(timestamps, _get_timestamp(*context.start))
+    hi = bisect_right(timestamps, _get_timestamp(*until))
+
+    masks = _get_row_masks(context.rule, context.start)
+    if masks is not None:
+        _match_timestamps(context, masks, timestamps, lo, hi, out)
+        return out
+
+    i = lo
+    evaluated = -1
+    while i < hi:
+        index = _get_period_index(context,
+                                  _get_dttm_from_timestamp(timestamps[i]))
+
+        # Yearly periods might include a few days of the adjacent years.
+        if context.freq == YEARLY:
+            candidates = _range(max(index - 1, evaluated + 1, 0), index + 2)
+        else:
+            candidates = (index,)
+
+        for candidate in candidates:
+            try:
+                anchor = _get_period_anchor(context, candidate)
+            except (OverflowError, ValueError):
+                continue
+
+            for dttm in _get_dttm_set(context, anchor):
+                if (dttm < context.start
+                        or dttm > until
+                        or not _is_valid_dt(*dttm[:3])):
+                    continue
+
+                timestamp = _get_timestamp(*dttm)
+                j = bisect_left(timestamps, timestamp, lo, hi)
+                while j < hi and timestamps[j] == timestamp:
+                    out[j] = 1
+                    j += 1
+
+        evaluated = candidates[-1] if candidates else evaluated
+        i = bisect_left(timestamps,
+                        _get_period_index_start(context, index + 1),
+                        i + 1,
+                        hi)
+
+    return out
+
+
+def _match_timestamps(context, masks, timestamps, lo, hi, out):
+    # type: (_IterContext, Tuple[int, ...], Sequence[int], int, int, array) -> None
+    """Flags the timestamps matching the masks of a rule.
+
+    The timestamps are grouped by day, and each day is matched against the
+    date masks only once.
+    """
+    start = context.start
+    offsets = _get_time_offsets(start, *masks[3:])
+    is_aligned = _get_alignment_fn(context.freq, context.interval, start)
+    lo_ts = timestamps[lo] if lo < hi else 0
+    hi_ts = timestamps[hi - 1] + 1 if lo < hi else 0
+    i = lo
+    while i < hi:
+        ord_dt = timestamps[i] // 86400 + _EPOCH_ORD_DT
+        day_ts = (ord_dt - _EPOCH_ORD_DT) * 86400
+        dt = date.fromordinal(ord_dt)
+        year, month, day = dt.year, dt.month, dt.day
+        days = _match_days(
+            (_Day(ord_dt,
+                  day_ts,
+                  year,
+                  month,
+                  day,
+                  _DOM_COUNT[_is_leap_year(year)][month - 1] - day + 1,
+                  (ord_dt - 1) % 7),),
+            *masks[:3])
+        if days and (is_aligned is None or is_aligned(days[0])):
+            for offset in offsets:
+                timestamp = day_ts + offset
+                if not lo_ts <= timestamp < hi_ts:
+                    continue
+
+                j = bisect_left(timestamps, timestamp, i, hi)
+                while j < hi and timestamps[j] == timestamp:
+                    out[j] = 1
+                    j += 1
+
+        i = bisect_left(timestamps, day_ts + 86400, i + 1, hi)
+
+
+def _iterate_periods(context):
+    # type: (_IterContext) -> Iterator[Period]
+    """Iterates over the periods and their occurrences."""
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    anchor = start
+    index = 0
+    count = 0
+    last_year = _get_last_anchor_year(context)
+    while anchor[0] <= last_year:
+        out = []
+        is_exhausted = False
+        for dttm in _get_dttm_set(context, anchor):
+            if dttm > until:
+                is_exhausted = True
+                break
+
+            if dttm < start:
+                continue
+
+            try:
+                out.append(datetime(*dttm))
+            except ValueError:
+                # Skip any date that falls on an invalid date.
+                continue
+
+            count += 1
+            if limit is not None and count >= limit:
+                is_exhausted = True
+                break
+
+        if is_exhausted:
+            if out:
+                yield Period(index, anchor, tuple(out))
+
+            return
+
+        yield Period(index, anchor, tuple(out))
+
+        anchor = advance_dttm(*(anchor + (interval,)))
+        index += 1
+
+
+def _iterate_chunks(it, size):
+    # type: (RecurrenceIterator, int) -> Iterator[List[datetime]]
+    """Iterates over the occurrences in lists of a given size."""
+    while True:
+        out = []
+        is_exhausted = False
+        while not is_exhausted and len(out) < size:
+            is_exhausted = it._take(out, size - len(out), size)
+
+        if out:
+            yield out
+
+        if is_exhausted:
+            return
+
+
+def _get_period_range(context, lo, hi):
+    # type: (_IterContext, Tuple[int, ...], Tuple[int, ...]) -> Tuple[int, int]
+    """Retrieves the range of periods covering a half-open range of dates.
+
+    The range is a bit wider than strictly required since the period indices
+    are only estimates. It doesn't extend past the end date of the rule.
+    """
+    begin = max(_get_period_index(context, lo) - 1, 0)
+    end = max(_get_period_index(context, min(hi, context.until)) + 2, begin)
+    return (begin, end)
+
+
+def _iterate_period_dttms(context, index, stop, count, hi):
+    # type: (_IterContext, int, int, int, Tuple) -> Iterator[Tuple[int, ...]]
+    """Iterates over the occurrences of a range of periods as tuples.
+
+    The number of occurrences emitted before the first period is required
+    to honour the count of the rule, if any, and the iteration stops before
+    the given end date.
+    """
+    start = context.start
+    until = context.until
+    limit = context.count
+    interval = context.interval
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+
+    if limit is not None and count >= limit:
+        return
+
+    try:
+        anchor = _get_period_anchor(context, index)
+    except (OverflowError, ValueError):
+        return
+
+    for _ in _range(stop - index):
+        if anchor[0] > _MAX_YEAR:
+            break
+
+        for dttm in _get_dttm_set(context, anchor):
+            if dttm > until or dttm >= hi:
+                return
+
+            if dttm < start or not _is_valid_dt(*dttm[:3]):
+                continue
+
+            yield dttm
+
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+        anchor = advance_dttm(*(anchor + (interval,)))
+
+
+def _expand_periods(context, index, stop, count, lo, hi):
+    # type: (_IterContext, int, int, int, Tuple, Tuple) -> array
+    """Expands the occurrences of a range of periods into timestamps.
+
+    The number of occurrences emitted before the first period is required
+    to honour the count of the rule, if any, and only the occurrences within
+    the half-open range of dates are kept.
+    """
+    return array(_INT64_TYPECODE, (_get_timestamp(*x)
+                       for x in _iterate_period_dttms(context, index, stop,
+                                                      count, hi)
+                       if x >= lo))
+
+
+def _has_occurrence(context, lo, hi):
+    # type: (_IterContext, Tuple[int, ...], Tuple[int, ...]) -> bool
+    """Checks whether there is any occurrence within a half-open range.
+
+    Only the periods covering the range are visited, even for the rules
+    without any occurrence for a long time.
+    """
+    index, stop = _get_period_range(context, lo, hi)
+    if context.count is None:
+        count = 0
+    else:
+        count = _count_occurrences(context, index)
+
+    return any(x >= lo
+               for x in _iterate_period_dttms(context, index, stop, count, hi))
+
+
+def _find_occurrence(context, lo, hi):
+    # type: (_IterContext, Tuple[int, ...], Tuple[int, ...]) -> Optional[Tuple]
+    """Finds the first occurrence not preceding a date, if any.
+
+    Only the periods covering the half-open range are visited, so that none
+    is found if there isn't any within the range, though the one found can
+    follow the range.
+    """
+    index, stop = _get_period_range(context, lo, hi)
+    if context.count is None:
+        count = 0
+    else:
+        count = _count_occurrences(context, index)
+
+    return next((x for x in _iterate_period_dttms(context, index, stop, count,
+                                                  _MAX_DTTM)
+                 if x >= lo),
+                None)
+
+
 #   Public API
 # ------------------------------------------------------------------------------
 
+def to_timestamp(dttm):
+    # type: (datetime) -> int
+    """Converts a date time into a number of seconds since the epoch.
+
+    The date time is considered to be naive, that is any time zone
+    information is ignored.
+    """
+    return _get_timestamp(*dttm.timetuple()[:6])
+
+
+def from_timestamp(timestamp):
+    # type: (int) -> datetime
+    """Converts a number of seconds since the epoch into a date time."""
+    return datetime(*_get_dttm_from_timestamp(timestamp))
+
+
+class Cursor(namedtuple('Cursor', ('fingerprint',
+                                   'start',
+                                   'anchor',
+                                   'pos',
+                                   'count'))):
+    """Serializable state of an iteration.
+
+    It holds the fingerprint of the rule, the start date, the anchor of the
+    current period, the position within that period's set, and the number of
+    occurrences emitted so far.
+    """
+
+    __slots__ = ()
+
+    # Format version, fingerprint, start date, anchor, position, and count.
+    _STRUCT = struct.Struct('<B8sH5BH5BIQ')
+    _FORMAT = 1
+
+    def encode(self):
+        # type: () -> str
+        """Encodes the cursor into a compact and opaque token."""
+        data = self._STRUCT.pack(*((self._FORMAT,
+                                    binascii.unhexlify(self.fingerprint))
+                                   + self.start
+                                   + self.anchor
+                                   + (self.pos, self.count)))
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def decode(cls, token):
+        # type: (str) -> Cursor
+        """Decodes a cursor from a token."""
+        data = token.encode('ascii')
+        data += b'=' * (-len(data) % 4)
+        try:
+            values = cls._STRUCT.unpack(base64.urlsafe_b64decode(data))
+        except (TypeError, ValueError, struct.error, binascii.Error):
+            raise ValueError("Invalid cursor '{}'.".format(token))
+
+        if values[0] != cls._FORMAT:
+            raise ValueError("Unsupported cursor '{}'.".format(token))
+
+        return cls(binascii.hexlify(values[1]).decode('ascii'),
+                   values[2:8],
+                   values[8:14],
+                   values[14],
+                   values[15])
+
+
+class Shard(namedtuple('Shard', ('fingerprint',
+                                 'start',
+                                 'index',
+                                 'stop',
+                                 'count',
+                                 'lo',
+                                 'hi'))):
+    """Self-contained slice of the expansion of a rule over a window.
+
+    It holds the fingerprint of the rule, the start date, the indices of the
+    first and end periods, the number of occurrences emitted before the first
+    period, and the half-open window. Dates are stored as tuples so that the
+    shard can be serialized as plain values.
+    """
+
+    __slots__ = ()
+
+
+class Period(namedtuple('Period', ('index', 'anchor', 'occurrences'))):
+    """Occurrences of a single period of a rule.
+
+    It holds the index of the period following the start date, the anchor
+    of the period, and the sorted occurrences within that period. The anchor
+    is a tuple of date time values since it isn't always a valid date, such
+    as February 31st for a monthly rule starting on a 31st.
+    """
+
+    __slots__ = ()
+
+
+class RecurrenceIterator(object):
+    """Iterator over the occurrences of a rule.
+
+    Its state can be captured at any point with ‘cursor()’ and later resumed
+    with ‘RecurrenceRule.iterate_from_cursor()’.
+    """
+
+    __slots__ = (
+        '_context',
+        '_anchor',
+        '_pos',
+        '_count',
+        '_set',
+    )
+
+    def __init__(self, context, anchor, pos, count):
+        # type: (_IterContext, Tuple[int, ...], int, int) -> None
+        self._context = context
+        self._anchor = anchor
+        self._pos = pos
+        self._count = count
+        self._set = None
+
+    def __iter__(self):
+        # type: () -> RecurrenceIterator
+        return self
+
+    def __reduce__(self):
+        # type: () -> Tuple[Callable, Tuple]
+        context = self._context
+        return (_create_iterator, (context.rule,
+                                   context.start,
+                                   self._anchor,
+                                   self._pos,
+                                   self._count))
+
+    def __next__(self):
+        # type: () -> datetime
+        context = self._context
+        start = context.start
+        until = context.until
+        limit = context.count
+
+        count = self._count
+        if limit is not None and count >= limit:
+            raise StopIteration
+
+        dttm_set = self._set
+        if dttm_set is None:
+            dttm_set = self._set = _get_dttm_set(context, self._anchor)
+
+        pos = self._pos
+        while True:
+            # Output the resulting values as date objects.
+            while pos < len(dttm_set):
+                dttm = dttm_set[pos]
+
+                # Exit whenever a date is beyond the given until date.
+                if dttm > until:
+                    self._pos = pos
+                    raise StopIteration
+
+                pos += 1
+
+                # Skip any date before the given start date.
+                if dttm < start:
+                    continue
+
+                if dttm[0] > _MAX_YEAR:
+                    raise RuntimeError("The date is out of range")
+
+                try:
+                    dttm = datetime(*dttm)
+                except ValueError:
+                    # Skip any date that falls on an invalid date, such as
+                    # leap days.
+                    continue
+
+                self._pos = pos
+                self._count = count + 1
+                return dttm
+
+            # Stop instead of looping forever on rules without any occurrence.
+            anchor = self._anchor
+            if anchor[0] > _get_last_anchor_year(context):
+                self._pos = pos
+                raise StopIteration
+
+            anchor = self._anchor = _ADVANCE_DTTM_FNS[context.freq](
+                *(anchor + (context.interval,)))
+            dttm_set = self._set = _get_dttm_set(context, anchor)
+            pos = 0
+
+    next = __next__
+
+    def cursor(self):
+        # type: () -> Cursor
+        """Captures the state of the iteration."""
+        context = self._context
+        return Cursor(context.rule.fingerprint,
+                      context.start,
+                      self._anchor,
+                      self._pos,
+                      self._count)
+
+    def _advance(self):
+        # type: () -> bool
+        """Moves to the next period, if any."""
+        if self._anchor[0] > _get_last_anchor_year(self._context):
+            return False
+
+        self._anchor = _ADVANCE_DTTM_FNS[self._context.freq](
+            *(self._anchor + (self._context.interval,)))
+        self._pos = 0
+        self._set = None
+        return True
+
+    def _skip_to(self, dttm):
+        # type: (Tuple[int, int, int, int, int, int]) -> None
+        """Skips the occurrences preceding a date time."""
+        context = self._context
+        start = context.start
+        until = context.until
+        limit = context.count
+        while True:
+            dttm_set = self._set
+            if dttm_set is None:
+                dttm_set = self._set = _get_dttm_set(context, self._anchor)
+
+            pos = self._pos
+            while pos < len(dttm_set) and dttm_set[pos] < dttm:
+                value = dttm_set[pos]
+                if value > until:
+                    break
+
+                pos += 1
+                if value >= start and _is_valid_dt(*value[:3]):
+                    self._count += 1
+                    if limit is not None and self._count >= limit:
+                        break
+
+            self._pos = pos
+            if pos < len(dttm_set) or not self._advance():
+                return
+
+    def _take(self, out, size, periods):
+        # type: (List[datetime], int, int) -> bool
+        """Appends occurrences to a list within a bounded amount of work.
+
+        At most ‘size’ occurrences are appended and at most ‘periods’ new
+        periods are visited, at least one. The result tells whether the
+        iteration is exhausted.
+        """
+        context = self._context
+        start = context.start
+        until = context.until
+        limit = context.count
+
+        count = self._count
+        if limit is not None and count >= limit:
+            return True
+
+        dttm_set = self._set
+        if dttm_set is None:
+            dttm_set = self._set = _get_dttm_set(context, self._anchor)
+
+        pos = self._pos
+        append = out.append
+        last_year = _get_last_anchor_year(context)
+        try:
+            while True:
+                while pos < len(dttm_set):
+                    if size <= 0:
+                        return False
+
+                    dttm = dttm_set[pos]
+                    if dttm > until:
+                        return True
+
+                    pos += 1
+                    if dttm < start:
+                        continue
+
+                    try:
+                        append(datetime(*dttm))
+                    except ValueError:
+                        # Skip any date that falls on an invalid date.
+                        continue
+
+                    size -= 1
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return True
+
+                anchor = self._anchor
+                if anchor[0] > last_year:
+                    return True
+
+                anchor = self._anchor = _ADVANCE_DTTM_FNS[context.freq](
+                    *(anchor + (context.interval,)))
+                dttm_set = self._set = _get_dttm_set(context, anchor)
+                pos = 0
+
+                periods -= 1
+                if periods <= 0:
+                    return False
+        finally:
+            self._pos = pos
+            self._count = count
+
+
+class AsyncRecurrenceIterator(object):
+    """Asynchronous iterator over batches of occurrences of a rule.
+
+    Each batch is computed within a callback of the event loop, in slices
+    bounded by a number of periods and by a duration, or within an executor
+    if any is given. Control is given back to the event loop before each
+    batch.
+    """
+
+    __slots__ = (
+        '_it',
+        '_batch_size',
+        '_max_periods',
+        '_max_time',
+        '_executor',
+        '_is_exhausted',
+    )
+
+    def __init__(self, it, batch_size, max_periods, max_time, executor):
+        # type: (RecurrenceIterator, int, int, float, Any) -> None
+        self._it = it
+        self._batch_size = batch_size
+        self._max_periods = max_periods
+        self._max_time = max_time
+        self._executor = executor
+        self._is_exhausted = False
+
+    def __aiter__(self):
+        # type: () -> AsyncRecurrenceIterator
+        return self
+
+    def __anext__(self):
+        # type: () -> Awaitable[List[datetime]]
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        if self._is_exhausted:
+            future.set_exception(StopAsyncIteration())
+        elif self._executor is None:
+            loop.call_soon(self._fill, loop, future, [])
+        else:
+            task = loop.run_in_executor(self._executor, self._fill_batch)
+            task.add_done_callback(partial(self._on_batch_done, future))
+
+        return future
+
+    def _fill(self, loop, future, out):
+        # type: (Any, Any, List[datetime]) -> None
+        """Fills a batch within a slice of time, or reschedules itself."""
+        if future.cancelled():
+            return
+
+        deadline = default_timer() + self._max_time
+        try:
+            while True:
+                is_exhausted = self._it._take(
+                    out, self._batch_size - len(out), self._max_periods)
+                if (is_exhausted
+                        or len(out) >= self._batch_size
+                        or default_timer() >= deadline):
+                    break
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        if out or is_exhausted:
+            self._resolve(future, out, is_exhausted)
+        else:
+            loop.call_soon(self._fill, loop, future, out)
+
+    def _fill_batch(self):
+        # type: () -> Tuple[List[datetime], bool]
+        """Fills a whole batch without any time constraint."""
+        out = []
+        while True:
+            is_exhausted = self._it._take(
+                out, self._batch_size - len(out), self._max_periods)
+            if is_exhausted or len(out) >= self._batch_size:
+                return (out, is_exhausted)
+
+    def _on_batch_done(self, future, task):
+        # type: (Any, Any) -> None
+        """Forwards the outcome of a batch computed within the executor."""
+        if future.cancelled():
+            return
+
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            self._resolve(future, *task.result())
+
+    def _resolve(self, future, out, is_exhausted):
+        # type: (Any, List[datetime], bool) -> None
+        """Forwards a batch to the awaiting future."""
+        self._is_exhausted = is_exhausted
+        if out:
+            future.set_result(out)
+        else:
+            future.set_exception(StopAsyncIteration())
+
+
+def _create_iterator(rule, start, anchor, pos, count):
+    # type: (RecurrenceRule, Tuple[int, ...], Tuple[int, ...], int, int) -> RecurrenceIterator
+    """Recreates an iterator from its state."""
+    context = rule._get_context(datetime(*start))
+    return RecurrenceIterator(context, anchor, pos, count)
+
+
 class RecurrenceRule(object):
     """Recurrence rule iterator."""
 
@@ -1298,6 +2610,9 @@ class RecurrenceRule(object):
                                     on_minutes=on_minutes,
                                     on_seconds=on_seconds)
 
+        if on_set_pos is not None:
+            on_set_pos = tuple(sorted(set(on_set_pos)))
+
         until = _MAX_DTTM if until is None else until.timetuple()[:6]
 
         self._freq = freq
@@ -1308,17 +2623,393 @@ class RecurrenceRule(object):
         self._on_set_pos = on_set_pos
         self._count = count
         self._until = until
+        self._contexts = {}
+        self._extents = {}
+        self._implicit_dt_props = {}
+        self._spec = _get_rule_spec(freq,
+                                    interval,
+                                    week_start,
+                                    dt_props,
+                                    tm_props,
+                                    on_set_pos,
+                                    count,
+                                    until)
+
+    def __eq__(self, other):
+        # type: (object) -> bool
+        if not isinstance(other, RecurrenceRule):
+            return NotImplemented
+
+        return self._spec == other._spec
+
+    def __ne__(self, other):
+        # type: (object) -> bool
+        if not isinstance(other, RecurrenceRule):
+            return NotImplemented
+
+        return self._spec != other._spec
+
+    def __hash__(self):
+        # type: () -> int
+        return hash(self._spec)
+
+    def __reduce__(self):
+        # type: () -> Tuple[Callable, Tuple[Tuple, ...]]
+        return (_create_rule_from_spec, (self._spec,))
 
     def __iter__(self):
         # type: () -> Iterator[datetime]
         return self.iterate_from(datetime.now())
 
-    def iterate_from(self, start):
-        # type: (datetime) -> Iterator[datetime]
-        start = start.timetuple()[:6]
+    def __and__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_IntersectionStream, self, other)
+
+    def __or__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_UnionStream, self, other)
 
-        advance_dttm = _ADVANCE_DTTM_FNS[self._freq]
+    def __sub__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_DifferenceStream, self, other)
 
+    @property
+    def fingerprint(self):
+        # type: () -> str
+        """Stable identifier derived from the definition of the rule."""
+        data = repr(self._spec).encode('ascii')
+        return hashlib.sha1(data).hexdigest()[:16]
+
+    def iterate_from(self,
+                     start,           # type: datetime
+                     calendar=None,   # type: Optional[HolidayCalendar]
+                     policy=FOLLOWING  # type: int
+                     ):
+        # type: (...) -> Iterator[datetime]
+        """Iterates over the occurrences following a start date.
+
+        If a calendar is given, the occurrences falling on non-business days
+        are adjusted as per the policy, see ‘HolidayCalendar.adjust()’.
+        """
+        context = self._get_context(start)
+        it = RecurrenceIterator(context, context.start, 0, 0)
+        if calendar is None:
+            return it
+
+        if policy not in _POLICIES:
+            raise ValueError("Invalid policy '{}'.".format(policy))
+
+        return _iterate_adjusted(it, calendar, policy)
+
+    def aiterate_from(self,
+                      start,             # type: datetime
+                      batch_size=256,    # type: int
+                      max_periods=1024,  # type: int
+                      max_time=0.001,    # type: float
+                      executor=None      # type: Optional[Executor]
+                      ):
+        # type: (...) -> AsyncRecurrenceIterator
+        """Iterates asynchronously over batches of occurrences.
+
+        The event loop regains control at least every ‘max_periods’ periods
+        or every ‘max_time’ seconds. If an executor is given, the batches are
+        computed there instead, without any time constraint.
+        """
+        return AsyncRecurrenceIterator(self.iterate_from(start),
+                                       batch_size,
+                                       max_periods,
+                                       max_time,
+                                       executor)
+
+    def iterate_chunks(self, start, size):
+        # type: (datetime, int) -> Iterator[List[datetime]]
+        """Iterates over the occurrences in lists of a given size.
+
+        Only the last list might be shorter.
+        """
+        if size < 1:
+            raise ValueError("The size of the chunks must be strictly "
+                             "positive.")
+
+        return _iterate_chunks(self.iterate_from(start), size)
+
+    def iterate_periods(self, start):
+        # type: (datetime) -> Iterator[Period]
+        """Iterates over the periods of the rule and their occurrences.
+
+        Every period is yielded in turn, including the ones without any
+        occurrence, until the rule is exhausted. The period in which the rule
+        turns out to be exhausted is only yielded if it has occurrences. The
+        rules whose periods are empty past their end date are exhausted once
+        the periods are anchored more than a year past it.
+        """
+        return _iterate_periods(self._get_context(start))
+
+    def contains(self, start, dttm):
+        # type: (datetime, datetime) -> bool
+        """Checks whether a date time is an occurrence.
+
+        Only the set of the period that the date time falls into is computed,
+        rather than iterating from the start date. The rules bounded by a
+        count are compared against their last occurrence, see ‘last()’.
+        """
+        context = self._get_context(start)
+        value = dttm.timetuple()[:6]
+        if (dttm.microsecond
+                or value < context.start
+                or value > context.until):
+            return False
+
+        location = _locate(context, value)
+        if location is None:
+            return False
+
+        if context.count is None:
+            return True
+
+        last = self._get_extent(context)[1]
+        return last is not None and value <= last
+
+    def is_finite(self):
+        # type: () -> bool
+        """Checks whether the rule is bounded by a count or an end date.
+
+        The occurrences of the other rules go on up to the maximum year
+        supported, and they have no last occurrence nor any total count.
+        """
+        return self._count is not None or self._until != _MAX_DTTM
+
+    def last(self, start):
+        # type: (datetime) -> Optional[datetime]
+        """Retrieves the last occurrence of a finite rule.
+
+        The value returned is ‘None’ when the rule is infinite, see
+        ‘is_finite()’, or when it has no occurrence. A count that isn't
+        reached by the maximum year supported ends at that year. Otherwise,
+        the result can serve as an end date equivalent to the count of the
+        rule.
+        """
+        if not self.is_finite():
+            return None
+
+        last = self._get_extent(self._get_context(start))[1]
+        return None if last is None else datetime(*last)
+
+    def total(self, start):
+        # type: (datetime) -> Optional[int]
+        """Retrieves the number of occurrences of a finite rule.
+
+        The value returned is ‘None’ when the rule is infinite, see
+        ‘is_finite()’. A count that isn't reached by the maximum year
+        supported is cut down to the occurrences up to that year.
+        """
+        if not self.is_finite():
+            return None
+
+        return self._get_extent(self._get_context(start))[0]
+
+    def contains_many(self, start, timestamps):
+        # type: (datetime, Sequence[int]) -> array
+        """Checks whether each timestamp of a sorted sequence is an occurrence.
+
+        The timestamps are in seconds, see ‘to_timestamp()’, and can be held
+        in any sequence supporting indexing, such as an array of 64-bit
+        integers. The result is an array of booleans as 8-bit integers. The
+        set of each period is only computed once, whatever the number of
+        timestamps falling into it.
+        """
+        return _contains_many(self._get_context(start), timestamps)
+
+    def day_bitmap(self, start, year):
+        # type: (datetime, int) -> int
+        """Retrieves the bitmap of the days of a year having occurrences.
+
+        The bit at position ‘n’ is set if the day ‘n + 1’ of the year has at
+        least one occurrence. The days are mostly computed without going
+        down to the times of the occurrences.
+        """
+        return _get_day_bitmap(self, start, year, {})
+
+    def iterate_many_starts(self, starts, lo, hi):
+        # type: (Iterable[datetime], datetime, datetime) -> Iterator[Tuple]
+        """Expands the rule for many start dates over a half-open range.
+
+        The results are pairs of the index of the start date and of an array
+        of timestamps, see ‘to_timestamp()’. The start dates inducing the same
+        date properties are processed together, sharing their date and time
+        sets, and the results are yielded group after group.
+        """
+        lo = lo.timetuple()[:6]
+        hi = hi.timetuple()[:6]
+
+        # The contexts aren't cached to not evict the ones in use elsewhere.
+        # The date sets only depend on the start date through the implicit
+        # date properties, which are part of the context's properties, so
+        # grouping on these is enough for the start dates of a group to share
+        # the sets computed for any of them. The dates preceding each start
+        # date are filtered out afterwards.
+        groups = {}
+        for i, start in enumerate(starts):
+            context = self._create_context(start.timetuple()[:6])
+            groups.setdefault(context.dt_props, []).append((i, context))
+
+        for dt_props, group in groups.items():
+            # Without date properties, there is no date set worth sharing.
+            if dt_props:
+                get_set = partial(_get_shared_dttm_set, {}, {})
+            else:
+                get_set = _get_dttm_set
+
+            for i, context in group:
+                yield (i, _expand_timestamps(context, lo, hi, get_set))
+
+    def iterate_from_cursor(self, cursor):
+        # type: (Union[Cursor, str]) -> RecurrenceIterator
+        """Resumes an iteration from a cursor or from its encoded token."""
+        if not isinstance(cursor, Cursor):
+            cursor = Cursor.decode(cursor)
+
+        if cursor.fingerprint != self.fingerprint:
+            raise ValueError("The cursor doesn't belong to this rule.")
+
+        context = self._get_context(datetime(*cursor.start))
+        return RecurrenceIterator(
+            context, tuple(cursor.anchor), cursor.pos, cursor.count)
+
+    def expand_parallel(self, start, lo, hi, workers=None):
+        # type: (datetime, datetime, datetime, Optional[int]) -> array
+        """Expands the occurrences within a half-open range in parallel.
+
+        The range is split at the boundaries of the periods and the slices
+        are expanded in separate processes before being concatenated into an
+        array of timestamps, see ‘to_timestamp()’.
+        """
+        from multiprocessing import cpu_count
+
+        futures = _import_futures()
+
+        context = self._get_context(start)
+        start = context.start
+        lo = lo.timetuple()[:6]
+        hi = hi.timetuple()[:6]
+        workers = workers or cpu_count()
+
+        # Use more slices than workers since the density of the occurrences
+        # might vary over the range, and since a count or an end date might
+        # leave the last slices empty.
+        slices = _get_period_slices(context, lo, hi, workers * 4)
+
+        out = array(_INT64_TYPECODE)
+        with futures.ProcessPoolExecutor(workers) as executor:
+            futures = [executor.submit(_expand_slice, self._spec, start,
+                                       index, stop, count, lo, hi)
+                       for index, stop, count in slices]
+            for future in futures:
+                out.extend(future.result())
+
+        return out
+
+    def partition(self, start, lo, hi, n):
+        # type: (datetime, datetime, datetime, int) -> Tuple[Shard, ...]
+        """Partitions the expansion over a half-open range into shards.
+
+        The shards cover the range exactly once and are balanced by their
+        number of occurrences rather than by their time span. Each of them
+        can be expanded independently with ‘expand_shard()’.
+        """
+        if n < 1:
+            raise ValueError("The number of shards must be strictly "
+                             "positive.")
+
+        context = self._get_context(start)
+        lo = lo.timetuple()[:6]
+        hi = hi.timetuple()[:6]
+        begin, end = _get_period_range(context, lo, hi)
+        count = 0 if context.count is None else _count_occurrences(context,
+                                                                   begin)
+        counts = _get_cumulative_counts(context, begin, end, count)
+
+        total = counts[-1] - count
+        if total:
+            bounds = [begin + bisect_left(counts, count + total * i // n)
+                      for i in _range(n)]
+        else:
+            bounds = [begin + (end - begin) * i // n for i in _range(n)]
+
+        bounds.append(end)
+        fingerprint = self.fingerprint
+        return tuple(Shard(fingerprint,
+                           context.start,
+                           bounds[i],
+                           bounds[i + 1],
+                           counts[bounds[i] - begin],
+                           lo,
+                           hi)
+                     for i in _range(n))
+
+    def expand_shard(self, shard):
+        # type: (Union[Shard, Sequence]) -> array
+        """Expands the occurrences of a shard into an array of timestamps.
+
+        The shard can also be given as a plain sequence of values, such as
+        after a round trip through JSON.
+        """
+        if not isinstance(shard, Shard):
+            shard = Shard(*_to_tuple(list(shard)))
+
+        if shard.fingerprint != self.fingerprint:
+            raise ValueError("The shard doesn't belong to this rule.")
+
+        context = self._get_context(datetime(*shard.start))
+        return _expand_periods(context, shard.index, shard.stop, shard.count,
+                               tuple(shard.lo), tuple(shard.hi))
+
+    def _create_stream(self, start, dttm):
+        # type: (datetime, Tuple[int, ...]) -> _RuleStream
+        return _RuleStream(self._get_context(start), dttm)
+
+    def _get_context(self, start):
+        # type: (datetime) -> _IterContext
+        """Retrieves the context required to iterate from a start date."""
+        start = start.timetuple()[:6]
+        context = self._contexts.get(start)
+        if context is not None:
+            return context
+
+        # Concurrent calls for a same start date wait for the context to be
+        # built once while calls for other dates are likely to use another
+        # lock.
+        with _CACHE_LOCKS[hash((id(self), start)) % len(_CACHE_LOCKS)]:
+            context = self._contexts.get(start)
+            if context is None:
+                context = self._create_context(start)
+
+                # The caches are replaced rather than cleared so that the
+                # concurrent lookups never observe a dictionary being mutated
+                # in bulk.
+                if len(self._contexts) >= _CONTEXT_CACHE_SIZE:
+                    self._contexts = {}
+
+                self._contexts[start] = context
+
+        return context
+
+    def _get_extent(self, context):
+        # type: (_IterContext) -> Tuple[int, Optional[Tuple[int, ...]]]
+        """Retrieves the number of occurrences and the last one, memoized."""
+        extent = self._extents.get(context.start)
+        if extent is None:
+            extent = _get_extent(context)
+            if len(self._extents) >= _CONTEXT_CACHE_SIZE:
+                self._extents = {}
+
+            self._extents[context.start] = extent
+
+        return extent
+
+    def _create_context(self, start):
+        # type: (Tuple[int, int, int, int, int, int]) -> _IterContext
+        """Creates the context to iterate from a start date."""
         # Retrieve the start of the week relatively to Monday.
         sow_offset = self._week_start - MONDAY
 
@@ -1328,78 +3019,2562 @@ class RecurrenceRule(object):
                                 for x in self._dt_props))
             else self._freq)
 
+        year, month, day, hour, minute, second = start
+
+        # Without any explicit date property, the period's anchor is the
+        # only date to consider.
         if self._dt_props:
-            get_dt_set = _get_dt_set
+            # The implicit properties only depend on the month, the day, and
+            # the week day of the start date, they can be shared.
+            dow = (_get_ord_dt(year, month, day) - sow_offset - 1) % 7
+            key = (month, day, dow)
+            dt_props = self._implicit_dt_props.get(key)
+            if dt_props is None:
+                dt_props = _add_implicit_dt_props(
+                    self._dt_props, self._freq, year, month, day, sow_offset)
+                self._implicit_dt_props[key] = dt_props
         else:
-            get_dt_set = lambda y, m, d, *args, **kwargs: ((y, m, d),)
+            dt_props = ()
 
-        if self._tm_props:
-            get_tm_set = _get_tm_set
-        else:
-            get_tm_set = lambda h, m, s, *args, **kwargs: ((h, m, s),)
+        context = _IterContext(self._freq,
+                               self._interval,
+                               start,
+                               self._until,
+                               self._count,
+                               self._on_set_pos,
+                               sow_offset,
+                               on_week_days_woy_freq,
+                               dt_props,
+                               self._tm_props,
+                               self)
+        return context
+
+
+def _get_rule_spec(freq,        # type: int
+                   interval,    # type: int
+                   week_start,  # type: WeekDay
+                   dt_props,    # type: Tuple[_Property, ...]
+                   tm_props,    # type: Tuple[_Property, ...]
+                   on_set_pos,  # type: Optional[Tuple[int, ...]]
+                   count,       # type: Optional[int]
+                   until        # type: Tuple[int, int, int, int, int, int]
+                   ):
+    # type: (...) -> Tuple
+    """Retrieves a compact description of a rule made of plain values."""
+    values = dict((x.kind, x.values) for x in dt_props + tm_props)
+    if _PROP_ON_WEEK_DAYS in values:
+        values[_PROP_ON_WEEK_DAYS] = tuple(
+            (int(x), x.n) for x in values[_PROP_ON_WEEK_DAYS])
+
+    return (
+        (freq, interval, int(week_start))
+        + tuple(values.get(x) for x in _range(len(_PROPS)))
+        + (on_set_pos, count, None if until == _MAX_DTTM else until)
+    )
+
+
+def _to_tuple(value):
+    # type: (Any) -> Any
+    """Converts a value and its nested lists into tuples."""
+    if isinstance(value, list):
+        return tuple(_to_tuple(x) for x in value)
+
+    return value
+
+
+def _create_rule_from_spec(spec):
+    # type: (Sequence) -> RecurrenceRule
+    """Creates a rule from its compact description."""
+    # Sequences might have been converted into lists by the serialization.
+    spec = tuple(_to_tuple(x) if isinstance(x, list) else x for x in spec)
+    freq, interval, week_start = spec[:3]
+    props = spec[3:3 + len(_PROPS)]
+    on_set_pos, count, until = spec[3 + len(_PROPS):]
+
+    on_week_days = props[_PROP_ON_WEEK_DAYS]
+    if on_week_days is not None:
+        on_week_days = tuple(WeekDay(x, n) for x, n in on_week_days)
+
+    return RecurrenceRule(
+        freq,
+        interval=interval,
+        week_start=WeekDay(week_start),
+        on_months=props[_PROP_ON_MONTHS],
+        on_weeks=props[_PROP_ON_WEEKS],
+        on_year_days=props[_PROP_ON_YEAR_DAYS],
+        on_month_days=props[_PROP_ON_MONTH_DAYS],
+        on_week_days=on_week_days,
+        on_hours=props[_PROP_ON_HOURS],
+        on_minutes=props[_PROP_ON_MINUTES],
+        on_seconds=props[_PROP_ON_SECONDS],
+        on_set_pos=on_set_pos,
+        count=count,
+        until=None if until is None else datetime(*until))
+
+
+#   Occurrence Store
+# ------------------------------------------------------------------------------
 
-        year, month, day, hour, minute, second = start
+_STORE_MAGIC = b'WADU'
+_STORE_FORMAT = 1
+_STORE_EXT = '.occ'
 
-        dt_props = _add_implicit_dt_props(
-            self._dt_props, self._freq, year, month, day, sow_offset)
+# Header made of the magic number, the format version, the flags, the number
+# of occurrences, the horizon as a timestamp, and the size of the metadata.
+_STORE_HEADER = struct.Struct('=4sHHqqI')
 
-        count = 0
-        while True:
+_STORE_FLAG_EXHAUSTED = 1 << 0
 
-            # Retrieve the date and time sets.
-            dt_set = get_dt_set(year,
-                                month,
-                                day,
-                                self._freq,
-                                start,
-                                sow_offset,
-                                on_week_days_woy_freq,
-                                dt_props)
-            tm_set = get_tm_set(
-                hour, minute, second, self._freq, self._tm_props)
-
-            if dt_set is not None and tm_set is not None:
-                # Combine the date and time sets.
-                dttm_set = tuple(x + y for x in dt_set for y in tm_set)
-
-                if self._on_set_pos is not None:
-                    # Wrap around negative set positions. Also convert them
-                    # into 0-based indices.
-                    on_set_pos = self._on_set_pos
-                    begin = bisect_left(self._on_set_pos, -len(dttm_set))
-                    end = bisect_left(self._on_set_pos, len(dttm_set) + 1)
-                    on_set_pos = on_set_pos[begin:end]
-                    on_set_pos = sorted(x % (len(dttm_set) + 1) - 1
-                                        for x in on_set_pos)
-
-                    # Filter the date and time set based on the set positions.
-                    dttm_set = tuple(dttm_set[i] for i in on_set_pos)
-
-                # Output the resulting values as date objects.
-                for dttm in dttm_set:
-                    # Exit whenever a date is beyond the given until date.
-                    if dttm > self._until:
-                        return
-
-                    # Skip any date before the given start date.
-                    if dttm < start:
-                        continue
 
-                    try:
-                        dttm = datetime(*dttm)
-                    except ValueError:
-                        # Skip any date that falls on an invalid date,
-                        # such as leap days.
-                        continue
+def _pack_timestamps(timestamps):
+    # type: (array) -> bytes
+    """Packs timestamps as 64-bit integers in the native byte order."""
+    if _INT64_TYPECODE == 'q':
+        return timestamps.tobytes()
 
-                    if dttm.year > _MAX_YEAR:
-                        raise RuntimeError("The date is out of range")
+    return struct.pack('={}q'.format(len(timestamps)), *timestamps)
 
-                    yield dttm
 
-                    count += 1
-                    if self._count is not None and count >= self._count:
-                        return
+def _get_store_data_offset(meta_size):
+    # type: (int) -> int
+    """Retrieves the offset of the occurrences, aligned to 8 bytes."""
+    offset = _STORE_HEADER.size + meta_size
+    return offset + (-offset) % 8
+
+
+class StoredOccurrences(object):
+    """Read-only view over an entry of an occurrence store.
+
+    The occurrences are exposed as a sorted sequence of timestamps that is
+    directly backed by the memory-mapped file, without any parsing or copy.
+    """
+
+    def __init__(self, path):
+        # type: (str) -> None
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, fmt, flags, size, horizon, meta_size = (
+            _STORE_HEADER.unpack_from(self._map, 0))
+        if magic != _STORE_MAGIC or fmt != _STORE_FORMAT:
+            self._map.close()
+            raise ValueError("Invalid occurrence store entry '{}'."
+                             .format(path))
+
+        meta = self._map[_STORE_HEADER.size:_STORE_HEADER.size + meta_size]
+        meta = json.loads(meta.decode('utf-8'))
+        offset = _get_store_data_offset(meta_size)
+
+        self.path = path
+        self.version = meta['version']
+        self.rule = _create_rule_from_spec(meta['rule'])
+        self.start = datetime(*meta['start'])
+        self.horizon = from_timestamp(horizon)
+        self.is_exhausted = bool(flags & _STORE_FLAG_EXHAUSTED)
+        if _INT64_TYPECODE == 'q':
+            self.timestamps = (
+                memoryview(self._map)[offset:offset + size * 8].cast('q'))
+        else:
+            # The memory views can't be cast on Python 2, the timestamps are
+            # copied instead.
+            self.timestamps = array(
+                _INT64_TYPECODE,
+                struct.unpack_from('={}q'.format(size), self._map, offset))
+
+    def __enter__(self):
+        # type: () -> StoredOccurrences
+        return self
+
+    def __exit__(self, *args):
+        # type: (*Any) -> None
+        self.close()
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.timestamps)
+
+    def __iter__(self):
+        # type: () -> Iterator[datetime]
+        return (from_timestamp(x) for x in self.timestamps)
+
+    def between(self, lo, hi):
+        # type: (datetime, datetime) -> memoryview
+        """Retrieves the timestamps within an inclusive range of dates."""
+        timestamps = self.timestamps
+        begin = bisect_left(timestamps, to_timestamp(lo))
+        end = bisect_right(timestamps, to_timestamp(hi))
+        return timestamps[begin:end]
+
+    def is_stale(self, rule, start):
+        # type: (RecurrenceRule, datetime) -> bool
+        """Checks whether the entry wasn't built from the given rule."""
+        # The stored start date is truncated to the second.
+        return (self.version != __version__
+                or self.rule != rule
+                or self.start.timetuple()[:6] != start.timetuple()[:6])
+
+    def close(self):
+        # type: () -> None
+        """Releases the memory-mapped file.
+
+        The file remains mapped as long as some views returned by
+        ‘between()’ are still referenced.
+        """
+        if isinstance(self.timestamps, memoryview):
+            self.timestamps.release()
+
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+
+class OccurrenceStore(object):
+    """On-disk store of precomputed occurrences.
+
+    Each entry is keyed by the fingerprint of a rule and by a start date, and
+    holds all the occurrences from that start date up to a horizon. Entries
+    can be opened concurrently by many processes but they are expected to be
+    extended by a single writer.
+    """
+
+    def __init__(self, path):
+        # type: (str) -> None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._path = path
+
+    def open(self, rule, start):
+        # type: (RecurrenceRule, datetime) -> Optional[StoredOccurrences]
+        """Opens an entry, or returns ‘None’ if it is missing or stale."""
+        path = self._get_entry_path(rule, start)
+        if not os.path.exists(path):
+            return None
+
+        entry = StoredOccurrences(path)
+        if entry.is_stale(rule, start):
+            entry.close()
+            return None
+
+        return entry
+
+    def extend(self, rule, start, horizon):
+        # type: (RecurrenceRule, datetime, datetime) -> StoredOccurrences
+        """Stores the occurrences up to a horizon and opens the entry.
+
+        Existing entries are extended by resuming the expansion from their
+        last stored occurrence while stale ones are rebuilt from scratch.
+        """
+        path = self._get_entry_path(rule, start)
+        entry = self.open(rule, start)
+        if entry is None:
+            self._write(path, rule, start, horizon)
+        elif not entry.is_exhausted and entry.horizon < horizon:
+            size = len(entry)
+            last = entry.timestamps[-1] if size else None
+            entry.close()
+            self._append(path, rule, start, horizon, size, last)
+        else:
+            return entry
+
+        return StoredOccurrences(path)
+
+    def _get_entry_path(self, rule, start):
+        # type: (RecurrenceRule, datetime) -> str
+        """Retrieves the path of an entry."""
+        name = '{}_{}{}'.format(rule.fingerprint, to_timestamp(start),
+                                _STORE_EXT)
+        return os.path.join(self._path, name)
+
+    def _write(self, path, rule, start, horizon):
+        # type: (str, RecurrenceRule, datetime, datetime) -> None
+        """Writes a new entry."""
+        context = rule._get_context(start)
+        timestamps, is_exhausted = _expand_up_to(
+            RecurrenceIterator(context, context.start, 0, 0), horizon)
+
+        meta = json.dumps({
+            'version': __version__,
+            'rule': rule._spec,
+            'start': context.start,
+        }).encode('utf-8')
+        offset = _get_store_data_offset(len(meta))
+        flags = _STORE_FLAG_EXHAUSTED if is_exhausted else 0
+        header = _STORE_HEADER.pack(_STORE_MAGIC,
+                                    _STORE_FORMAT,
+                                    flags,
+                                    len(timestamps),
+                                    to_timestamp(horizon),
+                                    len(meta))
+
+        # Write to a temporary file first so that readers never see a
+        # partially written entry.
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(meta)
+            f.write(b'\0' * (offset - len(header) - len(meta)))
+            f.write(_pack_timestamps(timestamps))
+
+        os.rename(tmp_path, path)
+
+    def _append(self, path, rule, start, horizon, size, last):
+        # type: (str, RecurrenceRule, datetime, datetime, int, int) -> None
+        """Appends the occurrences following the last stored one."""
+        context = rule._get_context(start)
+        if last is None:
+            it = RecurrenceIterator(context, context.start, 0, 0)
+        else:
+            _, anchor, pos = _locate(context, _get_dttm_from_timestamp(last))
+            it = RecurrenceIterator(context, anchor, pos + 1, size)
+
+        timestamps, is_exhausted = _expand_up_to(it, horizon)
+
+        with open(path, 'r+b') as f:
+            magic, fmt, flags, _, _, meta_size = _STORE_HEADER.unpack(
+                f.read(_STORE_HEADER.size))
+
+            # Append the occurrences before updating the header so that
+            # concurrent readers always see a consistent entry. Any bytes
+            # left past the stored occurrences by an interrupted append are
+            # discarded rather than appended to.
+            f.seek(_get_store_data_offset(meta_size) + size * 8)
+            f.truncate()
+            f.write(_pack_timestamps(timestamps))
+            f.flush()
+
+            if is_exhausted:
+                flags |= _STORE_FLAG_EXHAUSTED
+
+            f.seek(0)
+            f.write(_STORE_HEADER.pack(magic,
+                                       fmt,
+                                       flags,
+                                       size + len(timestamps),
+                                       to_timestamp(horizon),
+                                       meta_size))
+
+
+def _expand_up_to(it, horizon):
+    # type: (Iterator[datetime], datetime) -> Tuple[array, bool]
+    """Expands the occurrences up to an inclusive horizon.
+
+    It also returns whether the iterator got exhausted in the process.
+    """
+    timestamps = array(_INT64_TYPECODE)
+    for dttm in it:
+        if dttm > horizon:
+            return (timestamps, False)
+
+        timestamps.append(to_timestamp(dttm))
+
+    return (timestamps, True)
+
+
+#   Rolling Horizon
+# ------------------------------------------------------------------------------
+
+class Horizon(object):
+    """Occurrences of many rules materialized over a rolling window.
+
+    The window spans from a given time up to a given duration later. Each
+    rule keeps its iteration suspended at the end of the window so that
+    advancing the window only expands the newly covered time.
+    """
+
+    def __init__(self,
+                 items,  # type: Iterable[Tuple[RecurrenceRule, datetime]]
+                 now,    # type: datetime
+                 span    # type: timedelta
+                 ):
+        # type: (...) -> None
+        self._contexts = tuple(rule._get_context(start)
+                               for rule, start in items)
+        self._span = span
+        self._now = now
+        self._end = now + span
+        self._windows = tuple(deque() for _ in self._contexts)
+        self._iterators = [None] * len(self._contexts)
+        self._pending = [None] * len(self._contexts)
+        for i in _range(len(self._contexts)):
+            self._seed(i)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._windows)
+
+    def __getitem__(self, index):
+        # type: (int) -> Tuple[datetime, ...]
+        return tuple(self._windows[index])
+
+    def __iter__(self):
+        # type: () -> Iterator[Tuple[datetime, int]]
+        """Iterates over the occurrences of all the rules in order.
+
+        Each occurrence is paired with the index of the rule it belongs to.
+        """
+        return heapq.merge(*[[(x, i) for x in window]
+                             for i, window in enumerate(self._windows)])
+
+    @property
+    def now(self):
+        # type: () -> datetime
+        """Start of the window."""
+        return self._now
+
+    @property
+    def end(self):
+        # type: () -> datetime
+        """Exclusive end of the window."""
+        return self._end
+
+    def advance(self, now):
+        # type: (datetime) -> None
+        """Moves the window forward.
+
+        Expired occurrences are dropped and the rules resume their iteration
+        to fill the tail of the window. If the new window doesn't overlap the
+        previous one, the rules are seeked directly to it instead.
+        """
+        if now < self._now:
+            raise ValueError("The window can only move forward.")
+
+        is_disjoint = now >= self._end
+        self._now = now
+        self._end = now + self._span
+        for i, window in enumerate(self._windows):
+            if is_disjoint:
+                window.clear()
+
+                # The exhausted rules have no occurrence left to seek.
+                if self._iterators[i] is not None:
+                    self._seed(i)
+
+                continue
+
+            while window and window[0] < now:
+                window.popleft()
+
+            self._fill(i)
+
+    def _seed(self, index):
+        # type: (int) -> None
+        """Starts iterating a rule from the beginning of the window."""
+        context = self._contexts[index]
+        it = _iterate_from_dttm(context, self._now.timetuple()[:6])
+
+        # The seeking drops the microseconds.
+        occurrence = next(it, None)
+        while occurrence is not None and occurrence < self._now:
+            occurrence = next(it, None)
+
+        self._iterators[index] = it
+        self._pending[index] = occurrence
+        self._fill(index)
+
+    def _fill(self, index):
+        # type: (int) -> None
+        """Appends the occurrences of a rule up to the end of the window."""
+        window = self._windows[index]
+        it = self._iterators[index]
+        if it is None:
+            return
+
+        occurrence = self._pending[index]
+        if occurrence is None:
+            occurrence = next(it, None)
+
+        while occurrence is not None and occurrence < self._end:
+            window.append(occurrence)
+            occurrence = next(it, None)
+
+        if occurrence is None:
+            # The rule is exhausted.
+            self._iterators[index] = None
+
+        self._pending[index] = occurrence
+
+
+#   Bulk Expansion
+# ------------------------------------------------------------------------------
+
+def _import_futures():
+    # type: () -> Any
+    """Imports the executors, only available from a backport on Python 2."""
+    try:
+        import concurrent.futures
+    except ImportError:
+        raise ImportError("The 'futures' package is required to use pools "
+                          "of workers on Python 2.")
+
+    return concurrent.futures
+
+
+def _get_chunks(items, size):
+    # type: (Iterable[Tuple[RecurrenceRule, datetime]], int) -> Iterator[Tuple]
+    """Packs the rules and their start dates into compact chunks.
+
+    Each chunk holds the specs of its distinct rules only once, followed by
+    the index of the rule and the start date for each item.
+    """
+    it = iter(items)
+    while True:
+        specs = []
+        spec_idxs = {}
+        entries = []
+        for rule, start in islice(it, size):
+            spec = rule._spec
+            idx = spec_idxs.get(spec)
+            if idx is None:
+                idx = spec_idxs[spec] = len(specs)
+                specs.append(spec)
+
+            entries.append((idx, start.timetuple()[:6]))
+
+        if not entries:
+            return
+
+        yield (tuple(specs), tuple(entries))
+
+
+def _expand_chunk(specs, entries, lo, hi):
+    # type: (Tuple, Tuple, Tuple[int, ...], Tuple[int, ...]) -> List[array]
+    """Expands the occurrences of a chunk within a half-open range."""
+    rules = [_create_rule_from_spec(x) for x in specs]
+    return [_expand_timestamps(rules[idx]._get_context(datetime(*start)),
+                               lo,
+                               hi)
+            for idx, start in entries]
+
+
+def _get_period_slices(context, lo, hi, n):
+    # type: (_IterContext, Tuple, Tuple, int) -> List[Tuple[int, int, int]]
+    """Splits the periods covering a half-open range into contiguous slices.
+
+    Each slice is described by the indices of its first and end periods, and
+    by the number of occurrences emitted before it. The slices starting after
+    the rule is exhausted are discarded.
+    """
+    begin, end = _get_period_range(context, lo, hi)
+    n = max(min(n, end - begin), 1)
+    bounds = [begin + (end - begin) * i // n for i in _range(n + 1)]
+    if context.count is None:
+        counts = [0] * n
+    else:
+        counts = _get_prefix_counts(context, bounds[:-1])
+
+    return [(bounds[i], bounds[i + 1], counts[i])
+            for i in _range(n)
+            if context.count is None or counts[i] < context.count]
+
+
+def _expand_slice(spec, start, index, stop, count, lo, hi):
+    # type: (Tuple, Tuple, int, int, int, Tuple, Tuple) -> array
+    """Expands the occurrences of a slice of periods of a rule."""
+    context = _create_rule_from_spec(spec)._get_context(datetime(*start))
+    return _expand_periods(context, index, stop, count, lo, hi)
+
+
+def _expand_items(items, lo, hi):
+    # type: (Tuple[Tuple[RecurrenceRule, datetime], ...], Tuple, Tuple) -> List
+    """Expands the occurrences of rules within a half-open range."""
+    return [_expand_timestamps(rule._get_context(start), lo, hi)
+            for rule, start in items]
+
+
+def expand_many(items,               # type: Iterable[Tuple]
+                lo,                  # type: datetime
+                hi,                  # type: datetime
+                processes=None,      # type: Optional[int]
+                chunksize=256,       # type: int
+                ordered=True,        # type: bool
+                executor='process'   # type: str
+                ):
+    # type: (...) -> Iterator[Tuple[int, array]]
+    """Expands many rules over a half-open window using a pool of workers.
+
+    The items are pairs of a rule and of its start date. The results are
+    streamed back as pairs of the index of the item and of an array of
+    timestamps, see ‘to_timestamp()’, either in the order of the items or in
+    their completion order.
+
+    The workers are either processes or threads, as per the ‘executor’
+    argument, and their number defaults to the number of CPUs. Like for
+    ‘multiprocessing.pool.ThreadPool’, the number of threads is also given
+    through the ‘processes’ argument. Threads share the rules and their
+    caches, which pays off when running on a free-threaded build of Python.
+    """
+    from multiprocessing import cpu_count
+
+    futures = _import_futures()
+
+    lo = lo.timetuple()[:6]
+    hi = hi.timetuple()[:6]
+
+    if executor == 'process':
+        # Only ship the compact specs of the rules to the processes.
+        pool = futures.ProcessPoolExecutor(processes)
+        tasks = ((len(entries), _expand_chunk, (specs, entries, lo, hi))
+                 for specs, entries in _get_chunks(items, chunksize))
+    elif executor == 'thread':
+        pool = futures.ThreadPoolExecutor(processes or cpu_count())
+        it = iter(items)
+        tasks = ((len(chunk), _expand_items, (chunk, lo, hi))
+                 for chunk in iter(lambda: tuple(islice(it, chunksize)), ()))
+    else:
+        raise ValueError("Invalid executor '{}'.".format(executor))
+
+    # Bound the number of chunks in flight so that a slow consumer doesn't
+    # pile up the results in memory.
+    max_pending = (processes or cpu_count()) * 4
+
+    with pool:
+        pending = deque()
+        offset = 0
+        is_exhausted = False
+        while True:
+            while not is_exhausted and len(pending) < max_pending:
+                task = next(tasks, None)
+                if task is None:
+                    is_exhausted = True
+                    break
+
+                size, fn, args = task
+                pending.append((offset, pool.submit(fn, *args)))
+                offset += size
+
+            if not pending:
+                return
+
+            if ordered:
+                done = (pending.popleft(),)
+            else:
+                completed, _ = futures.wait(
+                    tuple(x for _, x in pending),
+                    return_when=futures.FIRST_COMPLETED)
+                done = tuple(x for x in pending if x[1] in completed)
+                for item in done:
+                    pending.remove(item)
+
+            for chunk_offset, future in done:
+                for i, timestamps in enumerate(future.result()):
+                    yield (chunk_offset + i, timestamps)
+
+
+#   Rule Table
+# ------------------------------------------------------------------------------
+
+# Bit of the first negative month day, ‘-1’, within the month days' masks.
+_NEG_MONTH_DAY_BIT = 31
+
+_Day = namedtuple(
+    'Day', (
+        'ord',        # int
+        'timestamp',  # int
+        'year',       # int
+        'month',      # int
+        'day',        # int
+        'neg_day',    # int
+        'week_day',   # int
+    ))
+
+
+def _get_masks(props):
+    # type: (Sequence[_Property]) -> Optional[Tuple[int, ...]]
+    """Packs the properties into bitmasks, if they all can be.
+
+    The masks are for the months, the month days, the week days, the hours,
+    the minutes, and the seconds, in that order. A mask of zero stands for a
+    property that isn't set.
+    """
+    masks = [0] * 6
+    for prop in props:
+        if not prop.values:
+            return None
+
+        kind = prop.kind
+        if kind == _PROP_ON_MONTHS:
+            masks[0] = sum(1 << (x - 1) for x in prop.values)
+        elif kind == _PROP_ON_MONTH_DAYS:
+            masks[1] = sum(1 << (x - 1 if x > 0
+                                 else _NEG_MONTH_DAY_BIT - x - 1)
+                           for x in prop.values)
+        elif kind == _PROP_ON_WEEK_DAYS:
+            if any(x.n is not None for x in prop.values):
+                return None
+
+            masks[2] = sum(1 << (x - 1) for x in prop.values)
+        elif kind == _PROP_ON_HOURS:
+            masks[3] = sum(1 << x for x in prop.values)
+        elif kind == _PROP_ON_MINUTES:
+            masks[4] = sum(1 << x for x in prop.values)
+        elif kind == _PROP_ON_SECONDS:
+            masks[5] = sum(1 << x for x in prop.values)
+        else:
+            return None
+
+    return tuple(masks)
+
+
+def _get_row_masks(rule, start):
+    # type: (RecurrenceRule, Tuple[int, ...]) -> Optional[Tuple[int, ...]]
+    """Retrieves the masks of a rule for a start date, if it can use them.
+
+    The implicit properties induced by the start date are included. Only the
+    rules with a daily or coarser frequency, weeks starting on Monday, and
+    neither any count nor any set position are supported.
+    """
+    freq = rule._freq
+    if (freq > DAILY
+            or rule._week_start != MONDAY
+            or rule._count is not None
+            or rule._on_set_pos is not None):
+        return None
+
+    year, month, day = start[:3]
+    if rule._dt_props:
+        dt_props = _add_implicit_dt_props(
+            rule._dt_props, freq, year, month, day, 0)
+    else:
+        # The anchors are the only dates to consider, which is equivalent to
+        # selecting the same day within each period.
+        dow = WeekDay((_get_ord_dt(year, month, day) - 1) % 7 + 1)
+        if freq == YEARLY:
+            dt_props = (_Property(_PROP_ON_MONTHS, None, (month,)),
+                        _Property(_PROP_ON_MONTH_DAYS, None, (day,)))
+        elif freq == MONTHLY:
+            dt_props = (_Property(_PROP_ON_MONTH_DAYS, None, (day,)),)
+        elif freq == WEEKLY:
+            dt_props = (_Property(_PROP_ON_WEEK_DAYS, None, (dow,)),)
+        else:
+            dt_props = ()
+
+    masks = _get_masks(dt_props + rule._tm_props)
+    if masks is None:
+        return None
+
+    # The masks of yearly rules can't account for the week days of the
+    # adjacent years that are part of the periods.
+    if freq == YEARLY and not masks[0]:
+        return None
+
+    return masks
+
+
+def _get_days(lo, hi):
+    # type: (Tuple[int, ...], Tuple[int, ...]) -> List[_Day]
+    """Retrieves the days overlapping a half-open range of date times."""
+    begin = _get_ord_dt(*lo[:3])
+    end = _get_ord_dt(*hi[:3]) + (hi[3:] > (0, 0, 0))
+    out = []
+    for ord_dt in _range(begin, end):
+        dt = date.fromordinal(ord_dt)
+        year, month, day = dt.year, dt.month, dt.day
+        out.append(_Day(ord_dt,
+                        (ord_dt - _EPOCH_ORD_DT) * 86400,
+                        year,
+                        month,
+                        day,
+                        _DOM_COUNT[_is_leap_year(year)][month - 1] - day + 1,
+                        (ord_dt - 1) % 7))
+
+    return out
+
+
+def _match_days(days, months, month_days, week_days):
+    # type: (Sequence[_Day], int, int, int) -> List[_Day]
+    """Filters the days matching the masks of date properties."""
+    return [x for x in days
+            if (not months or months >> (x.month - 1) & 1)
+            and (not month_days
+                 or month_days >> (x.day - 1) & 1
+                 or month_days >> (_NEG_MONTH_DAY_BIT + x.neg_day - 1) & 1)
+            and (not week_days or week_days >> x.week_day & 1)]
+
+
+def _get_time_offsets(start, hours, minutes, seconds):
+    # type: (Tuple[int, ...], int, int, int) -> List[int]
+    """Retrieves the sorted offsets in seconds of the times within a day.
+
+    The time of the start date is used for each property that isn't set.
+    """
+    hours = ([x for x in _range(24) if hours >> x & 1] if hours
+             else [start[3]])
+    minutes = ([x for x in _range(60) if minutes >> x & 1] if minutes
+               else [start[4]])
+    seconds = ([x for x in _range(60) if seconds >> x & 1] if seconds
+               else [start[5]])
+    return [x * 3600 + y * 60 + z
+            for x in hours for y in minutes for z in seconds]
+
+
+def _get_alignment_fn(freq, interval, start):
+    # type: (int, int, Tuple[int, ...]) -> Optional[Callable[[_Day], bool]]
+    """Retrieves a function checking whether a day falls on a period.
+
+    Only the periods selected by the interval are considered. No function is
+    needed when the interval is one.
+    """
+    if interval == 1:
+        return None
+
+    year, month, day = start[:3]
+    if freq == YEARLY:
+        return lambda x: (x.year - year) % interval == 0
+    elif freq == MONTHLY:
+        return lambda x: ((x.year - year) * 12
+                          + x.month - month) % interval == 0
+
+    ord_dt = _get_ord_dt(year, month, day)
+    if freq == WEEKLY:
+        week = (ord_dt - 1) // 7
+        return lambda x: ((x.ord - 1) // 7 - week) % interval == 0
+
+    return lambda x: (x.ord - ord_dt) % interval == 0
+
+
+class RuleTable(object):
+    """Column-wise table of rules with their start dates.
+
+    The rules made only of plain date and time properties are stored as
+    bitmasks and are expanded by matching the days of a range against them,
+    each distinct set of date masks being matched only once. The other rules
+    are expanded through the regular iteration, grouped by rule.
+    """
+
+    def __init__(self, items=()):
+        # type: (Iterable[Tuple[RecurrenceRule, datetime]]) -> None
+        self._rules = []
+        self._rule_idxs = {}
+        self._rule_col = array('l')
+        self._freqs = array('b')
+        self._intervals = array('l')
+        self._starts = array(_INT64_TYPECODE)
+        self._untils = array(_INT64_TYPECODE)
+        self._has_masks = array('b')
+        self._masks = tuple(array(_INT64_TYPECODE) for _ in _range(6))
+        for rule, start in items:
+            self.append(rule, start)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._rule_col)
+
+    def __getitem__(self, index):
+        # type: (int) -> Tuple[RecurrenceRule, datetime]
+        return (self._rules[self._rule_col[index]],
+                from_timestamp(self._starts[index]))
+
+    def append(self, rule, start):
+        # type: (RecurrenceRule, datetime) -> int
+        """Appends a rule with its start date and returns its row index."""
+        rule_idx = self._rule_idxs.get(rule)
+        if rule_idx is None:
+            rule_idx = self._rule_idxs[rule] = len(self._rules)
+            self._rules.append(rule)
+
+        start = start.timetuple()[:6]
+        masks = _get_row_masks(rule, start)
+
+        self._rule_col.append(rule_idx)
+        self._freqs.append(rule._freq)
+        self._intervals.append(rule._interval)
+        self._starts.append(_get_timestamp(*start))
+        self._untils.append(_get_timestamp(*rule._until))
+        self._has_masks.append(masks is not None)
+        for column, mask in zip(self._masks, masks or (0,) * 6):
+            column.append(mask)
+
+        return len(self._rule_col) - 1
+
+    def expand(self, lo, hi):
+        # type: (datetime, datetime) -> Tuple[array, array]
+        """Expands all the rules over a half-open range.
+
+        The result is a pair of arrays of the same length holding the row
+        indices and the timestamps of the occurrences, see ‘to_timestamp()’.
+        The occurrences are sorted by row and then by date.
+        """
+        lo = lo.timetuple()[:6]
+        hi = hi.timetuple()[:6]
+        lo_ts = _get_timestamp(*lo)
+        hi_ts = _get_timestamp(*hi)
+
+        # Group the rows by their date masks, or by rule for the others.
+        mask_groups = {}
+        rule_groups = {}
+        masks = self._masks
+        for i in _range(len(self)):
+            if self._has_masks[i]:
+                key = (masks[0][i], masks[1][i], masks[2][i])
+                mask_groups.setdefault(key, []).append(i)
+            else:
+                rule_groups.setdefault(self._rule_col[i], []).append(i)
+
+        outs = {}
+        days = _get_days(lo, hi) if mask_groups else ()
+        offsets = {}
+        for key, rows in mask_groups.items():
+            matches = _match_days(days, *key)
+            if not matches:
+                continue
+
+            for i in rows:
+                start_ts = self._starts[i]
+                start = _get_dttm_from_timestamp(start_ts)
+                tm_key = (masks[3][i], masks[4][i], masks[5][i], start[3:])
+                row_offsets = offsets.get(tm_key)
+                if row_offsets is None:
+                    row_offsets = offsets[tm_key] = _get_time_offsets(
+                        start, *tm_key[:3])
+
+                is_aligned = _get_alignment_fn(
+                    self._freqs[i], self._intervals[i], start)
+                out = array(_INT64_TYPECODE)
+                lo_i = max(lo_ts, start_ts)
+                hi_i = min(hi_ts, self._untils[i] + 1)
+                for day in matches:
+                    if is_aligned is not None and not is_aligned(day):
+                        continue
+
+                    for offset in row_offsets:
+                        ts = day.timestamp + offset
+                        if lo_i <= ts < hi_i:
+                            out.append(ts)
+
+                if out:
+                    outs[i] = out
+
+        lo = datetime(*lo)
+        hi = datetime(*hi)
+        for rule_idx, rows in rule_groups.items():
+            rule = self._rules[rule_idx]
+            starts = [from_timestamp(self._starts[i]) for i in rows]
+            for j, out in rule.iterate_many_starts(starts, lo, hi):
+                if out:
+                    outs[rows[j]] = out
+
+        row_idxs = array('l')
+        timestamps = array(_INT64_TYPECODE)
+        for i in sorted(outs):
+            out = outs[i]
+            row_idxs.extend(array('l', (i,)) * len(out))
+            timestamps.extend(out)
+
+        return (row_idxs, timestamps)
+
+
+#   Recurrence Set
+# ------------------------------------------------------------------------------
+
+class _RuleStream(object):
+    """Occurrences of a rule, advanced on demand."""
+
+    __slots__ = (
+        '_context',
+        '_it',
+        'head',
+    )
+
+    def __init__(self, context, dttm):
+        # type: (_IterContext, Tuple[int, ...]) -> None
+        self._context = context
+        self._it = _iterate_from_dttm(context, dttm)
+        self.head = next(self._it, None)
+
+    def step(self):
+        # type: () -> None
+        """Moves to the next occurrence."""
+        self.head = next(self._it, None)
+
+    def seek(self, value):
+        # type: (datetime) -> None
+        """Moves to the first occurrence not preceding a date time."""
+        head = self.head
+        if head is None or head >= value:
+            return
+
+        dttm = value.timetuple()[:6]
+        if self._context.count is None:
+            # Seeking is cheap, jump straight to the date time.
+            self._it = _iterate_from_dttm(self._context, dttm)
+        else:
+            self._it._skip_to(dttm)
+
+        # The seeking drops the microseconds.
+        head = next(self._it, None)
+        while head is not None and head < value:
+            head = next(self._it, None)
+
+        self.head = head
+
+    def contains(self, value):
+        # type: (datetime) -> bool
+        """Checks whether a date time is an occurrence.
+
+        The date times are expected to be checked in increasing order.
+        """
+        self.seek(value)
+        return self.head == value
+
+
+class RecurrenceSet(object):
+    """Combination of rules and dates, minus some exclusions.
+
+    This follows the ‘RRULE’, ‘RDATE’, ‘EXRULE’, and ‘EXDATE’ properties of
+    RFC 5545. The included dates are always part of the set, regardless of
+    the start date.
+
+    Modified instances, as identified by the ‘RECURRENCE-ID’ property, are
+    given as a mapping from their original date time to their new one, or to
+    `None` if they are cancelled. The original date times that aren't
+    instances of the set, such as the excluded ones, aren't modified.
+    """
+
+    def __init__(self,
+                 rules=(),            # type: Iterable[RecurrenceRule]
+                 dates=(),            # type: Iterable[datetime]
+                 exclusion_rules=(),  # type: Iterable[RecurrenceRule]
+                 exclusion_dates=(),  # type: Iterable[datetime]
+                 overrides=None       # type: Optional[Mapping[datetime, Optional[datetime]]]
+                 ):
+        # type: (...) -> None
+        self._rules = tuple(rules)
+        self._dates = tuple(sorted(set(dates)))
+        self._date_set = frozenset(self._dates)
+        self._exclusion_rules = tuple(exclusion_rules)
+        self._exclusion_dates = array(
+            _INT64_TYPECODE,
+            sorted(set(to_timestamp(x) for x in exclusion_dates)))
+        self._overrides = dict(overrides or ())
+
+        # Secondary index of the moved instances, sorted by their new date
+        # time, to find the ones moved into a range from outside of it.
+        self._moved = tuple(sorted((new, original)
+                                   for original, new in self._overrides.items()
+                                   if new is not None))
+
+    def iterate_from(self, start):
+        # type: (datetime) -> Iterator[datetime]
+        return self._iterate(start, None)
+
+    def after(self, start, dttm, inclusive=False):
+        # type: (datetime, datetime, bool) -> Optional[datetime]
+        """Retrieves the first occurrence following a date time, if any.
+
+        The streams are directly moved close to the date time rather than
+        being iterated from the start.
+        """
+        for value in self._iterate(start, dttm):
+            if value > dttm or (inclusive and value == dttm):
+                return value
+
+        return None
+
+    def _iterate(self, start, lo):
+        # type: (datetime, Optional[datetime]) -> Iterator[datetime]
+        """Iterates over the occurrences not preceding a date time, if any."""
+        start_dttm = start.timetuple()[:6]
+        lo_dttm = start_dttm if lo is None else max(start_dttm,
+                                                    lo.timetuple()[:6])
+
+        streams = [_iterate_from_dttm(x._get_context(start), lo_dttm)
+                   for x in self._rules]
+        dates = self._dates
+        if lo is not None:
+            dates = islice(dates, bisect_left(dates, lo), None)
+
+        streams.append(iter(dates))
+
+        exclusions = [_RuleStream(x._get_context(start), lo_dttm)
+                      for x in self._exclusion_rules]
+
+        moved = self._moved
+        if moved:
+            if lo is not None:
+                moved = islice(moved, bisect_left(moved, (lo,)), None)
+
+            return self._iterate_merged(
+                self._iterate_original(streams, exclusions),
+                (new for new, original in moved
+                 if self._is_instance(start, original)))
+
+        return self._iterate_original(streams, exclusions)
+
+    def _is_instance(self, start, dttm):
+        # type: (datetime, datetime) -> bool
+        """Checks whether a date time is an instance prior to any override."""
+        if (dttm not in self._date_set
+                and not any(x.contains(start, dttm) for x in self._rules)):
+            return False
+
+        exclusion_dates = self._exclusion_dates
+        timestamp = to_timestamp(dttm)
+        pos = bisect_left(exclusion_dates, timestamp)
+        if pos < len(exclusion_dates) and exclusion_dates[pos] == timestamp:
+            return False
+
+        return not any(x.contains(start, dttm)
+                       for x in self._exclusion_rules)
+
+    def _iterate_merged(self, originals, moved):
+        # type: (Iterator[datetime], Iterator[datetime]) -> Iterator[datetime]
+        """Iterates over the instances, moved onto an existing one or not."""
+        previous = None
+        for value in heapq.merge(originals, moved):
+            if value != previous:
+                previous = value
+                yield value
+
+    def _iterate_original(self, streams, exclusions):
+        # type: (List[Iterator[datetime]], List[_RuleStream]) -> Iterator[datetime]
+        """Iterates over the instances that are not overridden."""
+        exclusion_dates = self._exclusion_dates
+        exclusion_pos = 0
+        overrides = self._overrides
+
+        previous = None
+        for value in heapq.merge(*streams):
+            if value == previous:
+                continue
+
+            previous = value
+
+            if overrides and value in overrides:
+                continue
+
+            if exclusion_dates:
+                timestamp = to_timestamp(value)
+                exclusion_pos = bisect_left(exclusion_dates,
+                                            timestamp,
+                                            exclusion_pos)
+                if (exclusion_pos < len(exclusion_dates)
+                        and exclusion_dates[exclusion_pos] == timestamp):
+                    continue
+
+            if any(x.contains(value) for x in exclusions):
+                continue
+
+            yield value
+
+
+#   Rule Algebra
+# ------------------------------------------------------------------------------
+
+class _UnionStream(object):
+    """Occurrences of any of several streams."""
+
+    __slots__ = (
+        '_streams',
+        'head',
+    )
+
+    def __init__(self, streams):
+        # type: (List) -> None
+        self._streams = streams
+        self._update()
+
+    def step(self):
+        # type: () -> None
+        head = self.head
+        if head is None:
+            return
+
+        for stream in self._streams:
+            if stream.head == head:
+                stream.step()
+
+        self._update()
+
+    def seek(self, value):
+        # type: (datetime) -> None
+        if self.head is None or self.head >= value:
+            return
+
+        for stream in self._streams:
+            stream.seek(value)
+
+        self._update()
+
+    def _update(self):
+        # type: () -> None
+        heads = [x.head for x in self._streams if x.head is not None]
+        self.head = min(heads) if heads else None
+
+
+class _IntersectionStream(object):
+    """Occurrences common to several streams."""
+
+    __slots__ = (
+        '_streams',
+        'head',
+    )
+
+    def __init__(self, streams):
+        # type: (List) -> None
+        self._streams = streams
+        self._align()
+
+    def step(self):
+        # type: () -> None
+        if self.head is None:
+            return
+
+        self._streams[0].step()
+        self._align()
+
+    def seek(self, value):
+        # type: (datetime) -> None
+        if self.head is None or self.head >= value:
+            return
+
+        self._streams[0].seek(value)
+        self._align()
+
+    def _align(self):
+        # type: () -> None
+        # Each stream lagging behind directly seeks the furthest head.
+        streams = self._streams
+        target = streams[0].head
+        while target is not None:
+            for stream in streams:
+                stream.seek(target)
+                if stream.head != target:
+                    target = stream.head
+                    break
+            else:
+                break
+
+        self.head = target
+
+
+class _DifferenceStream(object):
+    """Occurrences of a stream that aren't part of another one."""
+
+    __slots__ = (
+        '_streams',
+        'head',
+    )
+
+    def __init__(self, streams):
+        # type: (List) -> None
+        self._streams = streams
+        self._align()
+
+    def step(self):
+        # type: () -> None
+        if self.head is None:
+            return
+
+        self._streams[0].step()
+        self._align()
+
+    def seek(self, value):
+        # type: (datetime) -> None
+        if self.head is None or self.head >= value:
+            return
+
+        self._streams[0].seek(value)
+        self._align()
+
+    def _align(self):
+        # type: () -> None
+        included, excluded = self._streams
+        while included.head is not None:
+            excluded.seek(included.head)
+            if excluded.head != included.head:
+                break
+
+            included.step()
+
+        self.head = included.head
+
+
+def _combine(op, a, b):
+    # type: (type, Any, Any) -> RuleCombination
+    """Combines two operands, flattening nested operations of the same kind."""
+    if not isinstance(b, (RecurrenceRule, RuleCombination)):
+        return NotImplemented
+
+    operands = []
+    for operand in (a, b):
+        if (op is not _DifferenceStream
+                and isinstance(operand, RuleCombination)
+                and operand._op is op):
+            operands.extend(operand._operands)
+        else:
+            operands.append(operand)
+
+    return RuleCombination(op, operands)
+
+
+class RuleCombination(object):
+    """Lazy combination of recurrence rules.
+
+    Combinations are created from the ‘&’, ‘|’, and ‘-’ operators applied to
+    rules or to other combinations, respectively for the intersection, the
+    union, and the difference of their occurrences. The occurrences are
+    computed lazily, with the lagging operands directly seeking the
+    occurrences of the other ones rather than being expanded in full.
+    """
+
+    __slots__ = (
+        '_op',
+        '_operands',
+    )
+
+    def __init__(self, op, operands):
+        # type: (type, Sequence) -> None
+        self._op = op
+        self._operands = tuple(operands)
+
+    def __and__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_IntersectionStream, self, other)
+
+    def __or__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_UnionStream, self, other)
+
+    def __sub__(self, other):
+        # type: (Any) -> RuleCombination
+        return _combine(_DifferenceStream, self, other)
+
+    def iterate_from(self, start):
+        # type: (datetime) -> Iterator[datetime]
+        stream = self._create_stream(start, start.timetuple()[:6])
+        while stream.head is not None:
+            yield stream.head
+            stream.step()
+
+    def after(self, start, dttm, inclusive=False):
+        # type: (datetime, datetime, bool) -> Optional[datetime]
+        """Retrieves the first occurrence following a date time, if any."""
+        lo = max(start.timetuple()[:6], dttm.timetuple()[:6])
+        stream = self._create_stream(start, lo)
+
+        # The seeking drops the microseconds.
+        while stream.head is not None and (
+                stream.head < dttm or (not inclusive and stream.head == dttm)):
+            stream.step()
+
+        return stream.head
+
+    def _create_stream(self, start, dttm):
+        # type: (datetime, Tuple[int, ...]) -> Any
+        return self._op([x._create_stream(start, dttm)
+                         for x in self._operands])
+
+
+#   Agenda
+# ------------------------------------------------------------------------------
+
+class AgendaItem(namedtuple('AgendaItem', ('occurrence', 'index'))):
+    """Occurrence of an agenda.
+
+    It holds the date time of the occurrence and the index of the item it
+    belongs to. Agenda items are ordered by date time, then by index.
+    """
+
+    __slots__ = ()
+
+
+class Agenda(object):
+    """Merged occurrences of many rules, retrieved page by page.
+
+    The items are pairs of a rule and of its start date. A heap holds the
+    next occurrence of each item, and every page only pops as many entries as
+    it returns. Requesting the page that follows the last one returned
+    resumes from the heap as is, otherwise every item is seeded again by
+    seeking the requested date time directly rather than iterating from the
+    start date.
+    """
+
+    __slots__ = (
+        '_items',
+        '_heap',
+        '_last',
+    )
+
+    def __init__(self, items):
+        # type: (Iterable[Tuple[RecurrenceRule, datetime]]) -> None
+        self._items = tuple(items)
+        self._heap = None
+        self._last = None
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._items)
+
+    def page(self, after=None, limit=50):
+        # type: (Optional[Union[AgendaItem, datetime]], int) -> List[AgendaItem]
+        """Retrieves the next occurrences.
+
+        The occurrences returned strictly follow the given date time or
+        agenda item, usually the last item of the previous page. Without it,
+        the agenda is retrieved from the start dates of the items.
+        """
+        if limit < 1:
+            raise ValueError("The limit must be strictly positive.")
+
+        if after is None or self._heap is None or after != self._last:
+            self._seed(after)
+
+        heap = self._heap
+        out = []
+        while heap and len(out) < limit:
+            value, index, it = heap[0]
+            out.append(AgendaItem(value, index))
+            value = next(it, None)
+            if value is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (value, index, it))
+
+        self._last = out[-1] if out else after
+        return out
+
+    def _seed(self, after):
+        # type: (Optional[Union[AgendaItem, datetime]]) -> None
+        """Builds the heap of the next occurrences following a position."""
+        if isinstance(after, AgendaItem):
+            value, last_index = after
+        else:
+            value, last_index = after, len(self._items)
+
+        heap = []
+        for index, (rule, start) in enumerate(self._items):
+            context = rule._get_context(start)
+            if value is None:
+                it = RecurrenceIterator(context, context.start, 0, 0)
+            else:
+                it = _iterate_from_dttm(
+                    context, max(context.start, value.timetuple()[:6]))
+
+            # The seeking drops the microseconds.
+            head = next(it, None)
+            while value is not None and head is not None and (
+                    head < value or (head == value and index <= last_index)):
+                head = next(it, None)
+
+            if head is not None:
+                heap.append((head, index, it))
+
+        heapq.heapify(heap)
+        self._heap = heap
+
+
+#   Conflicts
+# ------------------------------------------------------------------------------
+
+class Interval(namedtuple('Interval', ('index', 'begin', 'end'))):
+    """Occurrence spanning a duration.
+
+    It holds the index of the item it belongs to, and the half-open range of
+    date times that it spans.
+    """
+
+    __slots__ = ()
+
+
+def _seed_spans(items, lo, hi, duration):
+    # type: (Iterable[Tuple], datetime, datetime, Optional[timedelta]) -> Tuple[List[_IterContext], List[timedelta], List[Tuple]]
+    """Seeks the first occurrence of each item that ends after a date time.
+
+    The results are the contexts and the durations of the items, alongside a
+    heap of their next occurrences that start before another date time.
+    """
+    contexts = []
+    durations = []
+    heap = []
+    for index, item in enumerate(items):
+        rule, start = item[:2]
+        span = item[2] if len(item) > 2 else duration
+        if span is None:
+            raise ValueError("No duration is defined for the item at index "
+                             "{}.".format(index))
+
+        # Ending the iteration at the end of the range prevents the rules
+        # without any occurrence from being walked until the maximum year.
+        context = rule._get_context(start)
+        context = context._replace(until=min(context.until,
+                                             hi.timetuple()[:6]))
+        contexts.append(context)
+        durations.append(span)
+
+        it = _iterate_from_dttm(
+            context, max(context.start, (lo - span).timetuple()[:6]))
+        value = next(it, None)
+        while value is not None and value + span <= lo:
+            value = next(it, None)
+
+        if value is not None and value < hi:
+            heap.append((value, index, it))
+
+    heapq.heapify(heap)
+    return (contexts, durations, heap)
+
+
+def _skip_past(context, it, dttm):
+    # type: (_IterContext, RecurrenceIterator, datetime) -> Tuple[RecurrenceIterator, Optional[datetime]]
+    """Moves an iteration to the first occurrence following a date time.
+
+    Stepping is cheaper than seeking when the date time is close by, so the
+    iteration steps a few times before seeking.
+    """
+    for _ in _range(4):
+        value = next(it, None)
+        if value is None or value > dttm:
+            return (it, value)
+
+    target = dttm.timetuple()[:6]
+    if context.count is None:
+        it = _iterate_from_dttm(context, target)
+    else:
+        it._skip_to(target)
+
+    value = next(it, None)
+    if value == dttm:
+        value = next(it, None)
+
+    return (it, value)
+
+
+def find_conflicts(items,        # type: Iterable[Tuple]
+                   lo,           # type: datetime
+                   hi,           # type: datetime
+                   duration=None  # type: Optional[timedelta]
+                   ):
+    # type: (...) -> Iterator[Tuple[Interval, Interval]]
+    """Finds the overlapping occurrences of many rules within a range.
+
+    The items are either triples of a rule, a start date, and a duration, or
+    pairs of a rule and of a start date, in which case they share the given
+    duration. The occurrences overlapping the half-open range are swept in
+    order and the pairs of overlapping intervals belonging to different
+    items are streamed back, the earliest one first.
+
+    While nothing else is ongoing, the occurrences of an item ending before
+    the next occurrence of any other item can't overlap, so they are skipped
+    over, seeking past them when they span several periods.
+    """
+    contexts, durations, heap = _seed_spans(items, lo, hi, duration)
+
+    # Ongoing occurrences, as a heap ordered by their end.
+    active = []
+    while heap:
+        begin, index, it = heap[0]
+        span = durations[index]
+        end = begin + span
+
+        while active and active[0][0] <= begin:
+            heapq.heappop(active)
+
+        following = None
+        if not active:
+            if len(heap) == 1:
+                # The remaining occurrences all belong to the same item.
+                return
+
+            for i in (1, 2):
+                if i < len(heap) and (following is None
+                                      or heap[i][0] < following):
+                    following = heap[i][0]
+
+        if active or end > following:
+            current = Interval(index, begin, end)
+            for other_end, other_index, other_begin in active:
+                if other_index != index:
+                    yield (Interval(other_index, other_begin, other_end),
+                           current)
+
+            heapq.heappush(active, (end, index, begin))
+            value = next(it, None)
+        else:
+            it, value = _skip_past(contexts[index], it, following - span)
+
+        if value is None or value >= hi:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (value, index, it))
+
+
+#   Free/Busy
+# ------------------------------------------------------------------------------
+
+def _iterate_busy(items, lo, hi, granularity, duration):
+    # type: (Iterable[Tuple], datetime, datetime, Optional[timedelta], Optional[timedelta]) -> Iterator[Tuple[datetime, datetime]]
+    """Iterates over the coalesced intervals spanned by the occurrences."""
+    contexts, durations, heap = _seed_spans(items, lo, hi, duration)
+    if granularity is None:
+        step = 0
+    else:
+        step = int(granularity.total_seconds())
+        if step < 1:
+            raise ValueError("The granularity must be at least one second.")
+
+    origin = to_timestamp(lo)
+    block = None
+    while heap:
+        begin, index, it = heap[0]
+        span = durations[index]
+        end = begin + span
+        if block is not None and end <= block[1]:
+            # The occurrences within the current block don't extend it.
+            it, value = _skip_past(contexts[index], it, block[1] - span)
+        else:
+            if step:
+                begin = from_timestamp(
+                    origin + (to_timestamp(begin) - origin) // step * step)
+                end = from_timestamp(
+                    origin - (origin - to_timestamp(end)) // step * step)
+
+            begin = max(begin, lo)
+            end = min(end, hi)
+            if block is None:
+                block = (begin, end)
+            elif begin <= block[1]:
+                block = (block[0], max(block[1], end))
+            else:
+                yield block
+                block = (begin, end)
+
+            value = next(it, None)
+
+        if value is None or value >= hi:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (value, index, it))
+
+    if block is not None:
+        yield block
+
+
+def free_busy(items,            # type: Iterable[Tuple]
+              lo,               # type: datetime
+              hi,               # type: datetime
+              granularity=None,  # type: Optional[timedelta]
+              duration=None,    # type: Optional[timedelta]
+              free=False        # type: bool
+              ):
+    # type: (...) -> Iterator[Tuple[datetime, datetime]]
+    """Iterates over the busy or free intervals of many rules within a range.
+
+    The items are either triples of a rule, a start date, and a duration, or
+    pairs of a rule and of a start date, in which case they share the given
+    duration. The occurrences are merged in a single pass into coalesced
+    busy intervals, clipped to the half-open range, or into the free
+    intervals left between them if requested.
+
+    If a granularity is given, the busy intervals are widened to the
+    boundaries of a grid of that step aligned on the start of the range.
+    """
+    blocks = _iterate_busy(items, lo, hi, granularity, duration)
+    if not free:
+        for block in blocks:
+            yield block
+
+        return
+
+    cursor = lo
+    for begin, end in blocks:
+        if begin > cursor:
+            yield (cursor, begin)
+
+        cursor = end
+
+    if cursor < hi:
+        yield (cursor, hi)
+
+
+def first_free_slot(items,            # type: Iterable[Tuple]
+                    lo,               # type: datetime
+                    hi,               # type: datetime
+                    length,           # type: timedelta
+                    granularity=None,  # type: Optional[timedelta]
+                    duration=None     # type: Optional[timedelta]
+                    ):
+    # type: (...) -> Optional[Tuple[datetime, datetime]]
+    """Retrieves the earliest free slot of a given length within a range.
+
+    The arguments follow the ones of ‘free_busy()’ and the occurrences are
+    only iterated until the slot is found.
+    """
+    for begin, end in free_busy(items, lo, hi, granularity, duration,
+                                free=True):
+        if end - begin >= length:
+            return (begin, begin + length)
+
+    return None
+
+
+#   Rule Index
+# ------------------------------------------------------------------------------
+
+_ALL_MONTHS = (1 << 12) - 1
+_ALL_WEEK_DAYS = (1 << 7) - 1
+_MIN_TIMESTAMP = _get_timestamp(1, 1, 1, 0, 0, 0)
+
+
+def _get_envelope_masks(context):
+    # type: (_IterContext) -> Tuple[int, int]
+    """Retrieves conservative masks of the months and week days of a rule.
+
+    Every occurrence of the rule falls within the months and the week days
+    set in the masks, though the converse doesn't hold.
+    """
+    months = _ALL_MONTHS
+    week_days = _ALL_WEEK_DAYS
+    year, month, day = context.start[:3]
+
+    # The week days are stored relatively to the start of the week.
+    has_week_days = context.sow_offset == 0
+
+    if context.dt_props:
+        for prop in context.dt_props:
+            # The bits are or-ed since a same week day can come with
+            # different occurrence numbers.
+            if prop.kind == _PROP_ON_MONTHS:
+                months = reduce(or_, (1 << (x - 1) for x in prop.values), 0)
+            elif prop.kind == _PROP_ON_WEEK_DAYS and has_week_days:
+                week_days = reduce(or_, (1 << (int(x) - 1)
+                                         for x in prop.values), 0)
+    elif context.freq == YEARLY:
+        months = 1 << (month - 1)
+    elif context.freq == WEEKLY and has_week_days:
+        week_days = 1 << ((_get_ord_dt(year, month, day) - 1) % 7)
+
+    return (months, week_days)
+
+
+def _get_window_masks(lo, hi):
+    # type: (datetime, datetime) -> Tuple[int, int]
+    """Retrieves masks of the months and week days covered by a range."""
+    months = 0
+    year, month = lo.year, lo.month
+    while (year, month) <= (hi.year, hi.month) and months != _ALL_MONTHS:
+        months |= 1 << (month - 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    lo_ord = lo.toordinal()
+    hi_ord = hi.toordinal()
+    if hi_ord - lo_ord >= 6:
+        week_days = _ALL_WEEK_DAYS
+    else:
+        week_days = sum(1 << ((x - 1) % 7)
+                        for x in _range(lo_ord, hi_ord + 1))
+
+    return (months, week_days)
+
+
+class _IntervalNode(object):
+    """Node of a treap of rule envelopes, ordered by start date.
+
+    Each node also records a gap, that is a range known to be without any
+    occurrence of its rule, closed by an occurrence when ‘has_next’ is set.
+    The greatest end date, gap start, and the smallest gap end of each subtree
+    are maintained to prune whole subtrees when querying.
+    """
+
+    __slots__ = (
+        'key',
+        'context',
+        'first',
+        'last',
+        'priority',
+        'left',
+        'right',
+        'gap_begin',
+        'gap_end',
+        'has_next',
+        'max_last',
+        'max_gap_begin',
+        'min_gap_end',
+    )
+
+    def __init__(self, key, context, first, last):
+        # type: (int, _IterContext, int, int) -> None
+        self.key = key
+        self.context = context
+        self.first = first
+        self.last = last
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+        # There isn't any occurrence before the start date.
+        self.gap_begin = _MIN_TIMESTAMP
+        self.gap_end = first
+        self.has_next = False
+        self.max_last = last
+        self.max_gap_begin = _MIN_TIMESTAMP
+        self.min_gap_end = first
+
+
+def _update_node(node):
+    # type: (_IntervalNode) -> None
+    """Updates the bounds maintained over the subtree of a node."""
+    max_last = node.last
+    max_gap_begin = node.gap_begin
+    min_gap_end = node.gap_end
+    for child in (node.left, node.right):
+        if child is not None:
+            max_last = max(max_last, child.max_last)
+            max_gap_begin = max(max_gap_begin, child.max_gap_begin)
+            min_gap_end = min(min_gap_end, child.min_gap_end)
+
+    node.max_last = max_last
+    node.max_gap_begin = max_gap_begin
+    node.min_gap_end = min_gap_end
+
+
+def _split_nodes(node, first, key):
+    # type: (Optional[_IntervalNode], int, int) -> Tuple[Optional[_IntervalNode], Optional[_IntervalNode]]
+    """Splits a treap into the nodes preceding a position and the others."""
+    if node is None:
+        return (None, None)
+
+    if (node.first, node.key) < (first, key):
+        left, right = _split_nodes(node.right, first, key)
+        node.right = left
+        _update_node(node)
+        return (node, right)
+
+    left, right = _split_nodes(node.left, first, key)
+    node.left = right
+    _update_node(node)
+    return (left, node)
+
+
+def _merge_nodes(left, right):
+    # type: (Optional[_IntervalNode], Optional[_IntervalNode]) -> Optional[_IntervalNode]
+    """Merges two treaps, the nodes of the first one preceding the others."""
+    if left is None:
+        return right
+
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge_nodes(left.right, right)
+        _update_node(left)
+        return left
+
+    right.left = _merge_nodes(left, right.left)
+    _update_node(right)
+    return right
+
+
+def _insert_node(node, new):
+    # type: (Optional[_IntervalNode], _IntervalNode) -> _IntervalNode
+    """Inserts a node into a treap and returns its new root."""
+    if node is None:
+        return new
+
+    if new.priority > node.priority:
+        new.left, new.right = _split_nodes(node, new.first, new.key)
+        _update_node(new)
+        return new
+
+    if (new.first, new.key) < (node.first, node.key):
+        node.left = _insert_node(node.left, new)
+    else:
+        node.right = _insert_node(node.right, new)
+
+    _update_node(node)
+    return node
+
+
+def _remove_node(node, first, key):
+    # type: (_IntervalNode, int, int) -> Optional[_IntervalNode]
+    """Removes a node from a treap and returns its new root."""
+    if node.key == key:
+        return _merge_nodes(node.left, node.right)
+
+    if (first, key) < (node.first, node.key):
+        node.left = _remove_node(node.left, first, key)
+    else:
+        node.right = _remove_node(node.right, first, key)
+
+    _update_node(node)
+    return node
+
+
+def _check_node(node, lo, hi, lo_timestamp, hi_timestamp):
+    # type: (_IntervalNode, Tuple[int, ...], Tuple[int, ...], int, int) -> bool
+    """Checks whether the rule of a node has any occurrence within a range.
+
+    The gap of the node is relied upon when it covers the start of the range,
+    and is otherwise extended or replaced with the first occurrence found.
+    """
+    begin = node.gap_begin
+    end = node.gap_end
+    if begin <= lo_timestamp <= end:
+        if end >= hi_timestamp:
+            return False
+
+        if node.has_next:
+            return True
+
+        # Only the occurrences following the gap are left to be found.
+        dttm = _find_occurrence(node.context,
+                                _get_dttm_from_timestamp(end),
+                                hi)
+    else:
+        begin = lo_timestamp
+        dttm = _find_occurrence(node.context, lo, hi)
+
+    node.gap_begin = begin
+    if dttm is None:
+        node.gap_end = hi_timestamp
+        node.has_next = False
+        return False
+
+    node.gap_end = _get_timestamp(*dttm)
+    node.has_next = True
+    return node.gap_end < hi_timestamp
+
+
+def _query_nodes(node, lo, hi, lo_timestamp, hi_timestamp, out):
+    # type: (Optional[_IntervalNode], Tuple[int, ...], Tuple[int, ...], int, int, List[int]) -> None
+    """Retrieves the keys of the nodes of a treap firing within a range."""
+    if (node is None
+            or node.max_last < lo_timestamp
+            or (node.max_gap_begin <= lo_timestamp
+                and node.min_gap_end >= hi_timestamp)):
+        return
+
+    _query_nodes(node.left, lo, hi, lo_timestamp, hi_timestamp, out)
+    if node.first < hi_timestamp:
+        if (node.last >= lo_timestamp
+                and _check_node(node, lo, hi, lo_timestamp, hi_timestamp)):
+            out.append(node.key)
+
+        _query_nodes(node.right, lo, hi, lo_timestamp, hi_timestamp, out)
+
+    _update_node(node)
+
+
+class RuleIndex(object):
+    """Index of rules finding the ones with occurrences within a range.
+
+    Each pair of a rule and of a start date is stored with a conservative
+    envelope made of the start date, the end date of the rule or its last
+    occurrence if bounded by a count, and masks of the months and week days
+    its occurrences can fall on. The entries sharing the same masks are
+    bucketed together into an interval treap ordered by start date, where
+    each subtree knows the greatest end date of its entries. Querying a range
+    prunes whole buckets through their masks, and the entries that ended
+    before the range or that start after it through the treaps, so that they
+    are never visited.
+
+    The remaining candidates are checked exactly, and each one remembers the
+    gap until its next occurrence. Subsequent queries falling within the gaps,
+    such as the ones of a sliding window, prune whole subtrees as well.
+    """
+
+    __slots__ = (
+        '_entries',
+        '_buckets',
+        '_next_key',
+    )
+
+    def __init__(self, items=()):
+        # type: (Iterable[Tuple[RecurrenceRule, datetime]]) -> None
+        self._entries = {}
+        self._buckets = {}
+        self._next_key = 0
+        for rule, start in items:
+            self.add(rule, start)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # type: (int) -> bool
+        return key in self._entries
+
+    def __getitem__(self, key):
+        # type: (int) -> Tuple[RecurrenceRule, datetime]
+        entry = self._entries[key]
+        return (entry[0], entry[1])
+
+    def add(self, rule, start):
+        # type: (RecurrenceRule, datetime) -> int
+        """Adds a rule with its start date and returns its key."""
+        key = self._next_key
+        self._next_key += 1
+
+        # The contexts aren't cached to not evict the ones in use elsewhere.
+        context = rule._create_context(start.timetuple()[:6])
+        first = _get_timestamp(*context.start)
+        if context.count is None:
+            last = _get_timestamp(*context.until)
+        else:
+            dttm = rule._get_extent(context)[1]
+            last = None if dttm is None else _get_timestamp(*dttm)
+
+        masks = _get_envelope_masks(context)
+        if last is None or last < first:
+            # The rules without any occurrence are never returned.
+            self._entries[key] = (rule, start, None, masks)
+            return key
+
+        node = _IntervalNode(key, context, first, last)
+        self._entries[key] = (rule, start, node, masks)
+        self._buckets[masks] = _insert_node(self._buckets.get(masks), node)
+        return key
+
+    def remove(self, key):
+        # type: (int) -> None
+        """Removes a rule from its key."""
+        entry = self._entries.pop(key)
+        node, masks = entry[2], entry[3]
+        if node is None:
+            return
+
+        root = _remove_node(self._buckets[masks], node.first, key)
+        if root is None:
+            del self._buckets[masks]
+        else:
+            self._buckets[masks] = root
+
+    def query(self, lo, hi):
+        # type: (datetime, datetime) -> List[int]
+        """Retrieves the sorted keys of the rules firing within a range."""
+        lo_dttm = lo.timetuple()[:6]
+        hi_dttm = hi.timetuple()[:6]
+        lo_timestamp = _get_timestamp(*lo_dttm)
+        hi_timestamp = _get_timestamp(*hi_dttm)
+        months, week_days = _get_window_masks(lo, hi)
+
+        out = []
+        for masks, root in self._buckets.items():
+            if masks[0] & months and masks[1] & week_days:
+                _query_nodes(root, lo_dttm, hi_dttm, lo_timestamp,
+                             hi_timestamp, out)
+
+        out.sort()
+        return out
+
+
+#   Scheduler
+# ------------------------------------------------------------------------------
+
+class Scheduler(object):
+    """Entries of rules fired as their occurrences fall due.
+
+    Each entry is made of a rule, a start date, and a payload. A heap is
+    keyed by the next occurrence of each entry and, when an entry fires, its
+    suspended iteration is advanced to re-arm it rather than being
+    recomputed from the start date. Retrieving the entries due by a date
+    time only costs a logarithmic time per occurrence fired.
+    """
+
+    __slots__ = (
+        '_heap',
+        '_entries',
+        '_next_key',
+        '_garbage',
+        '_runner',
+    )
+
+    def __init__(self):
+        # type: () -> None
+        self._heap = []
+        self._entries = {}
+        self._next_key = 0
+        self._garbage = 0
+        self._runner = None
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # type: (int) -> bool
+        return key in self._entries
+
+    def add(self, rule, start, payload=None, after=None):
+        # type: (RecurrenceRule, datetime, Any, Optional[datetime]) -> int
+        """Adds an entry and returns its key.
+
+        If a date time is given, only the occurrences following it are due,
+        and they are directly sought.
+        """
+        # The contexts aren't cached to not evict the ones in use elsewhere.
+        context = rule._create_context(start.timetuple()[:6])
+        if after is None:
+            it = RecurrenceIterator(context, context.start, 0, 0)
+            value = next(it, None)
+        else:
+            it = _iterate_from_dttm(
+                context, max(context.start, after.timetuple()[:6]))
+
+            # The seeking drops the microseconds.
+            value = next(it, None)
+            while value is not None and value <= after:
+                value = next(it, None)
+
+        key = self._next_key
+        self._next_key += 1
+        if value is None:
+            return key
+
+        self._entries[key] = [it, payload, value]
+        heapq.heappush(self._heap, (to_timestamp(value), key))
+
+        runner = self._runner
+        if runner is not None and (runner[4] is None or value < runner[4]):
+            self._arm()
+
+        return key
+
+    def remove(self, key):
+        # type: (int) -> None
+        """Removes an entry from its key."""
+        del self._entries[key]
+
+        # The heap is lazily cleaned up, unless it's mostly made of garbage.
+        self._garbage += 1
+        if self._garbage > len(self._entries):
+            entries = self._entries
+            self._heap = [x for x in self._heap if x[1] in entries]
+            heapq.heapify(self._heap)
+            self._garbage = 0
+
+    def next_due(self):
+        # type: () -> Optional[datetime]
+        """Retrieves the date time of the next occurrence due, if any."""
+        heap = self._heap
+        entries = self._entries
+        while heap:
+            entry = entries.get(heap[0][1])
+            if entry is not None:
+                return entry[2]
+
+            heapq.heappop(heap)
+            self._garbage -= 1
+
+        return None
+
+    def due(self, until):
+        # type: (datetime) -> List[Tuple[datetime, int, Any]]
+        """Fires the occurrences due by a date time.
+
+        The results are triples of the occurrence, the key of the entry, and
+        its payload, in chronological order. An entry having several
+        occurrences due fires as many times. The entries are re-armed with
+        their next occurrence, if any.
+        """
+        limit = to_timestamp(until)
+        heap = self._heap
+        entries = self._entries
+        out = []
+        while heap and heap[0][0] <= limit:
+            key = heap[0][1]
+            entry = entries.get(key)
+            if entry is None:
+                heapq.heappop(heap)
+                self._garbage -= 1
+                continue
+
+            it, payload, value = entry
+            out.append((value, key, payload))
+            value = next(it, None)
+            if value is None:
+                heapq.heappop(heap)
+                del entries[key]
+            else:
+                entry[2] = value
+                heapq.heapreplace(heap, (to_timestamp(value), key))
+
+        return out
+
+    def attach(self, loop, callback, clock=datetime.now):
+        # type: (Any, Callable[[List[Tuple]], Any], Callable[[], datetime]) -> None
+        """Fires the occurrences due from an asyncio event loop.
+
+        The loop sleeps until the next occurrence falls due as per the clock,
+        then calls back with the results of ‘due()’. The wake up time is
+        brought forward whenever an earlier entry is added.
+        """
+        self.detach()
+        self._runner = [loop, callback, clock, None, None]
+        self._arm()
+
+    def detach(self):
+        # type: () -> None
+        """Stops firing the occurrences from the event loop, if any."""
+        runner = self._runner
+        if runner is None:
+            return
+
+        if runner[3] is not None:
+            runner[3].cancel()
+
+        self._runner = None
+
+    def _arm(self):
+        # type: () -> None
+        """Schedules the next wake up of the event loop."""
+        runner = self._runner
+        loop, callback, clock, handle, _ = runner
+        if handle is not None:
+            handle.cancel()
+
+        value = self.next_due()
+        if value is None:
+            runner[3] = runner[4] = None
+            return
+
+        delay = max((value - clock()).total_seconds(), 0.0)
+        runner[3] = loop.call_at(loop.time() + delay, self._wake)
+        runner[4] = value
+
+    def _wake(self):
+        # type: () -> None
+        """Fires the occurrences due and sleeps again."""
+        runner = self._runner
+        runner[3] = None
+        out = self.due(runner[2]())
+        if out:
+            runner[1](out)
+
+        # The callback might have detached the scheduler.
+        if self._runner is runner:
+            self._arm()
+
+
+#   Day Bitmaps
+# ------------------------------------------------------------------------------
+
+def _get_masked_day_bitmap(context, masks, year, cache):
+    # type: (_IterContext, Tuple[int, ...], int, Dict) -> int
+    """Retrieves the day bitmap of a rule from its masks.
+
+    The days of the year matching each distinct set of date masks are
+    shared through the cache.
+    """
+    days = cache.get(None)
+    if days is None:
+        days = cache[None] = _get_days((year, 1, 1, 0, 0, 0),
+                                       (year + 1, 1, 1, 0, 0, 0))
+
+    key = masks[:3]
+    matches = cache.get(key)
+    if matches is None:
+        matches = cache[key] = _match_days(days, *key)
+
+    start = context.start
+    start_ts = _get_timestamp(*start)
+    until_ts = _get_timestamp(*context.until)
+    first_ord = days[0].ord
+    start_ord = _get_ord_dt(*start[:3])
+    until_ord = _get_ord_dt(*context.until[:3])
+    is_aligned = _get_alignment_fn(context.freq, context.interval, start)
+    offsets = None
+
+    out = 0
+    for day in matches:
+        if (day.ord < start_ord
+                or day.ord > until_ord
+                or (is_aligned is not None and not is_aligned(day))):
+            continue
+
+        if day.ord == start_ord or day.ord == until_ord:
+            if offsets is None:
+                offsets = _get_time_offsets(start, *masks[3:])
+
+            if not any(start_ts <= day.timestamp + x <= until_ts
+                       for x in offsets):
+                continue
+
+        out |= 1 << (day.ord - first_ord)
+
+    return out
+
+
+def _get_day_bitmap(rule, start, year, cache):
+    # type: (RecurrenceRule, datetime, int, Dict) -> int
+    """Retrieves the bitmap of the days of a year having occurrences."""
+    context = rule._get_context(start)
+    masks = _get_row_masks(rule, context.start)
+    if masks is not None:
+        return _get_masked_day_bitmap(context, masks, year, cache)
+
+    lo = (year, 1, 1, 0, 0, 0)
+    hi = (year + 1, 1, 1, 0, 0, 0)
+    first_ord = _get_ord_dt(year, 1, 1)
+    index, stop = _get_period_range(context, lo, hi)
+
+    out = 0
+    if (context.count is not None
+            or context.on_set_pos is not None
+            or context.freq > DAILY):
+        # The occurrences can't be told apart without their times.
+        if context.count is None:
+            count = 0
+        else:
+            count = _count_occurrences(context, index)
+
+        for dttm in _iterate_period_dttms(context, index, stop, count, hi):
+            if dttm >= lo:
+                out |= 1 << (_get_ord_dt(*dttm[:3]) - first_ord)
+
+        return out
+
+    # Every date of a set has at least one time, so only the dates need to
+    # be computed, save for the days of the start and end dates.
+    start_ord = _get_ord_dt(*context.start[:3])
+    until_ord = _get_ord_dt(*context.until[:3])
+    advance_dttm = _ADVANCE_DTTM_FNS[context.freq]
+    try:
+        anchor = _get_period_anchor(context, index)
+    except (OverflowError, ValueError):
+        return out
+
+    for _ in _range(stop - index):
+        if anchor[0] > _MAX_YEAR:
+            break
+
+        if context.dt_props:
+            dt_set = _get_dt_set(anchor[0],
+                                 anchor[1],
+                                 anchor[2],
+                                 context.freq,
+                                 context.start,
+                                 context.sow_offset,
+                                 context.on_week_days_woy_freq,
+                                 context.dt_props) or ()
+        else:
+            dt_set = (anchor[:3],)
+
+        for dt in dt_set:
+            if dt[0] != year or not _is_valid_dt(*dt):
+                continue
+
+            ord_dt = _get_ord_dt(*dt)
+            if ord_dt < start_ord or ord_dt > until_ord:
+                continue
+
+            if ord_dt == start_ord or ord_dt == until_ord:
+                following = date.fromordinal(ord_dt + 1)
+                if not _has_occurrence(context,
+                                       tuple(dt) + (0, 0, 0),
+                                       following.timetuple()[:6]):
+                    continue
+
+            out |= 1 << (ord_dt - first_ord)
+
+        anchor = advance_dttm(*(anchor + (context.interval,)))
+
+    return out
+
+
+def merge_day_bitmaps(items, year):
+    # type: (Iterable[Tuple[RecurrenceRule, datetime]], int) -> int
+    """Retrieves the bitmap of the days of a year having any occurrence.
+
+    The items are pairs of a rule and of its start date, and the result is
+    the union of their bitmaps, see ‘RecurrenceRule.day_bitmap()’. The days
+    matching the same date properties are only computed once.
+    """
+    cache = {}
+    full = (1 << (_get_ord_dt(year + 1, 1, 1) - _get_ord_dt(year, 1, 1))) - 1
+    out = 0
+    for rule, start in items:
+        out |= _get_day_bitmap(rule, start, year, cache)
+        if out == full:
+            break
+
+    return out
+
+
+#   Holiday Calendar
+# ------------------------------------------------------------------------------
+
+_POLICIES = (
+    FOLLOWING,
+    PRECEDING,
+    MODIFIED_FOLLOWING,
+    MODIFIED_PRECEDING,
+    SKIP,
+)
+
+
+class HolidayCalendar(object):
+    """Calendar of the business days.
+
+    The days that aren't business days are the ones falling on the weekend
+    and the holidays, given either as dates or as the occurrences of pairs
+    of a rule and of a start date. The business days of each year are
+    computed on demand into a bitset, so that finding the nearest business
+    day of a date is a bit scan.
+    """
+
+    __slots__ = (
+        '_weekend',
+        '_holidays',
+        '_rules',
+        '_years',
+    )
+
+    def __init__(self,
+                 holidays=(),                # type: Iterable[date]
+                 rules=(),                   # type: Iterable[Tuple[RecurrenceRule, datetime]]
+                 weekend=(SATURDAY, SUNDAY)  # type: Iterable[WeekDay]
+                 ):
+        # type: (...) -> None
+        self._weekend = reduce(or_, (1 << (int(x) - 1) for x in weekend), 0)
+        if self._weekend == _ALL_WEEK_DAYS:
+            raise ValueError("The weekend can't span the whole week.")
+
+        self._holidays = {}
+        for holiday in holidays:
+            year = holiday.year
+            self._holidays[year] = (
+                self._holidays.get(year, 0)
+                | 1 << (holiday.toordinal() - _get_ord_dt(year, 1, 1)))
+
+        self._rules = tuple(rules)
+        self._years = {}
+
+    def is_business_day(self, value):
+        # type: (date) -> bool
+        """Checks whether a date falls on a business day."""
+        bits, first_ord = self._get_year(value.year)
+        return bool(bits >> (value.toordinal() - first_ord) & 1)
+
+    def adjust(self, value, policy=FOLLOWING):
+        # type: (date, int) -> Optional[date]
+        """Adjusts a date or a date time falling on a non-business day.
+
+        The date is moved to the following or preceding business day, or
+        skipped, as per the policy. The modified policies move the date in
+        the other direction when it would otherwise change month. The time,
+        if any, is preserved. The value returned is ‘None’ when the date is
+        skipped or when no business day can be found.
+        """
+        ord_dt = value.toordinal()
+        bits, first_ord = self._get_year(value.year)
+        if bits >> (ord_dt - first_ord) & 1:
+            return value
+
+        if policy == SKIP:
+            return None
+
+        if policy in (FOLLOWING, MODIFIED_FOLLOWING):
+            found = self._find_following(ord_dt, value.year)
+            if policy == MODIFIED_FOLLOWING and (
+                    found is None
+                    or date.fromordinal(found).month != value.month):
+                found = self._find_preceding(ord_dt, value.year)
+        elif policy in (PRECEDING, MODIFIED_PRECEDING):
+            found = self._find_preceding(ord_dt, value.year)
+            if policy == MODIFIED_PRECEDING and (
+                    found is None
+                    or date.fromordinal(found).month != value.month):
+                found = self._find_following(ord_dt, value.year)
+        else:
+            raise ValueError("Invalid policy '{}'.".format(policy))
+
+        if found is None:
+            return None
+
+        dt = date.fromordinal(found)
+        return value.replace(year=dt.year, month=dt.month, day=dt.day)
+
+    def _get_year(self, year):
+        # type: (int) -> Tuple[int, int]
+        """Retrieves the business days of a year as a bitset.
+
+        The ordinal date of the first day of the year, matching the first
+        bit, is also returned.
+        """
+        out = self._years.get(year)
+        if out is not None:
+            return out
+
+        first_ord = _get_ord_dt(year, 1, 1)
+        day_count = 365 + _is_leap_year(year)
+
+        # Repeat the week days of the weekend, starting from January 1st.
+        dow = (first_ord - 1) % 7
+        week = ((self._weekend | self._weekend << 7) >> dow) & 0x7f
+        weekend = 0
+        for i in _range(0, day_count, 7):
+            weekend |= week << i
+
+        holidays = self._holidays.get(year, 0)
+        if self._rules:
+            holidays |= merge_day_bitmaps(self._rules, year)
+
+        out = (((1 << day_count) - 1) & ~(weekend | holidays), first_ord)
+        self._years[year] = out
+        return out
+
+    def _find_following(self, ord_dt, year):
+        # type: (int, int) -> Optional[int]
+        """Finds the first business day following an ordinal date."""
+        while year <= _MAX_YEAR:
+            bits, first_ord = self._get_year(year)
+            offset = max(ord_dt - first_ord, 0)
+            bits >>= offset
+            if bits:
+                return first_ord + offset + (bits & -bits).bit_length() - 1
+
+            year += 1
+
+        return None
+
+    def _find_preceding(self, ord_dt, year):
+        # type: (int, int) -> Optional[int]
+        """Finds the last business day preceding an ordinal date."""
+        while year >= 1:
+            bits, first_ord = self._get_year(year)
+            bits &= (1 << (ord_dt - first_ord + 1)) - 1
+            if bits:
+                return first_ord + bits.bit_length() - 1
+
+            year -= 1
+
+        return None
+
 
-            year, month, day, hour, minute, second = advance_dttm(
-                year, month, day, hour, minute, second, self._interval)
+def _iterate_adjusted(it, calendar, policy):
+    # type: (Iterator[datetime], HolidayCalendar, int) -> Iterator[datetime]
+    """Iterates over occurrences adjusted to the business days.
+
+    The occurrences can be moved past the following ones, they are buffered
+    until no later occurrence can be moved before them, and are output in
+    order. The occurrences moved onto the same date time are only output
+    once.
+    """
+    heap = []
+    previous = None
+    for value in it:
+        adjusted = calendar.adjust(value, policy)
+        if adjusted is not None:
+            heapq.heappush(heap, adjusted)
+
+        # The later occurrences can't be moved before the business day
+        # preceding the current one, or before the current one itself when
+        # only moving forward.
+        floor = value.toordinal()
+        if policy != FOLLOWING:
+            floor = calendar._find_preceding(floor, value.year) or floor
+
+        while heap and heap[0].toordinal() < floor:
+            adjusted = heapq.heappop(heap)
+            if adjusted != previous:
+                previous = adjusted
+                yield adjusted
+
+    while heap:
+        adjusted = heapq.heappop(heap)
+        if adjusted != previous:
+            previous = adjusted
+            yield adjusted